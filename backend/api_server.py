@@ -1,12 +1,13 @@
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 import os
+import json
 from typing import Optional
 
-from fastapi import FastAPI, Body, HTTPException, Query, BackgroundTasks
+from fastapi import FastAPI, Body, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
-import httpx
-
 from .db import (
     Database,
     upsert_job_detail,
@@ -17,28 +18,46 @@ from .db import (
     clear_job_applied,
     delete_job_skills_by_job_id,
     get_job_detail_by_id,
-    get_job_details,
+    get_job_details_page,
+    search_jobs,
+    JOB_DETAILS_COLUMNS,
     get_document_store,
     get_llm_models,
     get_recent_job_skills,
-    get_job_skills_for_job,
+    get_job_view,
     get_prompts,
     get_recent_assessed_jobs,
+    get_assessed_job_ids,
     get_document_master_resume,
-    is_job_quarantined,
-    get_last_assessed_at,
-    get_latest_quarantine,
     delete_job_quarantine,
     cleanup_stale_quarantine,
+    gc_llm_blobs,
+    add_job_change_listener,
+    iter_job_details,
+    iter_job_skills,
+    iter_llm_runs_v2,
+    iter_document_store,
+    iter_prompts,
 )
 from .crawler import manual_extract
 from .utilities import setup_logging, get_logger
-from .llm import generate_job_assessment_with_id
+from .http_client import start_http_client, close_http_client, get_http_client, http_client_stats
+from .rate_limiter import rate_limiter_stats
+from .llm import OPENROUTER_BASE_URL, stage_3_1_batcher
+from .llm_cache import llm_response_cache
+from .requirement_cache import requirement_match_cache
+from .model_health import model_health_stats
+from .llm_metrics import llm_metrics
+from .assessment_worker import start_assessment_workers, stop_assessment_workers, submit_assessment, get_assessment_pool
 from .prompt_seed import seed_initial_prompts
 
 class RegenerateJobAssessmentRequest(BaseModel):
     job_id: str
 
+class ReassessJobsRequest(BaseModel):
+    job_ids: Optional[list[str]] = None  # explicit jobs; otherwise every assessed job
+    days_back: Optional[int] = None      # only jobs assessed within this many days
+
 class DocumentUpsertRequest(BaseModel):
     document_id: str
     document_name: str
@@ -54,6 +73,7 @@ class LLMModelUpsertRequest(BaseModel):
     model_cpmt_prompt: float | None = None
     model_cpmt_completion: float | None = None
     model_cpmt_thinking: float | None = None
+    model_cpmt_cached: float | None = None
 
 class PromptUpsertRequest(BaseModel):
     prompt_id: str
@@ -65,6 +85,7 @@ class PromptUpsertRequest(BaseModel):
     prompt_response_schema: str | None = None
     prompt_created_at: int | None = None
     prompt_thinking_budget: int | None = None
+    prompt_fallback_model_ids: str | None = None  # JSON array of model_ids, e.g. '["openai/gpt-4.1-mini"]'
 
 class HtmlPayload(BaseModel):
     html: str
@@ -82,6 +103,7 @@ async def lifespan(app: FastAPI):
     """Application lifespan context manager to initialize the database."""
     logger.info("Starting application lifespan...")
     db_instance = await Database.get_instance()
+    await start_http_client()
     # Phase 0: initial prompt seed (insert-only, one-time; safe idempotent)
     if os.getenv("INITIAL_PROMPT_SEED", "1") == "1":
         try:
@@ -101,7 +123,25 @@ async def lifespan(app: FastAPI):
             logger.info(f"Startup quarantine cleanup removed {removed} stale quarantine job(s)")
     except Exception as e:
         logger.error(f"Failed startup quarantine cleanup: {e}")
+    # Phase 1b: drop llm_blob payloads no llm_runs_v2 row references any more
+    try:
+        removed = await gc_llm_blobs()
+        if removed:
+            logger.info(f"Startup blob cleanup removed {removed} unreferenced llm_blob row(s)")
+    except Exception as e:
+        logger.error(f"Failed startup llm_blob cleanup: {e}")
+    # Phase 2: drop requirement matches of an earlier 3.1 prompt or resume, and build the current ones from existing assessments if there are none
+    try:
+        await requirement_match_cache.ensure_built()
+    except Exception as e:
+        logger.error(f"Failed to build requirement match cache: {e}")
+    # Phase 3: start assessment workers (resumes anything left queued by a previous run)
+    await start_assessment_workers()
     yield
+    logger.info("Stopping assessment workers...")
+    await stop_assessment_workers()
+    logger.info("Closing shared HTTP client...")
+    await close_http_client()
     logger.info("Closing database connection...")
     await db_instance.close()
     logger.info("Application shutdown complete.")
@@ -118,9 +158,93 @@ async def read_root():
     """A simple root endpoint to confirm the server is running."""
     return {"message": "Welcome to the Job Tracker API!"}
 
-@app.get("/job_details", response_model=list[dict])
-async def get_job_details_endpoint():
-    return await get_job_details()
+JOB_DETAILS_STREAM_BATCH_SIZE = int(os.getenv("JOB_DETAILS_STREAM_BATCH_SIZE", "500"))
+
+async def _stream_job_details(cursor: Optional[str], limit: int, fields: Optional[list[str]]):
+    """Yield a {"data": [...], "next_cursor": ...} JSON document, reading job_details in keyset batches.
+
+    The pooled read connection is released between batches and only one batch is held in memory.
+    """
+    yield b'{"data":['
+    after = cursor
+    remaining = limit
+    first = True
+    exhausted = False
+    while remaining > 0:
+        batch_size = min(remaining, JOB_DETAILS_STREAM_BATCH_SIZE)
+        batch = await get_job_details_page(after_job_id=after, limit=batch_size, fields=fields)
+        for row in batch:
+            yield (b"" if first else b",") + json.dumps(row).encode("utf-8")
+            first = False
+        if batch:
+            after = batch[-1]["job_id"]
+        remaining -= len(batch)
+        if len(batch) < batch_size:
+            exhausted = True
+            break
+    next_cursor = None
+    if not exhausted and after is not None:
+        # Only advertise a cursor if at least one more row exists
+        if await get_job_details_page(after_job_id=after, limit=1, fields=["job_id"]):
+            next_cursor = after
+    yield b'],"next_cursor":' + json.dumps(next_cursor).encode("utf-8") + b"}"
+
+@app.get("/job_details")
+async def get_job_details_endpoint(
+    cursor: Optional[str] = Query(None, description="Return jobs with job_id after this value (next_cursor of the previous page)."),
+    limit: int = Query(100, gt=0, le=100000, description="Maximum number of jobs to return."),
+    fields: Optional[str] = Query(None, description="Comma-separated job_details columns to include. Defaults to all except job_description."),
+):
+    """
+    Lists job_details ordered by job_id with keyset pagination.
+    Response: {"data": [...], "next_cursor": str | null}; pass next_cursor back as `cursor` for the next page.
+    The body is streamed so large pages are sent without materializing them.
+    """
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    if field_list:
+        unknown = [f for f in field_list if f not in JOB_DETAILS_COLUMNS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown job_details field(s): {', '.join(unknown)}")
+    return StreamingResponse(_stream_job_details(cursor, limit, field_list), media_type="application/json")
+
+@app.get("/search")
+async def search_jobs_endpoint(
+    q: str = Query(..., min_length=1, description="Search text. Every word must match; the last word matches as a prefix."),
+    limit: int = Query(20, gt=0, le=200, description="Maximum number of results to return."),
+    offset: int = Query(0, ge=0, description="Number of ranked results to skip."),
+    raw: bool = Query(False, description="Pass `q` to SQLite FTS5 unchanged (AND/OR/NOT, \"phrases\", prefix*, column:term)."),
+):
+    """
+    Ranked full-text search over job title, company, description and skills.
+    Response: {"total": int, "limit": int, "offset": int, "next_offset": int | null, "results": [...]},
+    where each result carries job fields, a highlighted title, a <mark>-highlighted snippet and its bm25 score.
+    """
+    try:
+        found = await search_jobs(q, limit=limit, offset=offset, raw=raw)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    next_offset = offset + limit if offset + limit < found["total"] else None
+    return {"total": found["total"], "limit": limit, "offset": offset, "next_offset": next_offset, "results": found["results"]}
+
+EXPORT_STREAMS = {
+    "job_details": iter_job_details,
+    "job_skills": iter_job_skills,
+    "llm_runs_v2": iter_llm_runs_v2,
+    "document_store": iter_document_store,
+    "prompts": iter_prompts,
+}
+
+async def _ndjson(rows):
+    async for row in rows:
+        yield json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n"
+
+@app.get("/export/{table}.ndjson")
+async def export_table_endpoint(table: str):
+    """Streams every row of `table` as newline-delimited JSON without loading the table into memory."""
+    iter_rows = EXPORT_STREAMS.get(table)
+    if iter_rows is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export table: {table}. Available: {', '.join(EXPORT_STREAMS)}")
+    return StreamingResponse(_ndjson(iter_rows()), media_type="application/x-ndjson")
 
 @app.get("/document_store", response_model=list[dict])
 async def get_document_store_endpoint():
@@ -150,16 +274,77 @@ async def get_jobs_recent_endpoint(
 
 @app.get("/openrouter_credits", response_model=dict)
 async def get_openrouter_credits_endpoint():
-    url = "https://openrouter.ai/api/v1/credits"
+    url = f"{OPENROUTER_BASE_URL}/credits"
     headers = {
         "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
         "Content-Type": "application/json"
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers)
-        remaining_credits = response.json()['data']['total_credits'] - response.json()['data']['total_usage']
+    response = await get_http_client().get(url, headers=headers)
+    data = response.json()['data']
+    remaining_credits = data['total_credits'] - data['total_usage']
     return {"remaining_credits": remaining_credits}
 
+@app.get("/http_stats", response_model=dict)
+async def get_http_stats_endpoint():
+    """Shared outbound HTTP client pool settings and connection reuse counters."""
+    return http_client_stats()
+
+@app.get("/db_stats", response_model=dict)
+async def get_db_stats_endpoint():
+    """Reader pool sizing, writer queue depth and wait-time statistics."""
+    db_instance = await Database.get_instance()
+    return db_instance.stats()
+
+@app.get("/llm_limiter", response_model=dict)
+async def get_llm_limiter_endpoint():
+    """Per-model RPM/TPM bucket levels, AIMD concurrency windows, wait times and the shared retry budget."""
+    return rate_limiter_stats()
+
+@app.get("/llm_models/health", response_model=dict)
+async def get_llm_model_health_endpoint():
+    """Per-model EWMA latency/error rate, latency percentiles, hedge delay and hedge/failover counters."""
+    return model_health_stats()
+
+@app.get("/metrics/llm")
+async def get_llm_metrics_endpoint(
+    days: Optional[int] = Query(30, ge=1, description="Report window in UTC days (JSON only; Prometheus output is all-time)"),
+    format: str = Query("json", pattern="^(json|prometheus)$"),
+):
+    """
+    Per-stage and per-model latency percentiles, tokens/second, cost per job and cost per day, from rollups
+    that are brought up to date with the llm_runs_v2 rows added since the previous call.
+    """
+    await llm_metrics.refresh()
+    if format == "prometheus":
+        return PlainTextResponse(await llm_metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+    return await llm_metrics.report(days)
+
+@app.get("/llm_batcher", response_model=dict)
+async def get_llm_batcher_endpoint():
+    """Cross-job stage 3.1 batching counters (LLM_BATCH_3_1_ENABLED)."""
+    return stage_3_1_batcher.stats()
+
+@app.get("/llm_cache", response_model=dict)
+async def get_llm_cache_endpoint():
+    """LLM response cache hit/miss counters and table size."""
+    return await llm_response_cache.stats()
+
+@app.post("/llm_cache/clear")
+async def clear_llm_cache_endpoint():
+    """Drops every cached LLM response (memory and table)."""
+    removed = await llm_response_cache.clear()
+    return {"status": "success", "removed": removed}
+
+@app.get("/requirement_cache", response_model=dict)
+async def get_requirement_cache_endpoint():
+    """Requirement-level match cache counters (exact and near-duplicate hits) and entry count."""
+    return await requirement_match_cache.stats()
+
+@app.get("/assessment_queue", response_model=dict)
+async def get_assessment_queue_endpoint():
+    """Assessment worker pool counters and queue depth by status."""
+    return await get_assessment_pool().stats()
+
 @app.get("/master_resume", response_model=dict)
 async def get_master_resume_endpoint():
     return await get_document_master_resume()
@@ -192,7 +377,7 @@ async def upsert_prompt_endpoint(payload: PromptUpsertRequest):
         raise HTTPException(status_code=500, detail="Failed to upsert prompt.")
 
 @app.post("/html_extract")
-async def html_extract_endpoint(payload: HtmlPayload, background_tasks: BackgroundTasks):
+async def html_extract_endpoint(payload: HtmlPayload):
     """
     Extracts text from HTML content and returns it if it meets the minimum length requirement.
     """
@@ -216,8 +401,8 @@ async def html_extract_endpoint(payload: HtmlPayload, background_tasks: Backgrou
                 job_applied=0,
                 job_applied_timestamp=None
             )
-            # Start assessment in the background and return quickly
-            background_tasks.add_task(generate_job_assessment_with_id, extracted_data.get("job_id"))  # type: ignore
+            # Queue the assessment (durable, deduplicated per job) and return quickly
+            await submit_assessment(extracted_data.get("job_id"))  # type: ignore
 
             # Fetch the actual job record to get the real job_applied status
             job_record = await get_job_detail_by_id(extracted_data.get("job_id"))  # type: ignore
@@ -236,21 +421,71 @@ async def html_extract_endpoint(payload: HtmlPayload, background_tasks: Backgrou
         logger.exception("Failed to extract HTML content.")
         return {"status": "error", "message": "Failed to extract HTML content."}
 
+class JobViewCache:
+    """Bounded LRU of rendered GET /job/{job_id} responses.
+
+    Entries are dropped when the db layer reports a committed change to the job. A
+    per-job generation counter prevents a render that raced with an invalidation from
+    being stored after it.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self, job_id: str) -> int:
+        return self._generations.get(job_id, 0)
+
+    def get(self, job_id: str) -> Optional[bytes]:
+        body = self._entries.get(job_id)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(job_id)
+        self.hits += 1
+        return body
+
+    def put(self, job_id: str, body: bytes, generation: int):
+        if self.max_entries <= 0 or generation != self.generation(job_id):
+            return
+        self._entries[job_id] = body
+        self._entries.move_to_end(job_id)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._generations.pop(evicted, None)
+
+    def invalidate(self, job_id: str):
+        self._entries.pop(job_id, None)
+        self._generations[job_id] = self._generations.get(job_id, 0) + 1
+
+job_view_cache = JobViewCache(int(os.getenv("JOB_VIEW_CACHE_SIZE", "512")))
+add_job_change_listener(job_view_cache.invalidate)
+
 @app.get("/job/{job_id}", response_model=dict)
 async def get_job_endpoint(job_id: str):
     """
     Returns a unified job payload including qualifications and an assessed flag.
     assessed = True if any job_skills exist for the job_id.
+    The rendered payload is cached until the job's details, skills, quarantine rows or runs change.
     """
-    job = await get_job_detail_by_id(job_id)
-    if not job:
+    cached = job_view_cache.get(job_id)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    generation = job_view_cache.generation(job_id)
+
+    view = await get_job_view(job_id)
+    if not view:
         raise HTTPException(status_code=404, detail=f"job_id not found: {job_id}")
 
-    skills = await get_job_skills_for_job(job_id)
+    job = view["job"]
+    skills = view["skills"]
     assessed = len(skills) > 0
-    failed = await is_job_quarantined(job_id)
-    last_assessed_at = await get_last_assessed_at(job_id)
-    quarantine = await get_latest_quarantine(job_id) if failed else None
+    quarantine = view["quarantine"]
+    failed = quarantine is not None
+    last_assessed_at = view["last_assessed_at"]
 
     # Phase 1 quarantine cleanup (stale masking):
     # A quarantine record is considered stale if the job now has a completed assessment (skills exist)
@@ -313,12 +548,14 @@ async def get_job_endpoint(job_id: str):
         "stale_quarantine": stale_quarantine,
     }
 
-    return {"status": "success", "data": data}
+    body = json.dumps({"status": "success", "data": data}).encode("utf-8")
+    job_view_cache.put(job_id, body, generation)
+    return Response(content=body, media_type="application/json")
     
 @app.post("/regenerate_job_assessment")
-async def regenerate_job_assessment_endpoint(background_tasks: BackgroundTasks, payload: RegenerateJobAssessmentRequest = Body(...)):
+async def regenerate_job_assessment_endpoint(payload: RegenerateJobAssessmentRequest = Body(...)):
     """
-    Deletes existing job_skills for the given job_id and regenerates the assessment in the background.
+    Deletes existing job_skills for the given job_id and queues a high-priority reassessment.
     Returns immediately with accepted=True. Clients can poll GET /job/{job_id} until assessed=True.
     """
     try:
@@ -331,14 +568,10 @@ async def regenerate_job_assessment_endpoint(background_tasks: BackgroundTasks,
         await delete_job_skills_by_job_id(job_id)
         # Clear quarantine + skills then schedule regeneration
         await delete_job_quarantine(job_id)
-        if background_tasks is not None:
-            background_tasks.add_task(generate_job_assessment_with_id, job_id)
-        else:
-            # Fallback: fire-and-forget
-            import asyncio
-            asyncio.create_task(generate_job_assessment_with_id(job_id))
-
-        return {"status": "success", "accepted": True, "job_id": job_id}
+        # User-initiated, so it jumps ahead of bulk extractions
+        queued = await submit_assessment(job_id, priority=1)
+
+        return {"status": "success", "accepted": True, "job_id": job_id, "queue_id": queued["queue_id"]}
     except HTTPException:
         raise
     except Exception as e:
@@ -348,6 +581,32 @@ async def regenerate_job_assessment_endpoint(background_tasks: BackgroundTasks,
         )
         raise HTTPException(status_code=500, detail=f"Failed to regenerate job assessment: {e}")
 
+@app.post("/reassess_jobs")
+async def reassess_jobs_endpoint(payload: ReassessJobsRequest = Body(...)):
+    """
+    Queues a background reassessment of the given jobs, or of all (or recently) assessed jobs.
+    Each job reruns only the stages whose request changed since its last assessment (e.g. only 3.1
+    after a master resume edit, from 2.2 on after a 2.2 prompt change); unchanged stages reuse their
+    stored output. Current job_skills stay visible until each job's new assessment replaces them.
+    """
+    if payload.job_ids:
+        job_ids = list(dict.fromkeys(payload.job_ids))
+    else:
+        job_ids = await get_assessed_job_ids(days_back=payload.days_back)
+    enqueued = rerun = 0
+    for job_id in job_ids:
+        try:
+            # Bulk work: below extraction (0) and user-triggered regeneration (1)
+            result = await submit_assessment(job_id, priority=-1, mode="reassess")
+        except Exception as e:
+            logger.error(f"Failed to queue reassessment for job_id {job_id}: {e}")
+            continue
+        enqueued += 1 if result["enqueued"] else 0
+        # Jobs being assessed right now are queued again once their current run ends
+        rerun += 1 if result.get("rerun") else 0
+    logger.info(f"Queued reassessment of {enqueued}/{len(job_ids)} job(s), {rerun} rerun(s) after in-flight assessments")
+    return {"status": "success", "accepted": True, "jobs": len(job_ids), "enqueued": enqueued, "rerun_scheduled": rerun}
+
 @app.post("/update_job_applied")
 async def update_job_applied_endpoint(payload: UpdateJobAppliedRequest = Body(...)):
     """
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+from typing import Optional
+
+from .utilities import setup_logging, get_logger
+from .db import (
+    enqueue_assessment,
+    lease_assessments,
+    heartbeat_assessment,
+    complete_assessment,
+    fail_assessment,
+    release_assessment_leases,
+    purge_assessment_queue,
+    purge_job_stage_checkpoints,
+    get_assessment_queue_counts,
+)
+from .llm import ASSESSMENT_STAGES, generate_job_assessment_with_id
+from .staged_executor import StagedExecutor
+
+setup_logging()
+logger = get_logger(__name__)
+
+# Worker pool configuration (env-overridable)
+ASSESSMENT_WORKERS = int(os.getenv("ASSESSMENT_WORKERS", "4"))
+ASSESSMENT_LEASE_SECONDS = int(os.getenv("ASSESSMENT_LEASE_SECONDS", "300"))
+ASSESSMENT_POLL_SECONDS = float(os.getenv("ASSESSMENT_POLL_SECONDS", "5"))
+ASSESSMENT_RETRY_DELAY_SECONDS = int(os.getenv("ASSESSMENT_RETRY_DELAY_SECONDS", "30"))
+ASSESSMENT_QUEUE_RETENTION_DAYS = int(os.getenv("ASSESSMENT_QUEUE_RETENTION_DAYS", "30"))
+# Staged execution: each pipeline stage gets its own bounded queue and worker pool
+ASSESSMENT_STAGED_EXECUTOR = os.getenv("ASSESSMENT_STAGED_EXECUTOR", "1") == "1"
+ASSESSMENT_STAGE_QUEUE_SIZE = int(os.getenv("ASSESSMENT_STAGE_QUEUE_SIZE", "16"))
+# JSON object of per-stage worker counts overriding the defaults, e.g. {"3_1": 8}
+ASSESSMENT_STAGE_WORKERS = os.getenv("ASSESSMENT_STAGE_WORKERS", "")
+DEFAULT_STAGE_WORKERS = {"2_1": 2, "2_2": 2, "2_3": 2, "3_1": 4, "save": 1}
+
+def _stage_workers() -> dict:
+    workers = dict(DEFAULT_STAGE_WORKERS)
+    if ASSESSMENT_STAGE_WORKERS:
+        try:
+            overrides = json.loads(ASSESSMENT_STAGE_WORKERS)
+            if isinstance(overrides, dict):
+                workers.update({name: int(count) for name, count in overrides.items()})
+        except (json.JSONDecodeError, TypeError, ValueError):
+            logger.error("ASSESSMENT_STAGE_WORKERS is not a valid JSON object of worker counts; using defaults.")
+    return workers
+
+class AssessmentWorkerPool:
+    """
+    Fixed-size pool of workers draining the durable assessment_queue table.
+
+    Each worker leases one entry at a time, keeps the lease alive with a heartbeat while the
+    assessment runs, then completes or fails it. Workers sleep on an in-process event that
+    `submit` sets, with a poll interval as fallback (retry backoff, entries added by other processes,
+    leases expiring after a crash).
+
+    With ASSESSMENT_STAGED_EXECUTOR the leased jobs run through a StagedExecutor, so one job's 3.1
+    overlaps another's 2.1 and each stage's concurrency is sized on its own; the pool then leases at
+    least as many jobs as there are stage workers to keep every stage busy.
+    """
+
+    def __init__(
+        self,
+        workers: int = ASSESSMENT_WORKERS,
+        lease_seconds: int = ASSESSMENT_LEASE_SECONDS,
+        poll_seconds: float = ASSESSMENT_POLL_SECONDS,
+        retry_delay_seconds: int = ASSESSMENT_RETRY_DELAY_SECONDS,
+    ):
+        self.executor: Optional[StagedExecutor] = None
+        if ASSESSMENT_STAGED_EXECUTOR:
+            stage_workers = _stage_workers()
+            self.executor = StagedExecutor(
+                [(name, handler, stage_workers.get(name, 1)) for name, handler in ASSESSMENT_STAGES],
+                queue_size=ASSESSMENT_STAGE_QUEUE_SIZE,
+            )
+            workers = max(workers, sum(stage_workers.get(name, 1) for name, _ in ASSESSMENT_STAGES))
+        self.workers = max(1, workers)
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.retry_delay_seconds = retry_delay_seconds
+        self.owner_prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = False
+        # Stats
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._retried = 0
+        self._lost_leases = 0
+        self._run_seconds_total = 0.0
+
+    def _owner(self, index: int) -> str:
+        return f"{self.owner_prefix}:{index}"
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._stopping = False
+        if ASSESSMENT_QUEUE_RETENTION_DAYS > 0:
+            purged = await purge_assessment_queue(ASSESSMENT_QUEUE_RETENTION_DAYS)
+            if purged:
+                logger.info(f"Purged {purged} finished assessment queue row(s)")
+            purged = await purge_job_stage_checkpoints(ASSESSMENT_QUEUE_RETENTION_DAYS)
+            if purged:
+                logger.info(f"Purged {purged} abandoned stage checkpoint(s)")
+        self._tasks = [asyncio.create_task(self._worker(i), name=f"assessment-worker-{i}") for i in range(self.workers)]
+        logger.info(f"Started {self.workers} assessment worker(s) (lease={self.lease_seconds}s)")
+
+    async def stop(self):
+        """Cancels the workers and hands their in-flight entries back to the queue."""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.executor is not None:
+            await self.executor.stop()
+        released = 0
+        for i in range(self.workers):
+            released += await release_assessment_leases(self._owner(i))
+        if released:
+            logger.info(f"Released {released} in-flight assessment(s) back to the queue")
+
+    def notify(self):
+        """Wakes idle workers."""
+        self._wakeup.set()
+
+    async def submit(self, job_id: str, priority: int = 0, mode: str = "assess") -> dict:
+        """Enqueues job_id (deduplicated per job) and wakes idle workers."""
+        result = await enqueue_assessment(job_id, priority=priority, mode=mode)
+        self.notify()
+        return result
+
+    async def _heartbeat(self, queue_id: int, owner: str, work: asyncio.Task):
+        interval = max(self.lease_seconds / 3, 1)
+        while not work.done():
+            await asyncio.sleep(interval)
+            if work.done():
+                return
+            if not await heartbeat_assessment(queue_id, owner, self.lease_seconds):
+                self._lost_leases += 1
+                logger.warning(f"Lost lease on assessment queue entry {queue_id}; abandoning it")
+                work.cancel()
+                return
+
+    async def _run_entry(self, entry: dict, owner: str):
+        queue_id, job_id = entry["queue_id"], entry["job_id"]
+        work = asyncio.create_task(
+            generate_job_assessment_with_id(
+                job_id,
+                reassess=entry.get("queue_mode") == "reassess",
+                pipeline=self.executor.run if self.executor is not None else None,
+            )
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(queue_id, owner, work))
+        started = time.perf_counter()
+        self._in_flight += 1
+        try:
+            result = await work
+        except asyncio.CancelledError:
+            if self._stopping:
+                raise
+            return  # lease lost; the new owner reports the outcome
+        except Exception as e:
+            logger.exception(f"Assessment worker error for job_id {job_id}: {e}")
+            status = await fail_assessment(queue_id, owner, f"{type(e).__name__}: {e}", retry_delay_seconds=self.retry_delay_seconds)
+            if status == "pending":
+                self._retried += 1
+            else:
+                self._failed += 1
+            return
+        finally:
+            self._in_flight -= 1
+            self._run_seconds_total += time.perf_counter() - started
+            heartbeat.cancel()
+            if not work.done():
+                work.cancel()
+
+        if isinstance(result, list) and result:
+            await complete_assessment(queue_id, owner)
+            self._completed += 1
+        else:
+            # An error dict (missing job/resume/prompt) or an empty list (the pipeline quarantined the job)
+            # are not retried here; /regenerate_job_assessment clears the quarantine and re-enqueues.
+            error = result.get("error") if isinstance(result, dict) else "assessment failed; job quarantined"
+            await fail_assessment(queue_id, owner, str(error))
+            self._failed += 1
+
+    async def _worker(self, index: int):
+        owner = self._owner(index)
+        while not self._stopping:
+            try:
+                # Clear before claiming so a submit that lands after an empty claim still wakes us
+                self._wakeup.clear()
+                claimed = await lease_assessments(owner, self.lease_seconds, limit=1)
+                if not claimed:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                entry = claimed[0]
+                logger.info(
+                    f"Worker {index} leased job_id {entry['job_id']} "
+                    f"(queue_id={entry['queue_id']}, attempt {entry['queue_attempts']}/{entry['queue_max_attempts']})"
+                )
+                await self._run_entry(entry, owner)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Assessment worker {index} loop error: {e}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def stats(self) -> dict:
+        finished = self._completed + self._failed
+        return {
+            "workers": self.workers,
+            "running": bool(self._tasks),
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "failed": self._failed,
+            "retried": self._retried,
+            "lost_leases": self._lost_leases,
+            "run_seconds_avg": round(self._run_seconds_total / finished, 3) if finished else 0.0,
+            "lease_seconds": self.lease_seconds,
+            "queue": await get_assessment_queue_counts(),
+            "pipeline": self.executor.stats() if self.executor is not None else None,
+        }
+
+_pool: Optional[AssessmentWorkerPool] = None
+
+def get_assessment_pool() -> AssessmentWorkerPool:
+    global _pool
+    if _pool is None:
+        _pool = AssessmentWorkerPool()
+    return _pool
+
+async def start_assessment_workers() -> AssessmentWorkerPool:
+    """Starts the process-wide worker pool (called from the FastAPI lifespan)."""
+    pool = get_assessment_pool()
+    await pool.start()
+    return pool
+
+async def stop_assessment_workers():
+    global _pool
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
+
+async def submit_assessment(job_id: str, priority: int = 0, mode: str = "assess") -> dict:
+    """Durably enqueues an assessment for job_id; a running pool picks it up immediately."""
+    return await get_assessment_pool().submit(job_id, priority=priority, mode=mode)
@@ -0,0 +1,309 @@
+"""Offline, reproducible benchmark of the assessment pipeline.
+
+    python -m backend.benchmark --jobs 50 --concurrency 8 --latency-median 2
+    python -m backend.benchmark --source-db job_tracker.db --jobs 100 --concurrency 16 --replay-latency
+
+Builds a scratch database (synthetic jobs and resume, or a copy of --source-db whose recorded
+llm_runs_v2 responses are replayed from that copy; the source is only read once), starts backend.mock_openrouter in a subprocess (unless
+--base-url points at a running one), drives process_single_job_assessment N-way concurrent and
+reports jobs/min, per-stage p50/p95/p99 and DB writer time. The LLM response and requirement
+caches are disabled unless --keep-caches, so every run does the same work.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import shutil
+import asyncio
+import sqlite3
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from .utilities import setup_logging, get_logger
+
+setup_logging()
+logger = get_logger(__name__)
+
+RUN_TYPES = ["ja_2_1_assessment", "ja_2_2_assessment", "ja_2_3_assessment", "ja_3_1_assessment"]
+MOCK_READY_TIMEOUT = 30.0  # seconds
+
+_REQUIREMENT_LINES = [
+    "5+ years of professional Python development",
+    "Strong SQL skills and experience with PostgreSQL or MySQL",
+    "Experience with Kubernetes and Docker in production",
+    "Bachelor's degree in Computer Science or a related field",
+    "Familiarity with AWS, GCP or Azure",
+    "Experience building REST APIs with FastAPI, Flask or Django",
+    "Excellent written and verbal communication skills",
+    "Experience with data pipelines (Airflow, dbt, Spark)",
+    "Knowledge of CI/CD, Git and automated testing",
+    "Experience mentoring junior engineers",
+    "Understanding of machine learning fundamentals",
+    "Comfortable working in an agile, cross-functional team",
+    "Experience with Terraform or other infrastructure as code tools",
+    "Strong analytical and problem-solving skills",
+    "Experience with streaming systems such as Kafka",
+    "Nice to have: TypeScript and React",
+    "Nice to have: experience in a startup environment",
+    "Ability to travel up to 10%",
+]
+
+_RESUME_MARKDOWN = """# Candidate
+## Experience
+- Senior Software Engineer (6 years): Python, FastAPI, PostgreSQL, Airflow, Docker, AWS
+- Data Engineer (3 years): SQL, dbt, Spark, Kafka
+## Education
+- B.Sc. Computer Science
+"""
+
+def _percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _summary(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50_s": round(_percentile(values, 0.50), 3) if values else None,
+        "p95_s": round(_percentile(values, 0.95), 3) if values else None,
+        "p99_s": round(_percentile(values, 0.99), 3) if values else None,
+        "max_s": round(max(values), 3) if values else None,
+    }
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _synthetic_job_description(rng: random.Random, index: int) -> str:
+    lines = rng.sample(_REQUIREMENT_LINES, rng.randint(6, 12))
+    return f"Software Engineer {index}\n\nRequirements:\n" + "\n".join(f"- {line}" for line in lines)
+
+async def _start_mock(args, port: int) -> asyncio.subprocess.Process:
+    command = [
+        sys.executable, "-m", "backend.mock_openrouter",
+        "--port", str(port),
+        "--latency-median", str(args.latency_median),
+        "--latency-sigma", str(args.latency_sigma),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--error-rate", str(args.error_rate),
+        "--throttle-rate", str(args.throttle_rate),
+        "--retry-after", str(args.retry_after),
+        "--seed", str(args.seed),
+    ]
+    if args.source_db:
+        command += ["--replay-db", os.path.abspath(args.db)]  # the scratch snapshot, never the live source
+    if args.replay_latency:
+        command.append("--replay-latency")
+    if args.model_profiles:
+        command += ["--model-profiles", args.model_profiles]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(Path(__file__).resolve().parent.parent), env.get("PYTHONPATH")]))
+    return await asyncio.create_subprocess_exec(*command, env=env)
+
+async def _wait_ready(client, base_url: str, process: Optional[asyncio.subprocess.Process]):
+    deadline = time.monotonic() + MOCK_READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if process is not None and process.returncode is not None:
+            raise RuntimeError(f"mock server exited with code {process.returncode}")
+        try:
+            response = await client.get(f"{base_url}/credits")
+            if response.status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"mock server at {base_url} did not become ready within {MOCK_READY_TIMEOUT:.0f}s")
+
+async def _seed_synthetic(jobs: int, seed: int) -> list[str]:
+    from .db import upsert_llm_model, upsert_document, upsert_job_detail
+    from .db_init import initialize_database
+    from .prompt_catalog_initial import INITIAL_PROMPT_SPECS
+    from .prompt_seed import seed_initial_prompts
+
+    await initialize_database()
+    for model_id in sorted({spec.model_id for spec in INITIAL_PROMPT_SPECS}):
+        await upsert_llm_model(model_id=model_id, model_name=model_id)  # prompt.model_id references llm_models
+    await seed_initial_prompts()
+    await upsert_document(document_id="benchmark-resume", document_name="master_resume", document_timestamp=1, document_markdown=_RESUME_MARKDOWN)
+    await upsert_document(
+        document_id="benchmark-resume-json", document_name="master_resume_json", document_timestamp=1,
+        document_markdown=json.dumps({"skills": ["Python", "SQL", "FastAPI", "PostgreSQL", "Airflow", "Docker", "AWS", "Kafka"]}),
+    )
+    rng = random.Random(seed)
+    job_ids = []
+    for i in range(jobs):
+        job_id = f"benchmark-{i:05d}"
+        await upsert_job_detail(job_id=job_id, job_title=f"Software Engineer {i}", job_description=_synthetic_job_description(rng, i))
+        job_ids.append(job_id)
+    return job_ids
+
+async def _run(args) -> dict:
+    # Imported only now: DB_FILE, OPENROUTER_BASE_URL and the cache switches are read at import time
+    import httpx
+    from .db import Database, get_document_master_resume, get_document_master_resume_json, get_latest_prompt, get_job_detail_by_id, get_recorded_assessment_job_ids
+    from .llm import ASSESSMENT_STAGES, OPENROUTER_BASE_URL, process_single_job_assessment, add_stage_timing_listener
+    from .http_client import close_http_client
+    from .model_health import model_health_stats
+
+    process = None
+    async with httpx.AsyncClient(timeout=10) as control:
+        if not args.base_url:
+            process = await _start_mock(args, args.mock_port)
+        try:
+            await _wait_ready(control, OPENROUTER_BASE_URL, process)
+            if args.source_db:
+                job_ids = await get_recorded_assessment_job_ids(args.jobs)
+                if len(job_ids) < args.jobs:
+                    logger.warning(f"--source-db has {len(job_ids)} job(s) with recorded runs; benchmarking those")
+            else:
+                job_ids = await _seed_synthetic(args.jobs, args.seed)
+
+            resume = await get_document_master_resume()
+            resume_json = await get_document_master_resume_json()
+            prompts = [await get_latest_prompt(run_type) for run_type in RUN_TYPES]
+            if resume["document_markdown"] is None or resume_json["document_markdown"] is None or None in prompts:
+                raise RuntimeError("benchmark database has no master resume or is missing assessment prompts")
+            jobs = []
+            for job_id in job_ids:
+                job = await get_job_detail_by_id(job_id)
+                jobs.append({"job_id": job_id, "job_description": job["job_description"]})
+
+            stage_seconds: dict[str, list[float]] = {name: [] for name, _ in ASSESSMENT_STAGES}
+            job_seconds: dict[str, float] = {}
+
+            def on_stage(job_id: str, stage_name: str, seconds: float, accepted: bool):
+                stage_seconds.setdefault(stage_name, []).append(seconds)
+                job_seconds[job_id] = job_seconds.get(job_id, 0.0) + seconds
+
+            add_stage_timing_listener(on_stage)
+            db_instance = await Database.get_instance()
+            db_before = db_instance.stats()
+            semaphore = asyncio.Semaphore(args.concurrency)
+            print(f"Benchmarking {len(jobs)} job(s) at concurrency {args.concurrency} against {OPENROUTER_BASE_URL}")
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(
+                *(process_single_job_assessment(job, resume, resume_json, *prompts, semaphore) for job in jobs),
+                return_exceptions=True,
+            )
+            elapsed = time.perf_counter() - started
+            db_after = db_instance.stats()
+
+            mock_stats = None
+            try:
+                response = await control.get(f"{OPENROUTER_BASE_URL.rsplit('/api/v1', 1)[0]}/mock/stats")
+                if response.status_code == 200:
+                    mock_stats = response.json()
+            except httpx.HTTPError:
+                pass  # not the mock (--base-url)
+        finally:
+            await close_http_client()
+            await (await Database.get_instance()).close()
+            if process is not None and process.returncode is None:
+                process.terminate()
+                await process.wait()
+
+    def writes(stats: dict) -> int:
+        return stats["writes_completed"] + stats["writes_failed"]
+
+    write_count = writes(db_after) - writes(db_before)
+    wait_ms_total = db_after["write_wait_ms_avg"] * writes(db_after) - db_before["write_wait_ms_avg"] * writes(db_before)
+    exec_s = db_after["write_exec_s_total"] - db_before["write_exec_s_total"]
+    succeeded = sum(1 for outcome in outcomes if outcome is True)
+    return {
+        "jobs": len(jobs),
+        "concurrency": args.concurrency,
+        "succeeded": succeeded,
+        "failed": sum(1 for outcome in outcomes if outcome is False),
+        "errors": [f"{type(o).__name__}: {o}" for o in outcomes if isinstance(o, BaseException)][:10],
+        "wall_s": round(elapsed, 3),
+        "jobs_per_min": round(60 * succeeded / elapsed, 2) if elapsed else None,
+        "job": _summary(list(job_seconds.values())),
+        "stages": {name: _summary(values) for name, values in stage_seconds.items()},
+        "db_write": {
+            "writes": write_count,
+            "batches": db_after["write_batches"] - db_before["write_batches"],
+            "exec_s_total": round(exec_s, 3),
+            "exec_share_of_wall": round(exec_s / elapsed, 4) if elapsed else None,
+            "wait_ms_avg": round(wait_ms_total / write_count, 3) if write_count else None,
+        },
+        "models": model_health_stats()["models"],
+        "mock": mock_stats,
+    }
+
+def _print_report(report: dict):
+    print(f"\nJobs: {report['succeeded']}/{report['jobs']} succeeded at concurrency {report['concurrency']} "
+          f"in {report['wall_s']}s -> {report['jobs_per_min']} jobs/min")
+    print(f"{'stage':<8}{'count':>7}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}{'max s':>10}")
+    for name, s in [*report["stages"].items(), ("job", report["job"])]:
+        print(f"{name:<8}{s['count']:>7}" + "".join(f"{'-' if s[k] is None else s[k]:>10}" for k in ("p50_s", "p95_s", "p99_s", "max_s")))
+    w = report["db_write"]
+    print(f"DB writes: {w['writes']} in {w['batches']} commit(s), {w['exec_s_total']}s executing "
+          f"({w['exec_share_of_wall']} of wall time), {w['wait_ms_avg']} ms avg queue wait")
+    if report["mock"]:
+        m = report["mock"]
+        print(f"Mock: {m['requests']} request(s), {m['replayed']} replayed, {m['synthesized']} synthesized, "
+              f"{m['errors']} HTTP 500, {m['throttled']} HTTP 429")
+    for error in report["errors"]:
+        print(f"error: {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the assessment pipeline against a local OpenRouter stand-in.")
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--db", default=None, help="scratch database path (default: a temporary file)")
+    parser.add_argument("--source-db", default=None, help="copy this database and replay its recorded llm_runs_v2 responses")
+    parser.add_argument("--base-url", default=None, help="use a running OpenRouter-compatible server instead of starting the mock")
+    parser.add_argument("--keep-caches", action="store_true", help="leave the LLM response and requirement caches enabled")
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline INFO logs")
+    parser.add_argument("--latency-median", type=float, default=0.5)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--replay-latency", action="store_true")
+    parser.add_argument("--model-profiles", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scratch_dir = None
+    if args.db is None:
+        scratch_dir = tempfile.mkdtemp(prefix="job-search-benchmark-")
+        args.db = os.path.join(scratch_dir, "benchmark.db")
+    elif os.path.exists(args.db):
+        parser.error(f"--db {args.db} already exists; the benchmark needs a fresh scratch database")
+    if args.source_db:
+        # Consistent snapshot even while the API is writing to the source database
+        with sqlite3.connect(args.source_db) as source, sqlite3.connect(args.db) as target:
+            source.backup(target)
+    args.mock_port = _free_port()
+
+    os.environ["DB_FILE"] = args.db
+    os.environ["OPENROUTER_BASE_URL"] = args.base_url or f"http://127.0.0.1:{args.mock_port}/api/v1"
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    if not args.keep_caches:
+        os.environ["LLM_CACHE_ENABLED"] = "0"
+        os.environ["REQUIREMENT_CACHE_ENABLED"] = "0"
+    if not args.verbose:
+        logging.getLogger("backend").setLevel(logging.WARNING)
+
+    try:
+        report = asyncio.run(_run(args))
+    finally:
+        if scratch_dir is not None:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+    _print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
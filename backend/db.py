@@ -1,66 +1,412 @@
-from typing import Optional
+import os
+import json
+import time
+import zlib
+import hashlib
+import asyncio
+import urllib.parse
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
 import aiosqlite
 
 from .utilities import setup_logging, get_logger
+from .db_migrations import apply_migrations
+
+try:  # optional: better ratio/speed than zlib for LLM run blobs
+    import zstandard
+except ImportError:  # pragma: no cover - depends on environment
+    zstandard = None
 
 setup_logging()
 logger = get_logger(__name__)
 
-DB_FILE = "job_tracker.db"
+DB_FILE = os.getenv("DB_FILE", "job_tracker.db")
 SQL_DIR = "sql"
 
+# Connection pool configuration (env-overridable)
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+DB_WRITE_QUEUE_MAXSIZE = int(os.getenv("DB_WRITE_QUEUE_MAXSIZE", "1000"))
+DB_WRITE_BATCH_MAX_SIZE = int(os.getenv("DB_WRITE_BATCH_MAX_SIZE", "64"))
+DB_WRITE_BATCH_MAX_LATENCY_MS = float(os.getenv("DB_WRITE_BATCH_MAX_LATENCY_MS", "2"))
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "3"))
+DB_STREAM_BATCH_SIZE = int(os.getenv("DB_STREAM_BATCH_SIZE", "500"))
+
+# Content-addressed storage of llm_runs_v2 inputs/outputs (see llm_blob)
+LLM_RUN_BLOB_STORE = os.getenv("LLM_RUN_BLOB_STORE", "1") == "1"
+LLM_BLOB_COMPRESSION = os.getenv("LLM_BLOB_COMPRESSION", "zlib").lower()  # zlib | zstd | none
+LLM_BLOB_MIN_COMPRESS_BYTES = int(os.getenv("LLM_BLOB_MIN_COMPRESS_BYTES", "256"))
+
+WriteCommand = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
 class Database:
+    """Process-wide database access point.
+
+    Reads are served from a pool of read-only WAL connections so that long
+    dashboard queries do not block each other or the writer. All writes are
+    funnelled through a single writer connection owned by a background task
+    which executes queued commands strictly in submission order. Commands that
+    are queued together are group-committed: each runs inside its own savepoint
+    and the whole batch shares a single COMMIT (and fsync).
+    """
     _instance = None
+    _instance_lock = asyncio.Lock()
     _connection = None
 
+    def __init__(
+        self,
+        read_pool_size: int = DB_READ_POOL_SIZE,
+        write_queue_maxsize: int = DB_WRITE_QUEUE_MAXSIZE,
+        write_batch_max_size: int = DB_WRITE_BATCH_MAX_SIZE,
+        write_batch_max_latency_ms: float = DB_WRITE_BATCH_MAX_LATENCY_MS,
+    ):
+        self.read_pool_size = max(1, read_pool_size)
+        self.write_queue_maxsize = write_queue_maxsize
+        self.write_batch_max_size = max(1, write_batch_max_size)
+        self.write_batch_max_latency = max(0.0, write_batch_max_latency_ms) / 1000
+        self._readers: list[aiosqlite.Connection] = []
+        self._reader_queue: Optional[asyncio.Queue] = None
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._read_waiters = 0
+        self._read_acquisitions = 0
+        self._read_wait_total = 0.0
+        self._read_wait_max = 0.0
+        self._writes_completed = 0
+        self._writes_failed = 0
+        self._write_wait_total = 0.0
+        self._write_wait_max = 0.0
+        self._write_exec_total = 0.0
+        self._write_batches = 0
+        self._write_batch_max = 0
+        self._read_uri = ""
+        self._streams_open = 0
+
     @classmethod
     async def get_instance(cls):
         if cls._instance is None:
-            cls._instance = cls()
-            await cls._instance.connect()
+            async with cls._instance_lock:
+                if cls._instance is None:
+                    instance = cls()
+                    await instance.connect()
+                    cls._instance = instance
         return cls._instance
 
     async def connect(self):
         if self._connection is None:
-            self._connection = await aiosqlite.connect(DB_FILE, timeout=3)
+            # The writer runs in autocommit mode; the writer task issues BEGIN/COMMIT explicitly.
+            self._connection = await aiosqlite.connect(DB_FILE, timeout=DB_CONNECT_TIMEOUT, isolation_level=None)
             await self._connection.execute("PRAGMA journal_mode=WAL;")
             await self._connection.execute("PRAGMA foreign_keys = ON;")
             self._connection.row_factory = aiosqlite.Row
-            logger.info("Database connection established.")
+            # Bring the schema up to date before the writer starts accepting commands. A failed migration
+            # is fatal: serving a half-migrated schema only fails later somewhere unrelated.
+            try:
+                await apply_migrations(self._connection)
+            except Exception:
+                await self._connection.close()
+                self._connection = None
+                raise
+            self._write_queue = asyncio.Queue(maxsize=self.write_queue_maxsize)
+            self._writer_task = asyncio.create_task(self._writer_loop(), name="db-writer")
+
+            self._read_uri = f"file:{urllib.parse.quote(os.path.abspath(DB_FILE))}?mode=ro"
+            self._reader_queue = asyncio.Queue()
+            for _ in range(self.read_pool_size):
+                reader = await self._open_reader()
+                self._readers.append(reader)
+                self._reader_queue.put_nowait(reader)
+            logger.info(f"Database connection established (1 writer, {self.read_pool_size} reader(s)).")
 
     async def close(self):
+        if self._writer_task is not None and self._write_queue is not None:
+            if not self._writer_task.done():
+                # Sentinel lets the writer drain everything queued before it.
+                await self._write_queue.put(None)
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                # The writer was cancelled earlier and has failed its pending writes; only a
+                # cancellation of close() itself propagates
+                if asyncio.current_task().cancelling():  # type: ignore
+                    raise
+            except Exception as e:
+                logger.error(f"Database writer had stopped with an error: {e}")
+            self._writer_task = None
+        for reader in self._readers:
+            await reader.close()
+        self._readers = []
+        self._reader_queue = None
         if self._connection:
             await self._connection.close()
             self._connection = None
             logger.info("Database connection closed.")
+        if Database._instance is self:
+            Database._instance = None
 
     @property
     def connection(self):
         return self._connection
 
-async def get_db():
+    async def _open_reader(self) -> aiosqlite.Connection:
+        reader = await aiosqlite.connect(self._read_uri, uri=True, timeout=DB_CONNECT_TIMEOUT)
+        await reader.execute("PRAGMA query_only = ON;")
+        reader.row_factory = aiosqlite.Row
+        return reader
+
+    @asynccontextmanager
+    async def stream_reader(self):
+        """Open a dedicated read-only connection for a long-running scan.
+
+        Streams (exports, backfills) can stay open for as long as the consumer takes, so
+        they get their own connection instead of holding one of the pooled readers.
+        """
+        if self._connection is None:
+            raise RuntimeError("Database connection is not initialized.")
+        conn = await self._open_reader()
+        self._streams_open += 1
+        try:
+            yield conn
+        finally:
+            self._streams_open -= 1
+            await conn.close()
+
+    @asynccontextmanager
+    async def reader(self):
+        """Borrow a read-only connection from the pool for the duration of the block."""
+        if self._reader_queue is None:
+            raise RuntimeError("Database reader pool is not initialized.")
+        started = time.perf_counter()
+        self._read_waiters += 1
+        try:
+            conn = await self._reader_queue.get()
+        finally:
+            self._read_waiters -= 1
+        waited = time.perf_counter() - started
+        self._read_acquisitions += 1
+        self._read_wait_total += waited
+        self._read_wait_max = max(self._read_wait_max, waited)
+        try:
+            yield conn
+        finally:
+            self._reader_queue.put_nowait(conn)
+
+    async def enqueue_write(self, command: WriteCommand) -> asyncio.Future:
+        """Queue a write command for the writer connection.
+
+        Returns a future that resolves to the command's return value once the
+        batch containing it has been committed, or raises the command's exception
+        if it failed (in which case only that command's changes are rolled back).
+        The command receives the writer connection and must not commit or roll
+        back itself.
+        """
+        if self._write_queue is None or self._writer_task is None:
+            raise RuntimeError("Database writer is not running. Did you forget to call Database.get_instance()?")
+        if self._writer_task.done():
+            raise RuntimeError("Database writer has stopped; writes cannot be processed.")
+        future = asyncio.get_running_loop().create_future()
+        await self._write_queue.put((command, future, time.perf_counter()))
+        if self._writer_task.done():
+            # The writer stopped while we were waiting for queue space; nothing will pick this up
+            self._fail_pending([], RuntimeError("Database writer has stopped; writes cannot be processed."))
+        return future
+
+    async def submit_write(self, command: WriteCommand) -> Any:
+        """Queue a write command and wait until it is durable."""
+        return await (await self.enqueue_write(command))
+
+    async def _collect_batch(self) -> tuple[list, bool]:
+        """Wait for the next write and gather any others arriving within the latency window."""
+        queue: asyncio.Queue = self._write_queue  # type: ignore
+        first = await queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+
+        def _drain() -> bool:
+            while len(batch) < self.write_batch_max_size and not queue.empty():
+                item = queue.get_nowait()
+                if item is None:
+                    return True
+                batch.append(item)
+            return False
+
+        if _drain():
+            return batch, True
+        if len(batch) < self.write_batch_max_size and self.write_batch_max_latency > 0:
+            await asyncio.sleep(self.write_batch_max_latency)
+            if _drain():
+                return batch, True
+        return batch, False
+
+    def _fail_pending(self, batch: list, error: BaseException):
+        """Fail the futures of `batch` and of every queued write, so no caller waits forever."""
+        pending = list(batch)
+        queue = self._write_queue
+        while queue is not None and not queue.empty():
+            item = queue.get_nowait()
+            if item is not None:
+                pending.append(item)
+        for _, future, _ in pending:
+            if not future.done():
+                self._writes_failed += 1
+                future.set_exception(error)
+
+    async def _writer_loop(self):
+        batch: list = []
+        error: BaseException = RuntimeError("Database writer has stopped; writes cannot be processed.")
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = await self._collect_batch()
+                if batch:
+                    await self._run_batch(batch)
+                batch = []
+        except asyncio.CancelledError:
+            logger.warning("Database writer cancelled before close(); failing pending writes.")
+            raise
+        except BaseException as e:
+            logger.exception(f"Database writer stopped unexpectedly: {e}")
+            error = RuntimeError(f"Database writer has stopped: {e}")
+            error.__cause__ = e
+            raise
+        finally:
+            # Whatever is in flight or still queued can no longer be committed
+            self._fail_pending(batch, error)
+
+    async def _run_batch(self, batch: list):
+        """Commit `batch` in one transaction, with a savepoint per command, and resolve its futures."""
+        conn = self._connection
+        started = time.perf_counter()
+        outcomes: list[tuple[asyncio.Future, bool, Any]] = []
+        try:
+            await conn.execute("BEGIN IMMEDIATE")  # type: ignore
+            for command, future, enqueued_at in batch:
+                waited = started - enqueued_at
+                self._write_wait_total += waited
+                self._write_wait_max = max(self._write_wait_max, waited)
+                # A savepoint per command keeps one caller's failure from discarding the others' work
+                await conn.execute("SAVEPOINT write_command")  # type: ignore
+                try:
+                    result = await command(conn)  # type: ignore
+                except Exception as e:
+                    await conn.execute("ROLLBACK TO write_command")  # type: ignore
+                    await conn.execute("RELEASE write_command")  # type: ignore
+                    outcomes.append((future, False, e))
+                else:
+                    await conn.execute("RELEASE write_command")  # type: ignore
+                    outcomes.append((future, True, result))
+            await conn.execute("COMMIT")  # type: ignore
+        except Exception as e:
+            logger.exception(f"Write batch of {len(batch)} command(s) failed to commit: {e}")
+            try:
+                if conn.in_transaction:  # type: ignore
+                    await conn.execute("ROLLBACK")  # type: ignore
+            except Exception as rollback_error:
+                logger.error(f"Rollback of the failed write batch also failed: {rollback_error}")
+            self._writes_failed += len(batch)
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for future, ok, value in outcomes:
+                if ok:
+                    self._writes_completed += 1
+                    if not future.done():
+                        future.set_result(value)
+                else:
+                    self._writes_failed += 1
+                    if not future.done():
+                        future.set_exception(value)
+        finally:
+            self._write_batches += 1
+            self._write_batch_max = max(self._write_batch_max, len(batch))
+            self._write_exec_total += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        """Return pool sizing, queue depth and wait-time statistics."""
+        available = self._reader_queue.qsize() if self._reader_queue is not None else 0
+        writes = self._writes_completed + self._writes_failed
+        return {
+            "read_pool_size": self.read_pool_size,
+            "read_pool_available": available,
+            "read_pool_in_use": self.read_pool_size - available if self._reader_queue is not None else 0,
+            "read_waiters": self._read_waiters,
+            "read_acquisitions": self._read_acquisitions,
+            "read_wait_ms_avg": (self._read_wait_total / self._read_acquisitions * 1000) if self._read_acquisitions else 0.0,
+            "read_wait_ms_max": self._read_wait_max * 1000,
+            "read_streams_open": self._streams_open,
+            "write_queue_depth": self._write_queue.qsize() if self._write_queue is not None else 0,
+            "write_queue_maxsize": self.write_queue_maxsize,
+            "writes_completed": self._writes_completed,
+            "writes_failed": self._writes_failed,
+            "write_wait_ms_avg": (self._write_wait_total / writes * 1000) if writes else 0.0,
+            "write_wait_ms_max": self._write_wait_max * 1000,
+            "write_batches": self._write_batches,
+            "write_batch_size_avg": (writes / self._write_batches) if self._write_batches else 0.0,
+            "write_batch_size_max": self._write_batch_max,
+            "write_batch_max_size": self.write_batch_max_size,
+            "write_batch_max_latency_ms": self.write_batch_max_latency * 1000,
+            "write_batch_exec_ms_avg": (self._write_exec_total / self._write_batches * 1000) if self._write_batches else 0.0,
+            "write_exec_s_total": self._write_exec_total,
+        }
+
+@asynccontextmanager
+async def read_connection():
+    """Yield a pooled read-only connection."""
     db_instance = await Database.get_instance()
-    if db_instance.connection is None:
-        raise RuntimeError("Database connection is not initialized. Did you forget to start the app or call Database.get_instance()?")
-    return db_instance.connection
+    async with db_instance.reader() as conn:
+        yield conn
+
+async def run_write(command: WriteCommand) -> Any:
+    """Run `command(connection)` on the writer connection and wait until it is committed."""
+    db_instance = await Database.get_instance()
+    return await db_instance.submit_write(command)
+
+async def queue_write(command: WriteCommand) -> asyncio.Future:
+    """Queue `command(connection)` without waiting; await the returned future for durability."""
+    db_instance = await Database.get_instance()
+    return await db_instance.enqueue_write(command)
+
+# --- Job change notifications ---
+JobChangeListener = Callable[[str], None]
+_job_change_listeners: list[JobChangeListener] = []
+
+def add_job_change_listener(listener: JobChangeListener):
+    """Register a callback invoked with a job_id after a committed write changes that job's
+    details, skills, quarantine state or assessment runs (e.g. to invalidate caches)."""
+    _job_change_listeners.append(listener)
+
+def remove_job_change_listener(listener: JobChangeListener):
+    if listener in _job_change_listeners:
+        _job_change_listeners.remove(listener)
+
+def _notify_job_changed(*job_ids: Optional[str]):
+    for job_id in set(job_ids):
+        if job_id is None:
+            continue
+        for listener in list(_job_change_listeners):
+            try:
+                listener(job_id)
+            except Exception as e:
+                logger.error(f"Job change listener failed for job_id {job_id}: {e}")
 
 async def upsert_job_run(job_run_id: str, job_run_timestamp: int, job_run_keywords: Optional[str] = None):
     """
     Upserts a record into the job_runs table.
     If a record with the same job_run_id exists, it will be replaced.
     """
-    db = await get_db()
-    await db.execute(
-        """
-        INSERT INTO job_runs (job_run_id, job_run_timestamp, job_run_keywords)
-        VALUES (?, ?, ?)
-        ON CONFLICT(job_run_id) DO UPDATE SET
-            job_run_timestamp=excluded.job_run_timestamp,
-            job_run_keywords=excluded.job_run_keywords;
-        """,
-        (job_run_id, job_run_timestamp, job_run_keywords)
-    )
-    await db.commit()
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO job_runs (job_run_id, job_run_timestamp, job_run_keywords)
+            VALUES (?, ?, ?)
+            ON CONFLICT(job_run_id) DO UPDATE SET
+                job_run_timestamp=excluded.job_run_timestamp,
+                job_run_keywords=excluded.job_run_keywords;
+            """,
+            (job_run_id, job_run_timestamp, job_run_keywords)
+        )
+    await run_write(_write)
     # logger.info(f"Upserted job_run: {job_run_id}")
 
 
@@ -80,17 +426,18 @@ async def upsert_job_detail(
     """
     Upserts a record into the job_details table.
     """
-    db = await get_db()
-    await db.execute(
-        """
-        INSERT INTO job_details (
-            job_id, job_title, job_company, job_location, job_salary, job_url, job_url_direct, job_description, job_applied, job_applied_timestamp
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(job_id) DO NOTHING;
-        """,
-        (job_id, job_title, job_company, job_location, job_salary, job_url, job_url_direct, job_description, job_applied, job_applied_timestamp)
-    )
-    await db.commit()
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO job_details (
+                job_id, job_title, job_company, job_location, job_salary, job_url, job_url_direct, job_description, job_applied, job_applied_timestamp
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id) DO NOTHING;
+            """,
+            (job_id, job_title, job_company, job_location, job_salary, job_url, job_url_direct, job_description, job_applied, job_applied_timestamp)
+        )
+    await run_write(_write)
+    _notify_job_changed(job_id)
     # logger.info(f"Inserted job_detail (if not exists): {job_id}")
 
 # Insert new function to upsert job_description to job_details table
@@ -101,17 +448,18 @@ async def upsert_job_description(job_id: str, job_description: str):
     If the job_id does not exist, it will insert a new row with only job_id and job_description.
     If the job_id exists, it will update the job_description.
     """
-    db = await get_db()
-    await db.execute(
-        """
-        INSERT INTO job_details (job_id, job_description)
-        VALUES (?, ?)
-        ON CONFLICT(job_id) DO UPDATE SET
-            job_description=excluded.job_description;
-        """,
-        (job_id, job_description)
-    )
-    await db.commit()
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO job_details (job_id, job_description)
+            VALUES (?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET
+                job_description=excluded.job_description;
+            """,
+            (job_id, job_description)
+        )
+    await run_write(_write)
+    _notify_job_changed(job_id)
     # logger.info(f"Upserted job_description for job_id: {job_id}")
 
 # --- Update applied status for a job ---
@@ -128,38 +476,42 @@ async def update_job_applied(
     """
     # Normalize applied to 0/1 defensively
     applied_val = 1 if applied == 1 else 0
-    db = await get_db()
-    cursor = await db.execute(
-        """
-        UPDATE job_details
-        SET job_applied = ?,
-            job_applied_timestamp = COALESCE(?, CAST(strftime('%s','now') AS INTEGER))
-        WHERE job_id = ?
-        """,
-        (applied_val, applied_timestamp, job_id),
-    )
-    await db.commit()
+    async def _write(db):
+        cursor = await db.execute(
+            """
+            UPDATE job_details
+            SET job_applied = ?,
+                job_applied_timestamp = COALESCE(?, CAST(strftime('%s','now') AS INTEGER))
+            WHERE job_id = ?
+            """,
+            (applied_val, applied_timestamp, job_id),
+        )
+        return cursor.rowcount or 0
+    rowcount = await run_write(_write)
+    _notify_job_changed(job_id)
     logger.info(f"Updated job_applied={applied_val} for job_id: {job_id}")
-    return cursor.rowcount or 0
+    return rowcount
 
 async def clear_job_applied(job_id: str) -> int:
     """
     Clears the applied status for a job: sets job_applied=0 and job_applied_timestamp=NULL.
     Returns number of rows updated.
     """
-    db = await get_db()
-    cursor = await db.execute(
-        """
-        UPDATE job_details
-        SET job_applied = 0,
-            job_applied_timestamp = NULL
-        WHERE job_id = ?
-        """,
-        (job_id,),
-    )
-    await db.commit()
+    async def _write(db):
+        cursor = await db.execute(
+            """
+            UPDATE job_details
+            SET job_applied = 0,
+                job_applied_timestamp = NULL
+            WHERE job_id = ?
+            """,
+            (job_id,),
+        )
+        return cursor.rowcount or 0
+    rowcount = await run_write(_write)
+    _notify_job_changed(job_id)
     logger.info(f"Cleared job_applied for job_id: {job_id}")
-    return cursor.rowcount or 0
+    return rowcount
 
 # --- Upsert for document_store ---
 async def upsert_document(
@@ -173,20 +525,20 @@ async def upsert_document(
     """
     Upserts a record into the document_store table.
     """
-    db = await get_db()
-    await db.execute(
-        """
-        INSERT INTO document_store (
-            document_id, document_name, document_timestamp, document_markdown
-        ) VALUES (?, ?, ?, ?)
-        ON CONFLICT(document_id) DO UPDATE SET
-            document_name=excluded.document_name,
-            document_timestamp=excluded.document_timestamp,
-            document_markdown=excluded.document_markdown;
-        """,
-        (document_id, document_name, document_timestamp, document_markdown)
-    )
-    await db.commit()
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO document_store (
+                document_id, document_name, document_timestamp, document_markdown
+            ) VALUES (?, ?, ?, ?)
+            ON CONFLICT(document_id) DO UPDATE SET
+                document_name=excluded.document_name,
+                document_timestamp=excluded.document_timestamp,
+                document_markdown=excluded.document_markdown;
+            """,
+            (document_id, document_name, document_timestamp, document_markdown)
+        )
+    await run_write(_write)
     # logger.info(f"Upserted document: {document_id}")
 
 # --- Upsert for run_findings ---
@@ -199,19 +551,19 @@ async def upsert_run_finding(
     """
     Upserts a record into the run_findings table.
     """
-    db = await get_db()
-    await db.execute(
-        """
-        INSERT INTO run_findings (
-            job_run_id, job_id, job_run_page_num, job_run_rank
-        ) VALUES (?, ?, ?, ?)
-        ON CONFLICT(job_run_id, job_id) DO UPDATE SET
-            job_run_page_num=excluded.job_run_page_num,
-            job_run_rank=excluded.job_run_rank;
-        """,
-        (job_run_id, job_id, job_run_page_num, job_run_rank)
-    )
-    await db.commit()
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO run_findings (
+                job_run_id, job_id, job_run_page_num, job_run_rank
+            ) VALUES (?, ?, ?, ?)
+            ON CONFLICT(job_run_id, job_id) DO UPDATE SET
+                job_run_page_num=excluded.job_run_page_num,
+                job_run_rank=excluded.job_run_rank;
+            """,
+            (job_run_id, job_id, job_run_page_num, job_run_rank)
+        )
+    await run_write(_write)
     # logger.info(f"Upserted run_finding: ({job_run_id}, {job_id})")
 
 async def upsert_llm_model(
@@ -220,27 +572,30 @@ async def upsert_llm_model(
     model_provider: Optional[str] = None,
     model_cpmt_prompt: Optional[float] = None,
     model_cpmt_completion: Optional[float] = None,
-    model_cpmt_thinking: Optional[float] = None
+    model_cpmt_thinking: Optional[float] = None,
+    model_cpmt_cached: Optional[float] = None
 ):
     """
     Upserts a record into the llm_models table.
     """
-    db = await get_db()
-    await db.execute(
-        """
-        INSERT INTO llm_models (
-            model_id, model_name, model_provider, model_cpmt_prompt, model_cpmt_completion, model_cpmt_thinking
-        ) VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(model_id) DO UPDATE SET
-            model_name=excluded.model_name,
-            model_provider=excluded.model_provider,
-            model_cpmt_prompt=excluded.model_cpmt_prompt,
-            model_cpmt_completion=excluded.model_cpmt_completion,
-            model_cpmt_thinking=excluded.model_cpmt_thinking;
-        """,
-        (model_id, model_name, model_provider, model_cpmt_prompt, model_cpmt_completion, model_cpmt_thinking)
-    )
-    await db.commit()
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO llm_models (
+                model_id, model_name, model_provider, model_cpmt_prompt, model_cpmt_completion, model_cpmt_thinking,
+                model_cpmt_cached
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(model_id) DO UPDATE SET
+                model_name=excluded.model_name,
+                model_provider=excluded.model_provider,
+                model_cpmt_prompt=excluded.model_cpmt_prompt,
+                model_cpmt_completion=excluded.model_cpmt_completion,
+                model_cpmt_thinking=excluded.model_cpmt_thinking,
+                model_cpmt_cached=excluded.model_cpmt_cached;
+            """,
+            (model_id, model_name, model_provider, model_cpmt_prompt, model_cpmt_completion, model_cpmt_thinking, model_cpmt_cached)
+        )
+    await run_write(_write)
     # logger.info(f"Upserted llm_model: {model_id}")
 
 # --- Upsert for llm_runs ---
@@ -260,33 +615,33 @@ async def upsert_llm_run(
     """
     Upserts a record into the llm_runs table.
     """
-    db = await get_db()
-    await db.execute(
-        """
-        INSERT INTO llm_runs (
-            llm_run_id, llm_run_type, llm_model_id, job_id, llm_prompt_document_id,
-            llm_run_prompt_tokens, llm_run_completion_tokens, llm_run_thinking_tokens, llm_run_total_tokens,
-            assessment_id_link, generated_document_id_link
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(llm_run_id) DO UPDATE SET
-            llm_run_type=excluded.llm_run_type,
-            llm_model_id=excluded.llm_model_id,
-            job_id=excluded.job_id,
-            llm_prompt_document_id=excluded.llm_prompt_document_id,
-            llm_run_prompt_tokens=excluded.llm_run_prompt_tokens,
-            llm_run_completion_tokens=excluded.llm_run_completion_tokens,
-            llm_run_thinking_tokens=excluded.llm_run_thinking_tokens,
-            llm_run_total_tokens=excluded.llm_run_total_tokens,
-            assessment_id_link=excluded.assessment_id_link,
-            generated_document_id_link=excluded.generated_document_id_link;
-        """,
-        (
-            llm_run_id, llm_run_type, llm_model_id, job_id, llm_prompt_document_id,
-            llm_run_prompt_tokens, llm_run_completion_tokens, llm_run_thinking_tokens, llm_run_total_tokens,
-            assessment_id_link, generated_document_id_link
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO llm_runs (
+                llm_run_id, llm_run_type, llm_model_id, job_id, llm_prompt_document_id,
+                llm_run_prompt_tokens, llm_run_completion_tokens, llm_run_thinking_tokens, llm_run_total_tokens,
+                assessment_id_link, generated_document_id_link
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(llm_run_id) DO UPDATE SET
+                llm_run_type=excluded.llm_run_type,
+                llm_model_id=excluded.llm_model_id,
+                job_id=excluded.job_id,
+                llm_prompt_document_id=excluded.llm_prompt_document_id,
+                llm_run_prompt_tokens=excluded.llm_run_prompt_tokens,
+                llm_run_completion_tokens=excluded.llm_run_completion_tokens,
+                llm_run_thinking_tokens=excluded.llm_run_thinking_tokens,
+                llm_run_total_tokens=excluded.llm_run_total_tokens,
+                assessment_id_link=excluded.assessment_id_link,
+                generated_document_id_link=excluded.generated_document_id_link;
+            """,
+            (
+                llm_run_id, llm_run_type, llm_model_id, job_id, llm_prompt_document_id,
+                llm_run_prompt_tokens, llm_run_completion_tokens, llm_run_thinking_tokens, llm_run_total_tokens,
+                assessment_id_link, generated_document_id_link
+            )
         )
-    )
-    await db.commit()
+    await run_write(_write)
     # logger.info(f"Upserted llm_run: {llm_run_id}")
 
 # --- Upsert for job_quarantine ---
@@ -300,23 +655,39 @@ async def upsert_job_quarantine(
     Upserts a record into the job_quarantine table.
     If a record with the same job_quarantine_id exists, it will be replaced.
     """
-    db = await get_db()
-    await db.execute(
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO job_quarantine (
+                job_quarantine_id, job_id, job_quarantine_reason, job_quarantine_timestamp
+            ) VALUES (?, ?, ?, COALESCE(?, strftime('%s', 'now')))
+            ON CONFLICT(job_quarantine_id) DO UPDATE SET
+                job_id=excluded.job_id,
+                job_quarantine_reason=excluded.job_quarantine_reason,
+                job_quarantine_timestamp=excluded.job_quarantine_timestamp;
+            """,
+            (job_quarantine_id, job_id, job_quarantine_reason, job_quarantine_timestamp)
+        )
+    await run_write(_write)
+    _notify_job_changed(job_id)
+    logger.info(f"Upserted job_quarantine: {job_quarantine_id}")
+
+# --- Upsert for job_skills ---
+async def _refresh_job_search_skills(db, job_ids) -> None:
+    """
+    Recomputes the job_search FTS skills column once per job, on the writer connection inside the
+    caller's transaction. Every job_skills write calls this after its last statement.
+    """
+    await db.executemany(
         """
-        INSERT INTO job_quarantine (
-            job_quarantine_id, job_id, job_quarantine_reason, job_quarantine_timestamp
-        ) VALUES (?, ?, ?, COALESCE(?, strftime('%s', 'now')))
-        ON CONFLICT(job_quarantine_id) DO UPDATE SET
-            job_id=excluded.job_id,
-            job_quarantine_reason=excluded.job_quarantine_reason,
-            job_quarantine_timestamp=excluded.job_quarantine_timestamp;
+        UPDATE job_search SET job_skills = (
+            SELECT group_concat(s.job_skills_atomic_string, ' | ') FROM job_skills s WHERE s.job_id = ?1
+        )
+        WHERE rowid = (SELECT docid FROM job_search_doc WHERE job_id = ?1);
         """,
-        (job_quarantine_id, job_id, job_quarantine_reason, job_quarantine_timestamp)
+        [(job_id,) for job_id in dict.fromkeys(job_ids) if job_id is not None],
     )
-    await db.commit()
-    logger.info(f"Upserted job_quarantine: {job_quarantine_id}")
 
-# --- Upsert for job_skills ---
 async def upsert_job_skills(
     job_skill_id: str,
     job_id: str,
@@ -330,33 +701,84 @@ async def upsert_job_skills(
     Upserts a record into the job_skills table.
     If a record with the same job_skill_id exists, it will be replaced.
     """
-    db = await get_db()
-    await db.execute(
-        """
-        INSERT INTO job_skills (
-            job_skill_id, job_id, job_skills_atomic_string, job_skills_type, job_skills_match_reasoning, job_skills_match, job_skills_resume_id
-        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(job_skill_id) DO UPDATE SET
-            job_id=excluded.job_id,
-            job_skills_atomic_string=excluded.job_skills_atomic_string,
-            job_skills_type=excluded.job_skills_type,
-            job_skills_match_reasoning=excluded.job_skills_match_reasoning,
-            job_skills_match=excluded.job_skills_match,
-            job_skills_resume_id=excluded.job_skills_resume_id;
-        """,
-        (
-            job_skill_id,
-            job_id,
-            job_skills_atomic_string,
-            job_skills_type,
-            job_skills_match_reasoning,
-            job_skills_match,
-            job_skills_resume_id
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO job_skills (
+                job_skill_id, job_id, job_skills_atomic_string, job_skills_type, job_skills_match_reasoning, job_skills_match, job_skills_resume_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_skill_id) DO UPDATE SET
+                job_id=excluded.job_id,
+                job_skills_atomic_string=excluded.job_skills_atomic_string,
+                job_skills_type=excluded.job_skills_type,
+                job_skills_match_reasoning=excluded.job_skills_match_reasoning,
+                job_skills_match=excluded.job_skills_match,
+                job_skills_resume_id=excluded.job_skills_resume_id;
+            """,
+            (
+                job_skill_id,
+                job_id,
+                job_skills_atomic_string,
+                job_skills_type,
+                job_skills_match_reasoning,
+                job_skills_match,
+                job_skills_resume_id
+            )
         )
-    )
-    await db.commit()
+        await _refresh_job_search_skills(db, [job_id])
+    await run_write(_write)
+    _notify_job_changed(job_id)
     # logger.info(f"Upserted job_skill: {job_skill_id}")
 
+async def upsert_job_skills_many(job_skills: list[dict], replace_for_job_id: Optional[str] = None) -> int:
+    """
+    Upserts many job_skills records with a single executemany in one transaction.
+    Each item uses the same keys as upsert_job_skills' parameters.
+    If replace_for_job_id is given, existing job_skills rows for that job_id are deleted
+    in the same transaction, so readers see either the old or the new skill list, never a mix.
+    Returns the number of rows written.
+    """
+    rows = [
+        (
+            skill["job_skill_id"],
+            skill["job_id"],
+            skill["job_skills_atomic_string"],
+            skill["job_skills_type"],
+            skill.get("job_skills_match_reasoning"),
+            skill.get("job_skills_match"),
+            skill.get("job_skills_resume_id"),
+            skill.get("job_skills_match_context"),
+        )
+        for skill in job_skills
+    ]
+    async def _write(db):
+        if replace_for_job_id is not None:
+            await db.execute("DELETE FROM job_skills WHERE job_id = ?", (replace_for_job_id,))
+        if rows:
+            await db.executemany(
+                """
+                INSERT INTO job_skills (
+                    job_skill_id, job_id, job_skills_atomic_string, job_skills_type, job_skills_match_reasoning, job_skills_match, job_skills_resume_id,
+                    job_skills_match_context
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(job_skill_id) DO UPDATE SET
+                    job_id=excluded.job_id,
+                    job_skills_atomic_string=excluded.job_skills_atomic_string,
+                    job_skills_type=excluded.job_skills_type,
+                    job_skills_match_reasoning=excluded.job_skills_match_reasoning,
+                    job_skills_match=excluded.job_skills_match,
+                    job_skills_resume_id=excluded.job_skills_resume_id,
+                    job_skills_match_context=excluded.job_skills_match_context;
+                """,
+                rows,
+            )
+        await _refresh_job_search_skills(db, [replace_for_job_id, *(row[1] for row in rows)])
+    await run_write(_write)
+    _notify_job_changed(replace_for_job_id, *(skill["job_id"] for skill in job_skills))
+    if replace_for_job_id is not None:
+        logger.info(f"Replaced job_skills for job_id {replace_for_job_id} with {len(rows)} row(s)")
+    return len(rows)
+
 # --- Upsert for prompts ---
 async def upsert_prompt(
     prompt_id: str,
@@ -367,44 +789,123 @@ async def upsert_prompt(
     prompt_temperature: Optional[float] = None,
     prompt_response_schema: Optional[str] = None,
     prompt_created_at: Optional[int] = None,
-    prompt_thinking_budget: Optional[int] = None
+    prompt_thinking_budget: Optional[int] = None,
+    prompt_fallback_model_ids: Optional[str] = None
 ):
     """
     Upserts a record into the prompt table.
     If a record with the same prompt_id exists, it will be replaced.
+    prompt_fallback_model_ids is a JSON array of model_ids tried after model_id (see model_health).
     """
-    db = await get_db()
-    await db.execute(
-        """
-        INSERT INTO prompt (
-            prompt_id, llm_run_type, model_id, prompt_system_prompt, prompt_template, prompt_temperature,
-            prompt_response_schema, prompt_created_at, prompt_thinking_budget
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(prompt_id) DO UPDATE SET
-            llm_run_type=excluded.llm_run_type,
-            model_id=excluded.model_id,
-            prompt_system_prompt=excluded.prompt_system_prompt,
-            prompt_template=excluded.prompt_template,
-            prompt_temperature=excluded.prompt_temperature,
-            prompt_response_schema=excluded.prompt_response_schema,
-            prompt_created_at=excluded.prompt_created_at,
-            prompt_thinking_budget=excluded.prompt_thinking_budget;
-        """,
-        (
-            prompt_id,
-            llm_run_type,
-            model_id,
-            prompt_system_prompt,
-            prompt_template,
-            prompt_temperature,
-            prompt_response_schema,
-            prompt_created_at,
-            prompt_thinking_budget
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO prompt (
+                prompt_id, llm_run_type, model_id, prompt_system_prompt, prompt_template, prompt_temperature,
+                prompt_response_schema, prompt_created_at, prompt_thinking_budget, prompt_fallback_model_ids
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(prompt_id) DO UPDATE SET
+                llm_run_type=excluded.llm_run_type,
+                model_id=excluded.model_id,
+                prompt_system_prompt=excluded.prompt_system_prompt,
+                prompt_template=excluded.prompt_template,
+                prompt_temperature=excluded.prompt_temperature,
+                prompt_response_schema=excluded.prompt_response_schema,
+                prompt_created_at=excluded.prompt_created_at,
+                prompt_thinking_budget=excluded.prompt_thinking_budget,
+                prompt_fallback_model_ids=excluded.prompt_fallback_model_ids;
+            """,
+            (
+                prompt_id,
+                llm_run_type,
+                model_id,
+                prompt_system_prompt,
+                prompt_template,
+                prompt_temperature,
+                prompt_response_schema,
+                prompt_created_at,
+                prompt_thinking_budget,
+                prompt_fallback_model_ids
+            )
         )
-    )
-    await db.commit()
+    await run_write(_write)
     # logger.info(f"Upserted prompt: {prompt_id}")
 
+# --- Content-addressed blobs for llm_runs_v2 ---
+def blob_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _encode_blob(text: str) -> tuple[str, str, int, bytes]:
+    """Return (hash, encoding, uncompressed size, stored bytes) for `text`."""
+    raw = text.encode("utf-8")
+    digest = hashlib.sha256(raw).hexdigest()
+    encoding, data = "identity", raw
+    if len(raw) >= LLM_BLOB_MIN_COMPRESS_BYTES:
+        if LLM_BLOB_COMPRESSION == "zstd" and zstandard is not None:
+            candidate, candidate_encoding = zstandard.ZstdCompressor().compress(raw), "zstd"
+        elif LLM_BLOB_COMPRESSION in ("zlib", "zstd"):
+            candidate, candidate_encoding = zlib.compress(raw, 6), "zlib"
+        else:
+            candidate, candidate_encoding = raw, "identity"
+        if len(candidate) < len(raw):
+            encoding, data = candidate_encoding, candidate
+    return digest, encoding, len(raw), data
+
+def _decode_blob(encoding: Optional[str], data: Optional[bytes]) -> Optional[str]:
+    if data is None:
+        return None
+    if encoding == "zlib":
+        raw = zlib.decompress(data)
+    elif encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("llm_blob row is zstd-compressed but the zstandard package is not installed.")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = bytes(data)
+    return raw.decode("utf-8")
+
+LLM_RUNS_V2_SELECT = """
+    SELECT
+        r.*,
+        bi.blob_encoding AS _input_encoding, bi.blob_data AS _input_data,
+        bo.blob_encoding AS _output_encoding, bo.blob_data AS _output_data,
+        bc.blob_encoding AS _context_encoding, bc.blob_data AS _context_data
+    FROM llm_runs_v2 r
+    LEFT JOIN llm_blob bi ON bi.blob_hash = r.llm_run_input_hash
+    LEFT JOIN llm_blob bo ON bo.blob_hash = r.llm_run_output_hash
+    LEFT JOIN llm_blob bc ON bc.blob_hash = r.llm_run_context_hash
+"""
+
+def _rehydrate_llm_run(row) -> dict:
+    """
+    Convert a LLM_RUNS_V2_SELECT row into a plain llm_runs_v2 dict with inline input/output text, plus
+    llm_run_context (the stable context message sent before the input, or None).
+    """
+    record = dict(row)
+    input_encoding, input_data = record.pop("_input_encoding"), record.pop("_input_data")
+    output_encoding, output_data = record.pop("_output_encoding"), record.pop("_output_data")
+    context_encoding, context_data = record.pop("_context_encoding"), record.pop("_context_data")
+    record["llm_run_context"] = _decode_blob(context_encoding, context_data)
+    if record.get("llm_run_input") is None and input_data is not None:
+        record["llm_run_input"] = _decode_blob(input_encoding, input_data)
+    if record.get("llm_run_output") is None and output_data is not None:
+        record["llm_run_output"] = _decode_blob(output_encoding, output_data)
+    return record
+
+async def gc_llm_blobs() -> int:
+    """Deletes llm_blob rows that no llm_runs_v2 row references (as input, output or context)."""
+    async def _write(db):
+        cursor = await db.execute(
+            """
+            DELETE FROM llm_blob
+            WHERE NOT EXISTS (SELECT 1 FROM llm_runs_v2 WHERE llm_run_input_hash = llm_blob.blob_hash)
+              AND NOT EXISTS (SELECT 1 FROM llm_runs_v2 WHERE llm_run_output_hash = llm_blob.blob_hash)
+              AND NOT EXISTS (SELECT 1 FROM llm_runs_v2 WHERE llm_run_context_hash = llm_blob.blob_hash);
+            """
+        )
+        return cursor.rowcount or 0
+    return await run_write(_write)
+
 # --- Upsert for llm_runs_v2 ---
 async def upsert_llm_run_v2(
     llm_run_id: str,
@@ -419,77 +920,234 @@ async def upsert_llm_run_v2(
     llm_run_thinking_tokens: Optional[int] = None,
     llm_run_total_tokens: Optional[int] = None,
     llm_run_start: Optional[float] = None,
-    llm_run_end: Optional[float] = None
+    llm_run_end: Optional[float] = None,
+    llm_run_cache_hit: bool = False,
+    llm_run_cached_tokens: Optional[int] = None,
+    llm_run_context: Optional[str] = None,
+    wait: bool = True,
 ):
     """
     Upserts a record into the llm_runs_v2 table.
     If a record with the same llm_run_id exists, it will be replaced.
+    With LLM_RUN_BLOB_STORE enabled, input/output text is stored once per distinct content in
+    llm_blob (optionally compressed) and referenced by hash; the inline columns are left NULL.
+    `llm_run_context` is the stable context message sent before the input (stage 3.1: the resume part of
+    the prompt). It gets its own blob, so it is stored once per distinct context rather than once per run;
+    without the blob store it is prepended to the inline input.
+    With wait=False the write is queued and this returns before it commits; it still commits
+    before any write queued after it.
     """
-    db = await get_db()
-    await db.execute(
-        """
-        INSERT INTO llm_runs_v2 (
-            llm_run_id, job_id, llm_run_type, llm_run_model_id, llm_run_system_prompt_id, llm_run_input, llm_run_output,
-            llm_run_input_tokens, llm_run_output_tokens, llm_run_thinking_tokens, llm_run_total_tokens,
-            llm_run_start, llm_run_end
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(llm_run_id) DO UPDATE SET
-            job_id=excluded.job_id,
-            llm_run_type=excluded.llm_run_type,
-            llm_run_model_id=excluded.llm_run_model_id,
-            llm_run_system_prompt_id=excluded.llm_run_system_prompt_id,
-            llm_run_input=excluded.llm_run_input,
-            llm_run_output=excluded.llm_run_output,
-            llm_run_input_tokens=excluded.llm_run_input_tokens,
-            llm_run_output_tokens=excluded.llm_run_output_tokens,
-            llm_run_thinking_tokens=excluded.llm_run_thinking_tokens,
-            llm_run_total_tokens=excluded.llm_run_total_tokens,
-            llm_run_start=excluded.llm_run_start,
-            llm_run_end=excluded.llm_run_end;
-        """,
-        (
-            llm_run_id,
-            job_id,
-            llm_run_type,
-            llm_run_model_id,
-            llm_run_system_prompt_id,
-            llm_run_input,
-            llm_run_output,
-            llm_run_input_tokens,
-            llm_run_output_tokens,
-            llm_run_thinking_tokens,
-            llm_run_total_tokens,
-            llm_run_start,
-            llm_run_end
+    blobs = []
+    input_hash = output_hash = context_hash = None
+    if LLM_RUN_BLOB_STORE:
+        if llm_run_context is not None:
+            encoded = _encode_blob(llm_run_context)
+            context_hash = encoded[0]
+            blobs.append(encoded)
+        if llm_run_input is not None:
+            encoded = _encode_blob(llm_run_input)
+            input_hash, llm_run_input = encoded[0], None
+            blobs.append(encoded)
+        if llm_run_output is not None:
+            encoded = _encode_blob(llm_run_output)
+            output_hash, llm_run_output = encoded[0], None
+            blobs.append(encoded)
+    elif llm_run_context is not None:
+        llm_run_input = llm_run_context + (llm_run_input or "")
+
+    async def _write(db):
+        if blobs:
+            await db.executemany(
+                """
+                INSERT INTO llm_blob (blob_hash, blob_encoding, blob_size, blob_data)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(blob_hash) DO NOTHING;
+                """,
+                blobs,
+            )
+        await db.execute(
+            """
+            INSERT INTO llm_runs_v2 (
+                llm_run_id, job_id, llm_run_type, llm_run_model_id, llm_run_system_prompt_id, llm_run_input, llm_run_output,
+                llm_run_input_tokens, llm_run_output_tokens, llm_run_thinking_tokens, llm_run_total_tokens,
+                llm_run_start, llm_run_end, llm_run_input_hash, llm_run_output_hash, llm_run_cache_hit, llm_run_cached_tokens,
+                llm_run_context_hash
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(llm_run_id) DO UPDATE SET
+                job_id=excluded.job_id,
+                llm_run_type=excluded.llm_run_type,
+                llm_run_model_id=excluded.llm_run_model_id,
+                llm_run_system_prompt_id=excluded.llm_run_system_prompt_id,
+                llm_run_input=excluded.llm_run_input,
+                llm_run_output=excluded.llm_run_output,
+                llm_run_input_tokens=excluded.llm_run_input_tokens,
+                llm_run_output_tokens=excluded.llm_run_output_tokens,
+                llm_run_thinking_tokens=excluded.llm_run_thinking_tokens,
+                llm_run_total_tokens=excluded.llm_run_total_tokens,
+                llm_run_start=excluded.llm_run_start,
+                llm_run_end=excluded.llm_run_end,
+                llm_run_input_hash=excluded.llm_run_input_hash,
+                llm_run_output_hash=excluded.llm_run_output_hash,
+                llm_run_cache_hit=excluded.llm_run_cache_hit,
+                llm_run_cached_tokens=excluded.llm_run_cached_tokens,
+                llm_run_context_hash=excluded.llm_run_context_hash;
+            """,
+            (
+                llm_run_id,
+                job_id,
+                llm_run_type,
+                llm_run_model_id,
+                llm_run_system_prompt_id,
+                llm_run_input,
+                llm_run_output,
+                llm_run_input_tokens,
+                llm_run_output_tokens,
+                llm_run_thinking_tokens,
+                llm_run_total_tokens,
+                llm_run_start,
+                llm_run_end,
+                input_hash,
+                output_hash,
+                1 if llm_run_cache_hit else 0,
+                llm_run_cached_tokens,
+                context_hash,
+            )
         )
-    )
-    await db.commit()
+    if wait:
+        await run_write(_write)
+        _notify_job_changed(job_id)
+        return
+
+    def _done(future: asyncio.Future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error(f"Queued llm_runs_v2 write {llm_run_id} failed: {future.exception()}")
+        else:
+            _notify_job_changed(job_id)
+    (await queue_write(_write)).add_done_callback(_done)
     # logger.info(f"Upserted llm_run_v2: {llm_run_id}")
 
 async def get_job_details() -> list[dict]:
-    db = await get_db()
-    async with db.execute("SELECT * FROM job_details") as cursor:
+    async with read_connection() as db, db.execute("SELECT * FROM job_details") as cursor:
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+
+JOB_DETAILS_COLUMNS = (
+    "job_id", "job_title", "job_company", "job_location", "job_salary", "job_url",
+    "job_url_direct", "job_description", "job_applied", "job_applied_timestamp",
+)
+# job_description holds the full markdown posting; listings leave it out unless asked for.
+JOB_DETAILS_DEFAULT_FIELDS = tuple(c for c in JOB_DETAILS_COLUMNS if c != "job_description")
+
+async def get_job_details_page(
+    after_job_id: Optional[str] = None,
+    limit: int = 100,
+    fields: Optional[list[str]] = None,
+) -> list[dict]:
+    """
+    Returns up to `limit` job_details rows ordered by job_id, starting after `after_job_id`
+    (keyset pagination on the primary key, so every page is an index range scan).
+    `fields` projects the selected columns (default JOB_DETAILS_DEFAULT_FIELDS); job_id is always included.
+    Raises ValueError for unknown field names.
+    """
+    requested = list(fields) if fields else list(JOB_DETAILS_DEFAULT_FIELDS)
+    unknown = [f for f in requested if f not in JOB_DETAILS_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown job_details field(s): {', '.join(unknown)}")
+    columns = ["job_id"] + [f for f in dict.fromkeys(requested) if f != "job_id"]
+    select = f"SELECT {', '.join(columns)} FROM job_details"
+    if after_job_id is None:
+        sql, params = f"{select} ORDER BY job_id LIMIT ?", (limit,)
+    else:
+        sql, params = f"{select} WHERE job_id > ? ORDER BY job_id LIMIT ?", (after_job_id, limit)
+    async with read_connection() as db, db.execute(sql, params) as cursor:
         rows = await cursor.fetchall()
         return [dict(row) for row in rows]
 
+# Column weights for bm25(): job_title, job_company, job_description, job_skills
+JOB_SEARCH_BM25_WEIGHTS = (10.0, 5.0, 1.0, 3.0)
+JOB_SEARCH_SNIPPET_TOKENS = int(os.getenv("JOB_SEARCH_SNIPPET_TOKENS", "16"))
+
+def _to_fts_query(text: str) -> str:
+    """
+    Converts free text into an FTS5 query: every word must match, the last word as a prefix
+    (so search-as-you-type works). Quotes neutralize FTS5 operators and punctuation.
+    """
+    terms = [t.replace('"', '""') for t in text.split()]
+    if not terms:
+        return ""
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+async def search_jobs(
+    query: str,
+    limit: int = 20,
+    offset: int = 0,
+    raw: bool = False,
+    highlight_start: str = "<mark>",
+    highlight_end: str = "</mark>",
+) -> dict:
+    """
+    Full-text search over job title, company, description and skills using the job_search FTS5 index.
+    Results are ranked by bm25 (title and company weigh more than description) and include a
+    highlighted title and the best-matching snippet.
+    With raw=True `query` is passed to FTS5 unchanged (AND/OR/NOT, "phrases", prefix*, column:term).
+    Returns {"total": int, "results": [...]}. Raises ValueError for an empty or malformed query.
+    """
+    match = query.strip() if raw else _to_fts_query(query)
+    if not match:
+        raise ValueError("Search query is empty.")
+    weights = ", ".join(str(w) for w in JOB_SEARCH_BM25_WEIGHTS)
+    sql = f"""
+        SELECT
+            d.job_id,
+            j.job_title,
+            j.job_company,
+            j.job_location,
+            j.job_url,
+            j.job_applied,
+            highlight(job_search, 0, :hs, :he) AS job_title_highlight,
+            snippet(job_search, -1, :hs, :he, '…', :tokens) AS snippet,
+            bm25(job_search, {weights}) AS score
+        FROM job_search
+        JOIN job_search_doc d ON d.docid = job_search.rowid
+        JOIN job_details j ON j.job_id = d.job_id
+        WHERE job_search MATCH :match
+        ORDER BY score
+        LIMIT :limit OFFSET :offset
+    """
+    params = {
+        "match": match, "hs": highlight_start, "he": highlight_end,
+        "tokens": JOB_SEARCH_SNIPPET_TOKENS, "limit": limit, "offset": offset,
+    }
+    try:
+        async with read_connection() as db:
+            async with db.execute("SELECT COUNT(*) FROM job_search WHERE job_search MATCH ?", (match,)) as cursor:
+                total = (await cursor.fetchone())[0]
+            async with db.execute(sql, params) as cursor:
+                rows = await cursor.fetchall()
+    except aiosqlite.OperationalError as e:
+        # fts5 syntax errors surface as OperationalError
+        raise ValueError(f"Invalid search query: {e}") from e
+    return {"total": total, "results": [dict(row) for row in rows]}
+
 async def get_job_detail_by_id(job_id: str) -> Optional[dict]:
     """
     Returns a single job_details row for the given job_id, or None if not found.
     """
-    db = await get_db()
-    async with db.execute("SELECT * FROM job_details WHERE job_id = ?", (job_id,)) as cursor:
+    async with read_connection() as db, db.execute("SELECT * FROM job_details WHERE job_id = ?", (job_id,)) as cursor:
         row = await cursor.fetchone()
         return dict(row) if row else None
 
 async def get_document_store() -> list[dict]:
-    db = await get_db()
-    async with db.execute("SELECT * FROM document_store") as cursor:
+    async with read_connection() as db, db.execute("SELECT * FROM document_store") as cursor:
         rows = await cursor.fetchall()
         return [dict(row) for row in rows]
 
 async def get_llm_models() -> list[dict]:
-    db = await get_db()
-    async with db.execute("SELECT * FROM llm_models") as cursor:
+    async with read_connection() as db, db.execute("SELECT * FROM llm_models") as cursor:
         rows = await cursor.fetchall()
         return [dict(row) for row in rows]
 
@@ -497,8 +1155,7 @@ async def get_document_prompt_generate_job_assessment() -> dict:
     """
     Returns the prompt for generating job assessment.
     """
-    db = await get_db()
-    async with db.execute("SELECT document_id, document_markdown FROM document_store WHERE document_name = 'prompt_generate_job_assessment' ORDER BY document_timestamp DESC") as cursor:
+    async with read_connection() as db, db.execute("SELECT document_id, document_markdown FROM document_store WHERE document_name = 'prompt_generate_job_assessment' ORDER BY document_timestamp DESC") as cursor:
         row = await cursor.fetchone()
         if row:
             return {"document_id": row["document_id"], "document_markdown": row["document_markdown"]}
@@ -510,8 +1167,7 @@ async def get_document_master_resume_json() -> dict:
     """
     Returns the master resume JSON content.
     """
-    db = await get_db()
-    async with db.execute("SELECT document_id, document_markdown FROM document_store WHERE document_name = 'master_resume_json' ORDER BY document_timestamp DESC") as cursor:
+    async with read_connection() as db, db.execute("SELECT document_id, document_markdown FROM document_store WHERE document_name = 'master_resume_json' ORDER BY document_timestamp DESC") as cursor:
         row = await cursor.fetchone()
         if row:
             return {"document_id": row["document_id"], "document_markdown": row["document_markdown"]}
@@ -523,8 +1179,7 @@ async def get_document_master_resume() -> dict:
     """
     Returns the master resume markdown content.
     """
-    db = await get_db()
-    async with db.execute("SELECT document_id, document_markdown FROM document_store WHERE document_name = 'master_resume' ORDER BY document_timestamp DESC") as cursor:
+    async with read_connection() as db, db.execute("SELECT document_id, document_markdown FROM document_store WHERE document_name = 'master_resume' ORDER BY document_timestamp DESC") as cursor:
         row = await cursor.fetchone()
         if row:
             return {"document_id": row["document_id"], "document_markdown": row["document_markdown"]}
@@ -533,8 +1188,7 @@ async def get_document_master_resume() -> dict:
             return {"document_id": None, "document_markdown": None}
         
 async def get_job_quarantine() -> list[str]:
-    db = await get_db()
-    async with db.execute("SELECT DISTINCT job_id FROM job_quarantine") as cursor:
+    async with read_connection() as db, db.execute("SELECT DISTINCT job_id FROM job_quarantine") as cursor:
         rows = await cursor.fetchall()
         if not rows:
             return []
@@ -544,15 +1198,13 @@ async def is_job_quarantined(job_id: str) -> bool:
     """
     Returns True if the given job_id exists in job_quarantine.
     """
-    db = await get_db()
-    async with db.execute("SELECT 1 FROM job_quarantine WHERE job_id = ? LIMIT 1", (job_id,)) as cursor:
+    async with read_connection() as db, db.execute("SELECT 1 FROM job_quarantine WHERE job_id = ? LIMIT 1", (job_id,)) as cursor:
         row = await cursor.fetchone()
         return row is not None
 
 async def get_last_assessed_at(job_id: str) -> Optional[int]:
     """Return the latest llm_run_end (epoch seconds) for a job_id from llm_runs_v2, or None."""
-    db = await get_db()
-    async with db.execute(
+    async with read_connection() as db, db.execute(
         "SELECT MAX(CAST(llm_run_end AS INTEGER)) AS last_ts FROM llm_runs_v2 WHERE job_id = ?",
         (job_id,),
     ) as cursor:
@@ -563,8 +1215,7 @@ async def get_last_assessed_at(job_id: str) -> Optional[int]:
 
 async def get_latest_quarantine(job_id: str) -> Optional[dict]:
     """Return the most recent quarantine record for a job_id with reason and timestamp."""
-    db = await get_db()
-    async with db.execute(
+    async with read_connection() as db, db.execute(
         """
         SELECT job_quarantine_reason, job_quarantine_timestamp
         FROM job_quarantine
@@ -582,32 +1233,81 @@ async def get_latest_quarantine(job_id: str) -> Optional[dict]:
             }
         return None
     
+async def get_job_view(job_id: str) -> Optional[dict]:
+    """
+    Returns everything GET /job/{job_id} needs in a single query, or None if the job does not exist:
+    {"job": <job_details row>, "skills": [<job_skills rows>], "last_assessed_at": int | None,
+     "quarantine": {"job_quarantine_reason", "job_quarantine_timestamp"} | None}
+    Skills are aggregated with json_group_array and the assessment/quarantine state comes from
+    job_assessment_summary, replacing five separate lookups.
+    """
+    async with read_connection() as db, db.execute(
+        """
+        SELECT
+            jd.*,
+            s.last_assessed_at AS _last_assessed_at,
+            COALESCE(s.quarantine_count, 0) AS _quarantine_count,
+            s.last_quarantine_reason AS _last_quarantine_reason,
+            s.last_quarantine_timestamp AS _last_quarantine_timestamp,
+            (
+                SELECT json_group_array(json_object(
+                    'job_skill_id', k.job_skill_id,
+                    'job_id', k.job_id,
+                    'job_skills_atomic_string', k.job_skills_atomic_string,
+                    'job_skills_type', k.job_skills_type,
+                    'job_skills_match_reasoning', k.job_skills_match_reasoning,
+                    'job_skills_match', k.job_skills_match,
+                    'job_skills_resume_id', k.job_skills_resume_id
+                ))
+                FROM (SELECT * FROM job_skills WHERE job_id = jd.job_id ORDER BY rowid) k
+            ) AS _skills_json
+        FROM job_details jd
+        LEFT JOIN job_assessment_summary s ON s.job_id = jd.job_id
+        WHERE jd.job_id = ?
+        """,
+        (job_id,),
+    ) as cursor:
+        row = await cursor.fetchone()
+    if not row:
+        return None
+    record = dict(row)
+    skills = json.loads(record.pop("_skills_json") or "[]")
+    last_assessed_at = record.pop("_last_assessed_at")
+    quarantine_count = record.pop("_quarantine_count")
+    quarantine_reason = record.pop("_last_quarantine_reason")
+    quarantine_timestamp = record.pop("_last_quarantine_timestamp")
+    return {
+        "job": record,
+        "skills": skills,
+        "last_assessed_at": int(last_assessed_at) if last_assessed_at is not None else None,
+        "quarantine": {
+            "job_quarantine_reason": quarantine_reason,
+            "job_quarantine_timestamp": quarantine_timestamp,
+        } if quarantine_count > 0 else None,
+    }
+
 async def get_job_ids_without_assessment() -> list[dict]:
     """
     Returns a list of job_id values from job_details where job_assessment_id is NULL or empty.
     """
     quarantine_list = await get_job_quarantine()
 
-    db = await get_db()
-    async with db.execute("SELECT jd.job_id, jd.job_description from job_details jd LEFT JOIN job_assessment ja ON jd.job_id = ja.job_id WHERE ja.job_assessment_id IS NULL AND jd.job_description IS NOT NULL AND jd.job_description != ''") as cursor:
+    async with read_connection() as db, db.execute("SELECT jd.job_id, jd.job_description from job_details jd LEFT JOIN job_assessment ja ON jd.job_id = ja.job_id WHERE ja.job_assessment_id IS NULL AND jd.job_description IS NOT NULL AND jd.job_description != ''") as cursor:
         rows = await cursor.fetchall()
         return [dict(row) for row in rows if row["job_id"] not in quarantine_list]
 
 async def get_job_skills() -> list[dict]:
-    db = await get_db()
-    async with db.execute("SELECT * FROM job_skills") as cursor:
+    async with read_connection() as db, db.execute("SELECT * FROM job_skills") as cursor:
         rows = await cursor.fetchall()
         return [dict(row) for row in rows]
 
 async def get_job_skills_for_job(job_id: str) -> list[dict]:
-    db = await get_db()
-    async with db.execute("SELECT * FROM job_skills WHERE job_id = ?", (job_id,)) as cursor:
+    async with read_connection() as db, db.execute("SELECT * FROM job_skills WHERE job_id = ?", (job_id,)) as cursor:
         rows = await cursor.fetchall()
         return [dict(row) for row in rows]
 
 async def get_prompts() -> list[dict]:
-    db = await get_db()
-    async with db.execute("SELECT * FROM prompt") as cursor:
+    async with read_connection() as db, db.execute("SELECT * FROM prompt") as cursor:
         rows = await cursor.fetchall()
         return [dict(row) for row in rows]
     
@@ -615,8 +1315,7 @@ async def get_latest_prompt(llm_run_type: str) -> Optional[dict]:
     """
     Returns the latest prompt configuration for a given llm_run_type.
     """
-    db = await get_db()
-    async with db.execute("""
+    async with read_connection() as db, db.execute("""
         SELECT * FROM prompt 
         WHERE llm_run_type = ? 
         ORDER BY prompt_created_at DESC 
@@ -630,44 +1329,280 @@ async def get_latest_prompt(llm_run_type: str) -> Optional[dict]:
             return None
 
 async def get_llm_runs_v2() -> list[dict]:
-    db = await get_db()
-    async with db.execute("SELECT * FROM llm_runs_v2") as cursor:
+    """Returns all llm_runs_v2 rows with llm_run_input/llm_run_output rehydrated from llm_blob."""
+    async with read_connection() as db, db.execute(LLM_RUNS_V2_SELECT) as cursor:
         rows = await cursor.fetchall()
-        return [dict(row) for row in rows]
-    
+        return [_rehydrate_llm_run(row) for row in rows]
+
+async def open_read_only_connection(path: str) -> aiosqlite.Connection:
+    """
+    Opens `path` read-only outside the Database singleton: no migrations, no writer, and the file
+    cannot be modified through it. For tools that only look at a database (e.g. the mock's replay).
+    """
+    conn = await aiosqlite.connect(f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro", uri=True, timeout=DB_CONNECT_TIMEOUT)
+    await conn.execute("PRAGMA query_only = ON;")
+    conn.row_factory = aiosqlite.Row
+    return conn
+
+async def get_recorded_llm_run(
+    input_hash: str,
+    model_id: Optional[str] = None,
+    connection: Optional[aiosqlite.Connection] = None,
+) -> Optional[dict]:
+    """
+    Returns the latest rehydrated llm_runs_v2 row whose input text has blob_hash `input_hash`,
+    preferring runs of `model_id`. Only runs stored through llm_blob carry an input hash.
+    Reads through `connection` when given (see open_read_only_connection), else the pool.
+    """
+    query = LLM_RUNS_V2_SELECT + """
+        WHERE r.llm_run_input_hash = ? AND (r.llm_run_output_hash IS NOT NULL OR r.llm_run_output IS NOT NULL)
+        ORDER BY (r.llm_run_model_id = ?) DESC, r.llm_run_start DESC
+        LIMIT 1
+    """
+    if connection is not None:
+        async with connection.execute(query, (input_hash, model_id)) as cursor:
+            row = await cursor.fetchone()
+    else:
+        async with read_connection() as db, db.execute(query, (input_hash, model_id)) as cursor:
+            row = await cursor.fetchone()
+    return _rehydrate_llm_run(row) if row else None
+
+async def get_recorded_assessment_job_ids(limit: int) -> list[str]:
+    """
+    Returns up to `limit` job_ids (oldest first) that have a recorded stage 2.1 run and a job description,
+    i.e. jobs whose assessment can be replayed from llm_runs_v2.
+    """
+    async with read_connection() as db, db.execute("""
+        SELECT j.job_id
+        FROM job_details j
+        WHERE j.job_description IS NOT NULL
+          AND EXISTS (
+              SELECT 1 FROM llm_runs_v2 r
+              WHERE r.job_id = j.job_id AND r.llm_run_type = 'ja_2_1_assessment' AND r.llm_run_input_hash IS NOT NULL
+          )
+        ORDER BY j.rowid
+        LIMIT ?
+    """, (limit,)) as cursor:
+        return [row["job_id"] for row in await cursor.fetchall()]
+
+# --- Incremental LLM metrics rollups (llm_metrics_*) ---
+# USD cost of a llm_runs_v2 row `r` joined to llm_models `m`, priced when it is folded into the rollups.
+# Prompt tokens include the provider-cached ones, which are priced at model_cpmt_cached when set; completion
+# tokens include thinking tokens, which are priced at model_cpmt_thinking when set (else the completion rate).
+_LLM_RUN_COST_SQL = """(
+    MAX(IFNULL(r.llm_run_input_tokens, 0) - IFNULL(r.llm_run_cached_tokens, 0), 0) * IFNULL(m.model_cpmt_prompt, 0)
+    + IFNULL(r.llm_run_cached_tokens, 0) * COALESCE(m.model_cpmt_cached, m.model_cpmt_prompt, 0)
+    + MAX(IFNULL(r.llm_run_output_tokens, 0) - IFNULL(r.llm_run_thinking_tokens, 0), 0) * IFNULL(m.model_cpmt_completion, 0)
+    + IFNULL(r.llm_run_thinking_tokens, 0) * COALESCE(m.model_cpmt_thinking, m.model_cpmt_completion, 0)
+) / 1000000.0"""
+
+async def aggregate_llm_runs(latency_bounds: list[float], batch_size: int) -> int:
+    """
+    Folds up to `batch_size` llm_runs_v2 rows past the llm_metrics_state watermark into the llm_metrics_*
+    rollups and advances the watermark, in one transaction. Returns the number of rows folded (0 = caught up).
+    `latency_bounds` are the histogram bucket upper bounds (seconds). Runs are priced at the llm_models
+    prices in effect now; the accumulated cost_usd is never repriced.
+    """
+    bucket_case = "CASE " + " ".join(
+        f"WHEN latency_s <= {float(bound)!r} THEN {index}" for index, bound in enumerate(latency_bounds)
+    ) + f" ELSE {len(latency_bounds)} END"
+    batch_sql = f"""
+        WITH batch AS (
+            SELECT
+                r.job_id,
+                COALESCE(r.llm_run_type, '') AS llm_run_type,
+                COALESCE(r.llm_run_model_id, '') AS model_id,
+                date(COALESCE(r.llm_run_start, r.llm_run_end), 'unixepoch') AS metrics_day,
+                r.llm_run_cache_hit AS cache_hit,
+                CASE WHEN r.llm_run_cache_hit = 1 THEN 0 ELSE IFNULL(r.llm_run_input_tokens, 0) END AS input_tokens,
+                CASE WHEN r.llm_run_cache_hit = 1 THEN 0 ELSE IFNULL(r.llm_run_cached_tokens, 0) END AS cached_tokens,
+                CASE WHEN r.llm_run_cache_hit = 1 THEN 0 ELSE IFNULL(r.llm_run_output_tokens, 0) END AS output_tokens,
+                CASE WHEN r.llm_run_cache_hit = 1 THEN 0 ELSE IFNULL(r.llm_run_thinking_tokens, 0) END AS thinking_tokens,
+                CASE WHEN r.llm_run_cache_hit = 1 THEN 0 ELSE {_LLM_RUN_COST_SQL} END AS cost_usd,
+                CASE WHEN r.llm_run_cache_hit = 0 AND m.model_id IS NULL THEN 1 ELSE 0 END AS unpriced,
+                MAX(IFNULL(r.llm_run_end - r.llm_run_start, 0), 0) AS latency_s
+            FROM llm_runs_v2 r
+            LEFT JOIN llm_models m ON m.model_id = r.llm_run_model_id
+            WHERE r.rowid > ? AND r.rowid <= ? AND COALESCE(r.llm_run_start, r.llm_run_end) IS NOT NULL
+        )
+    """
+
+    async def _write(db):
+        async with db.execute("SELECT last_rowid FROM llm_metrics_state WHERE metrics_source = 'llm_runs_v2'") as cursor:
+            row = await cursor.fetchone()
+        low = row[0] if row else 0
+        async with db.execute(
+            "SELECT MAX(rowid), COUNT(*) FROM (SELECT rowid FROM llm_runs_v2 WHERE rowid > ? ORDER BY rowid LIMIT ?)",
+            (low, batch_size),
+        ) as cursor:
+            high, count = await cursor.fetchone()
+        if not count:
+            return 0
+        await db.execute(batch_sql + """
+            INSERT INTO llm_metrics_daily (
+                metrics_day, llm_run_type, model_id, runs, cache_hits, input_tokens, cached_tokens,
+                output_tokens, thinking_tokens, latency_s_sum, latency_s_max, cost_usd, unpriced_runs
+            )
+            SELECT
+                metrics_day, llm_run_type, model_id, COUNT(*), SUM(cache_hit), SUM(input_tokens), SUM(cached_tokens),
+                SUM(output_tokens), SUM(thinking_tokens),
+                SUM(CASE WHEN cache_hit = 1 THEN 0 ELSE latency_s END),
+                MAX(CASE WHEN cache_hit = 1 THEN 0 ELSE latency_s END),
+                SUM(cost_usd), SUM(unpriced)
+            FROM batch
+            WHERE true
+            GROUP BY metrics_day, llm_run_type, model_id
+            ON CONFLICT(metrics_day, llm_run_type, model_id) DO UPDATE SET
+                runs = runs + excluded.runs,
+                cache_hits = cache_hits + excluded.cache_hits,
+                input_tokens = input_tokens + excluded.input_tokens,
+                cached_tokens = cached_tokens + excluded.cached_tokens,
+                output_tokens = output_tokens + excluded.output_tokens,
+                thinking_tokens = thinking_tokens + excluded.thinking_tokens,
+                latency_s_sum = latency_s_sum + excluded.latency_s_sum,
+                latency_s_max = MAX(latency_s_max, excluded.latency_s_max),
+                cost_usd = cost_usd + excluded.cost_usd,
+                unpriced_runs = unpriced_runs + excluded.unpriced_runs;
+        """, (low, high))
+        await db.execute(batch_sql + f"""
+            INSERT INTO llm_metrics_latency_bucket (metrics_day, llm_run_type, model_id, metrics_bucket, runs)
+            SELECT metrics_day, llm_run_type, model_id, {bucket_case} AS metrics_bucket, COUNT(*)
+            FROM batch
+            WHERE cache_hit = 0
+            GROUP BY metrics_day, llm_run_type, model_id, metrics_bucket
+            ON CONFLICT(metrics_day, llm_run_type, model_id, metrics_bucket) DO UPDATE SET
+                runs = runs + excluded.runs;
+        """, (low, high))
+        await db.execute(batch_sql + """
+            INSERT INTO llm_metrics_job (job_id, metrics_day, model_id, runs, input_tokens, output_tokens, thinking_tokens, cost_usd)
+            SELECT job_id, metrics_day, model_id, COUNT(*), SUM(input_tokens), SUM(output_tokens), SUM(thinking_tokens), SUM(cost_usd)
+            FROM batch
+            WHERE job_id IS NOT NULL
+            GROUP BY job_id, metrics_day, model_id
+            ON CONFLICT(job_id, metrics_day, model_id) DO UPDATE SET
+                runs = runs + excluded.runs,
+                input_tokens = input_tokens + excluded.input_tokens,
+                output_tokens = output_tokens + excluded.output_tokens,
+                thinking_tokens = thinking_tokens + excluded.thinking_tokens,
+                cost_usd = cost_usd + excluded.cost_usd;
+        """, (low, high))
+        await db.execute(
+            """
+            INSERT INTO llm_metrics_state (metrics_source, last_rowid, updated_at)
+            VALUES ('llm_runs_v2', ?, strftime('%s', 'now'))
+            ON CONFLICT(metrics_source) DO UPDATE SET
+                last_rowid = excluded.last_rowid,
+                updated_at = excluded.updated_at;
+            """,
+            (high,),
+        )
+        return count
+    return await run_write(_write)
+
+async def get_llm_metrics_state() -> dict:
+    """Returns the rollup watermark and the number of llm_runs_v2 rows not yet folded in."""
+    async with read_connection() as db:
+        async with db.execute("SELECT last_rowid, updated_at FROM llm_metrics_state WHERE metrics_source = 'llm_runs_v2'") as cursor:
+            row = await cursor.fetchone()
+        last_rowid = row["last_rowid"] if row else 0
+        async with db.execute("SELECT COUNT(*) FROM llm_runs_v2 WHERE rowid > ?", (last_rowid,)) as cursor:
+            pending = (await cursor.fetchone())[0]
+    return {"last_rowid": last_rowid, "updated_at": row["updated_at"] if row else None, "pending_runs": pending}
+
+async def get_llm_metrics_daily(since_day: Optional[str] = None) -> list[dict]:
+    """
+    Returns llm_metrics_daily rows from `since_day` (YYYY-MM-DD, inclusive; None = all), with cost_usd
+    priced when the runs were folded and unpriced_runs = billed runs whose model had no llm_models row.
+    """
+    async with read_connection() as db, db.execute("""
+        SELECT *
+        FROM llm_metrics_daily
+        WHERE ? IS NULL OR metrics_day >= ?
+        ORDER BY metrics_day, llm_run_type, model_id
+    """, (since_day, since_day)) as cursor:
+        return [dict(row) for row in await cursor.fetchall()]
+
+async def get_llm_metrics_latency_buckets(since_day: Optional[str] = None) -> list[dict]:
+    """Returns latency histogram counts per (llm_run_type, model_id, metrics_bucket) from `since_day` on."""
+    async with read_connection() as db, db.execute("""
+        SELECT llm_run_type, model_id, metrics_bucket, SUM(runs) AS runs
+        FROM llm_metrics_latency_bucket
+        WHERE ? IS NULL OR metrics_day >= ?
+        GROUP BY llm_run_type, model_id, metrics_bucket
+    """, (since_day, since_day)) as cursor:
+        return [dict(row) for row in await cursor.fetchall()]
+
+async def get_llm_metrics_job_costs(since_day: Optional[str] = None) -> list[dict]:
+    """Returns {job_id, runs, cost_usd} per job with runs from `since_day` on, priced when the runs were folded."""
+    async with read_connection() as db, db.execute("""
+        SELECT job_id, SUM(runs) AS runs, SUM(cost_usd) AS cost_usd
+        FROM llm_metrics_job
+        WHERE ? IS NULL OR metrics_day >= ?
+        GROUP BY job_id
+    """, (since_day, since_day)) as cursor:
+        return [dict(row) for row in await cursor.fetchall()]
+
+# --- Streaming reads ---
+async def _iter_rows(
+    sql: str,
+    params: tuple = (),
+    batch_size: int = DB_STREAM_BATCH_SIZE,
+    transform: Callable[[Any], dict] = dict,
+) -> AsyncIterator[dict]:
+    """Yield rows of `sql` (converted by `transform`), fetching `batch_size` rows at a time on a dedicated connection."""
+    db_instance = await Database.get_instance()
+    async with db_instance.stream_reader() as db, db.execute(sql, params) as cursor:
+        while True:
+            rows = await cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield transform(row)
+
+def iter_job_details(batch_size: int = DB_STREAM_BATCH_SIZE) -> AsyncIterator[dict]:
+    """Streaming counterpart of get_job_details."""
+    return _iter_rows("SELECT * FROM job_details", batch_size=batch_size)
+
+def iter_job_skills(batch_size: int = DB_STREAM_BATCH_SIZE) -> AsyncIterator[dict]:
+    """Streaming counterpart of get_job_skills."""
+    return _iter_rows("SELECT * FROM job_skills", batch_size=batch_size)
+
+def iter_llm_runs_v2(batch_size: int = DB_STREAM_BATCH_SIZE) -> AsyncIterator[dict]:
+    """Streaming counterpart of get_llm_runs_v2 (input/output rehydrated from llm_blob)."""
+    return _iter_rows(LLM_RUNS_V2_SELECT, batch_size=batch_size, transform=_rehydrate_llm_run)
+
+def iter_document_store(batch_size: int = DB_STREAM_BATCH_SIZE) -> AsyncIterator[dict]:
+    """Streaming counterpart of get_document_store."""
+    return _iter_rows("SELECT * FROM document_store", batch_size=batch_size)
+
+def iter_prompts(batch_size: int = DB_STREAM_BATCH_SIZE) -> AsyncIterator[dict]:
+    """Streaming counterpart of get_prompts."""
+    return _iter_rows("SELECT * FROM prompt", batch_size=batch_size)
+
 async def get_recent_assessed_jobs(days_back: int = 5, limit: int = 200) -> list[dict]:
     """
     Returns jobs that have been assessed in the last `days_back` days based on llm_runs_v2.llm_run_end.
-    - Only includes job_ids that exist in job_skills (i.e., have an assessment result stored).
-    - Aggregates llm_runs_v2 by job_id to get the latest llm_run_end as assessment_time.
+    - Only includes job_ids that have job_skills (i.e., have an assessment result stored).
+    - Reads the trigger-maintained job_assessment_summary table (latest llm_run_end per job and
+      skill/match counts), so the cost is an index range scan regardless of how many runs are logged.
     - Joins job_details to enrich output; returns latest first.
     Assumes llm_run_end is epoch seconds.
     """
-    db = await get_db()
     # Compute the epoch seconds cutoff in SQLite to avoid clock skew between app and DB.
-    async with db.execute(
+    async with read_connection() as db, db.execute(
         """
-        WITH latest_assessment AS (
-            SELECT
-                job_id,
-                MAX(CAST(llm_run_end AS INTEGER)) AS assessment_time
-            FROM llm_runs_v2
-            WHERE llm_run_end IS NOT NULL
-            GROUP BY job_id
-        ),
-        cutoff AS (
-            SELECT CAST(strftime('%s','now') AS INTEGER) - (? * 86400) AS since_ts
-        )
         SELECT
-            jd.*, 
-            la.assessment_time AS last_assessed_at
-        FROM latest_assessment la
-        INNER JOIN job_skills js ON js.job_id = la.job_id
-        INNER JOIN job_details jd ON jd.job_id = la.job_id
-        CROSS JOIN cutoff c
-        WHERE la.assessment_time >= c.since_ts
-        GROUP BY jd.job_id
-        ORDER BY la.assessment_time DESC
+            jd.*,
+            s.last_assessed_at,
+            s.required_total,
+            s.required_matched,
+            s.additional_total,
+            s.additional_matched
+        FROM job_assessment_summary s
+        INNER JOIN job_details jd ON jd.job_id = s.job_id
+        WHERE s.skills_total > 0
+          AND s.last_assessed_at >= CAST(strftime('%s','now') AS INTEGER) - (? * 86400)
+        ORDER BY s.last_assessed_at DESC
         LIMIT ?
         """,
         (days_back, limit),
@@ -681,28 +1616,14 @@ async def get_recent_job_skills(days_back: int = 5, limit: int = 200) -> list[di
     The set of job_ids considered is limited to the most recently assessed jobs (same logic as get_recent_assessed_jobs),
     capped by `limit`. All job_skills rows for those job_ids are returned.
     """
-    db = await get_db()
-    async with db.execute(
+    async with read_connection() as db, db.execute(
         """
-        WITH latest_assessment AS (
-            SELECT
-                job_id,
-                MAX(CAST(llm_run_end AS INTEGER)) AS assessment_time
-            FROM llm_runs_v2
-            WHERE llm_run_end IS NOT NULL
-            GROUP BY job_id
-        ),
-        cutoff AS (
-            SELECT CAST(strftime('%s','now') AS INTEGER) - (? * 86400) AS since_ts
-        ),
-        recent_jobs AS (
-            SELECT la.job_id
-            FROM latest_assessment la
-            INNER JOIN job_skills js ON js.job_id = la.job_id
-            CROSS JOIN cutoff c
-            WHERE la.assessment_time >= c.since_ts
-            GROUP BY la.job_id
-            ORDER BY la.assessment_time DESC
+        WITH recent_jobs AS (
+            SELECT s.job_id
+            FROM job_assessment_summary s
+            WHERE s.skills_total > 0
+              AND s.last_assessed_at >= CAST(strftime('%s','now') AS INTEGER) - (? * 86400)
+            ORDER BY s.last_assessed_at DESC
             LIMIT ?
         )
         SELECT js.*
@@ -720,12 +1641,13 @@ async def delete_job_quarantine(job_id: str):
     Deletes all quarantine records for a given job_id.
     This is typically called when a previously failed job succeeds on retry.
     """
-    db = await get_db()
-    await db.execute(
-        "DELETE FROM job_quarantine WHERE job_id = ?",
-        (job_id,)
-    )
-    await db.commit()
+    async def _write(db):
+        await db.execute(
+            "DELETE FROM job_quarantine WHERE job_id = ?",
+            (job_id,)
+        )
+    await run_write(_write)
+    _notify_job_changed(job_id)
     logger.info(f"Deleted quarantine records for job_id: {job_id}")
 
 async def delete_job_skills_by_job_id(job_id: str):
@@ -733,40 +1655,629 @@ async def delete_job_skills_by_job_id(job_id: str):
     Deletes all job_skills records for the specified job_id.
     Use this before regenerating an assessment to avoid duplicate skills.
     """
-    db = await get_db()
-    await db.execute(
-        "DELETE FROM job_skills WHERE job_id = ?",
-        (job_id,)
-    )
-    await db.commit()
+    async def _write(db):
+        await db.execute(
+            "DELETE FROM job_skills WHERE job_id = ?",
+            (job_id,)
+        )
+        await _refresh_job_search_skills(db, [job_id])
+    await run_write(_write)
+    _notify_job_changed(job_id)
     logger.info(f"Deleted job_skills for job_id: {job_id}")
 
 async def cleanup_stale_quarantine() -> int:
     """Delete quarantine rows for jobs that now have skills (assessment exists).
     Returns number of quarantine rows deleted.
     """
-    db = await get_db()
-    # Find job_ids that have both skills and quarantine rows
-    async with db.execute(
+    async def _write(db):
+        # Find job_ids that have both skills and quarantine rows
+        async with db.execute(
+            """
+            SELECT DISTINCT q.job_id
+            FROM job_quarantine q
+            INNER JOIN job_skills s ON s.job_id = q.job_id
+            """
+        ) as cursor:
+            rows = await cursor.fetchall()
+            stale_ids = [r["job_id"] for r in rows]
+        if stale_ids:
+            # Use executemany for efficiency
+            await db.executemany(
+                "DELETE FROM job_quarantine WHERE job_id = ?",
+                [(jid,) for jid in stale_ids]
+            )
+        return stale_ids
+    stale_ids = await run_write(_write)
+    _notify_job_changed(*stale_ids)
+    deleted = len(stale_ids)
+    if stale_ids:
+        logger.info(f"cleanup_stale_quarantine: removed quarantine rows for {deleted} job(s): {stale_ids}")
+    else:
+        logger.info("cleanup_stale_quarantine: no stale quarantine rows found")
+    return deleted
+# --- Assessment queue ---
+ASSESSMENT_QUEUE_MAX_ATTEMPTS = int(os.getenv("ASSESSMENT_QUEUE_MAX_ATTEMPTS", "3"))
+
+# Folds a pending rerun request into the entry's own mode when the entry is about to (re)start
+_QUEUE_MODE_WITH_RERUN_SQL = """CASE
+    WHEN queue_rerun_mode IS NULL THEN queue_mode
+    WHEN queue_mode = 'assess' OR queue_rerun_mode = 'assess' THEN 'assess'
+    ELSE 'reassess'
+END"""
+
+async def _requeue_rerun(db, queue_id: int, now: int):
+    """Enqueues the rerun recorded on a finished entry (see enqueue_assessment) as a new pending entry."""
+    await db.execute(
         """
-        SELECT DISTINCT q.job_id
-        FROM job_quarantine q
-        INNER JOIN job_skills s ON s.job_id = q.job_id
+        INSERT INTO assessment_queue (
+            job_id, queue_priority, queue_max_attempts, queue_available_at, queue_enqueued_at, queue_updated_at, queue_mode
+        )
+        SELECT job_id, queue_priority, queue_max_attempts, ?, ?, ?, queue_rerun_mode
+        FROM assessment_queue
+        WHERE queue_id = ? AND queue_rerun_mode IS NOT NULL
+        ON CONFLICT(job_id) WHERE queue_status IN ('pending', 'leased') DO NOTHING;
+        """,
+        (now, now, now, queue_id)
+    )
+
+async def enqueue_assessment(job_id: str, priority: int = 0, max_attempts: Optional[int] = None, mode: str = "assess") -> dict:
+    """
+    Adds job_id to the assessment queue unless it already has a pending or leased entry.
+    `mode` is 'assess' (full run when the job has no skills) or 'reassess' (rerun reusing unchanged stages);
+    an 'assess' request upgrades a pending 'reassess' entry.
+    A 'reassess' request for a leased entry sets its queue_rerun_mode, so the job is queued again once the
+    running attempt ends (its result may predate the change behind the request).
+    Returns {"queue_id": int, "enqueued": bool, "rerun": bool}; enqueued is False when an active entry
+    already existed, rerun is True when a rerun of the leased entry was scheduled instead.
+    """
+    now = int(time.time())
+    attempts = max_attempts if max_attempts is not None else ASSESSMENT_QUEUE_MAX_ATTEMPTS
+
+    async def _write(db):
+        cursor = await db.execute(
+            """
+            INSERT INTO assessment_queue (
+                job_id, queue_priority, queue_max_attempts, queue_available_at, queue_enqueued_at, queue_updated_at, queue_mode
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id) WHERE queue_status IN ('pending', 'leased') DO NOTHING;
+            """,
+            (job_id, priority, attempts, now, now, now, mode)
+        )
+        if cursor.rowcount:
+            return {"queue_id": cursor.lastrowid, "enqueued": True, "rerun": False}
+        # Already queued: raise the priority if the new request is more urgent
+        await db.execute(
+            """
+            UPDATE assessment_queue
+            SET queue_priority = MAX(queue_priority, ?),
+                queue_mode = CASE WHEN ? = 'assess' THEN 'assess' ELSE queue_mode END
+            WHERE job_id = ? AND queue_status = 'pending';
+            """,
+            (priority, mode, job_id)
+        )
+        rerun = False
+        if mode == "reassess":
+            cursor = await db.execute(
+                """
+                UPDATE assessment_queue
+                SET queue_rerun_mode = COALESCE(queue_rerun_mode, 'reassess'),
+                    queue_priority = MAX(queue_priority, ?),
+                    queue_updated_at = ?
+                WHERE job_id = ? AND queue_status = 'leased';
+                """,
+                (priority, now, job_id)
+            )
+            rerun = bool(cursor.rowcount)
+        async with db.execute(
+            "SELECT queue_id FROM assessment_queue WHERE job_id = ? AND queue_status IN ('pending', 'leased')",
+            (job_id,)
+        ) as existing:
+            row = await existing.fetchone()
+        return {"queue_id": row["queue_id"] if row else None, "enqueued": False, "rerun": rerun}
+    return await run_write(_write)
+
+async def lease_assessments(lease_owner: str, lease_seconds: int, limit: int = 1) -> list[dict]:
+    """
+    Atomically claims up to `limit` runnable queue entries for `lease_owner`.
+    Runnable means pending and due, or leased with an expired lease (crash recovery).
+    Expired leases that already used all attempts are marked failed instead of being claimed.
+    Returns the claimed rows (queue_attempts already incremented).
+    """
+    async def _write(db):
+        now = int(time.time())
+        async with db.execute(
+            """
+            UPDATE assessment_queue
+            SET queue_status = 'failed',
+                queue_last_error = COALESCE(queue_last_error, 'lease expired'),
+                lease_owner = NULL, lease_expires_at = NULL, queue_updated_at = ?
+            WHERE queue_status = 'leased' AND lease_expires_at <= ? AND queue_attempts >= queue_max_attempts
+            RETURNING queue_id;
+            """,
+            (now, now)
+        ) as cursor:
+            expired = [row["queue_id"] for row in await cursor.fetchall()]
+        for queue_id in expired:
+            await _requeue_rerun(db, queue_id, now)
+        async with db.execute(
+            f"""
+            UPDATE assessment_queue
+            SET queue_status = 'leased',
+                lease_owner = ?,
+                lease_expires_at = ?,
+                queue_attempts = queue_attempts + 1,
+                queue_updated_at = ?,
+                -- An attempt starting now already sees whatever prompted a rerun request
+                queue_mode = {_QUEUE_MODE_WITH_RERUN_SQL},
+                queue_rerun_mode = NULL
+            WHERE queue_id IN (
+                SELECT queue_id FROM (
+                    SELECT queue_id, queue_priority, queue_available_at FROM assessment_queue
+                    WHERE queue_status = 'pending' AND queue_available_at <= ?
+                    UNION ALL
+                    SELECT queue_id, queue_priority, queue_available_at FROM assessment_queue
+                    WHERE queue_status = 'leased' AND lease_expires_at <= ?
+                )
+                ORDER BY queue_priority DESC, queue_available_at, queue_id
+                LIMIT ?
+            )
+            RETURNING *;
+            """,
+            (lease_owner, now + lease_seconds, now, now, now, limit)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+    return await run_write(_write)
+
+async def heartbeat_assessment(queue_id: int, lease_owner: str, lease_seconds: int) -> bool:
+    """Extends a held lease. Returns False if the lease was lost (expired and claimed by another worker)."""
+    async def _write(db):
+        now = int(time.time())
+        cursor = await db.execute(
+            """
+            UPDATE assessment_queue SET lease_expires_at = ?, queue_updated_at = ?
+            WHERE queue_id = ? AND lease_owner = ? AND queue_status = 'leased';
+            """,
+            (now + lease_seconds, now, queue_id, lease_owner)
+        )
+        return bool(cursor.rowcount)
+    return await run_write(_write)
+
+async def complete_assessment(queue_id: int, lease_owner: str) -> bool:
+    """
+    Marks a leased entry done and queues the rerun requested while it ran, if any.
+    Returns False if the lease was no longer held.
+    """
+    async def _write(db):
+        now = int(time.time())
+        cursor = await db.execute(
+            """
+            UPDATE assessment_queue
+            SET queue_status = 'done', lease_owner = NULL, lease_expires_at = NULL,
+                queue_completed_at = ?, queue_updated_at = ?
+            WHERE queue_id = ? AND lease_owner = ? AND queue_status = 'leased';
+            """,
+            (now, now, queue_id, lease_owner)
+        )
+        if not cursor.rowcount:
+            return False
+        await _requeue_rerun(db, queue_id, now)
+        return True
+    return await run_write(_write)
+
+async def fail_assessment(
+    queue_id: int,
+    lease_owner: str,
+    error: str,
+    retry_delay_seconds: Optional[int] = None,
+) -> Optional[str]:
+    """
+    Records a failed attempt. With `retry_delay_seconds` set and attempts remaining, the entry returns to
+    pending and becomes claimable after the delay; otherwise it is marked failed and a rerun requested
+    while it ran is queued as a new entry.
+    Returns the new queue_status, or None if the lease was no longer held.
+    """
+    async def _write(db):
+        now = int(time.time())
+        retry = retry_delay_seconds is not None
+        async with db.execute(
+            """
+            UPDATE assessment_queue
+            SET queue_status = CASE WHEN ? AND queue_attempts < queue_max_attempts THEN 'pending' ELSE 'failed' END,
+                queue_available_at = ?,
+                queue_last_error = ?,
+                lease_owner = NULL, lease_expires_at = NULL, queue_updated_at = ?
+            WHERE queue_id = ? AND lease_owner = ? AND queue_status = 'leased'
+            RETURNING queue_status;
+            """,
+            (1 if retry else 0, now + (retry_delay_seconds or 0), error[:2000], now, queue_id, lease_owner)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        if row["queue_status"] == "failed":
+            await _requeue_rerun(db, queue_id, now)
+        return row["queue_status"]
+    return await run_write(_write)
+
+async def release_assessment_leases(lease_owner: str) -> int:
+    """
+    Returns every entry leased by `lease_owner` to pending without consuming an attempt
+    (graceful shutdown), so a restarted worker pool picks them up immediately.
+    """
+    async def _write(db):
+        now = int(time.time())
+        cursor = await db.execute(
+            """
+            UPDATE assessment_queue
+            SET queue_status = 'pending', queue_attempts = MAX(queue_attempts - 1, 0),
+                queue_available_at = ?, lease_owner = NULL, lease_expires_at = NULL, queue_updated_at = ?
+            WHERE lease_owner = ? AND queue_status = 'leased';
+            """,
+            (now, now, lease_owner)
+        )
+        return cursor.rowcount or 0
+    return await run_write(_write)
+
+async def purge_assessment_queue(older_than_days: int) -> int:
+    """Deletes done/failed queue rows last updated more than `older_than_days` ago."""
+    async def _write(db):
+        cursor = await db.execute(
+            """
+            DELETE FROM assessment_queue
+            WHERE queue_status IN ('done', 'failed')
+              AND queue_updated_at < CAST(strftime('%s','now') AS INTEGER) - (? * 86400);
+            """,
+            (older_than_days,)
+        )
+        return cursor.rowcount or 0
+    return await run_write(_write)
+
+async def get_assessment_queue_counts() -> dict:
+    """Returns {queue_status: count} plus the age in seconds of the oldest pending entry."""
+    async with read_connection() as db:
+        async with db.execute("SELECT queue_status, COUNT(*) AS n FROM assessment_queue GROUP BY queue_status") as cursor:
+            counts = {row["queue_status"]: row["n"] for row in await cursor.fetchall()}
+        async with db.execute(
+            """
+            SELECT CAST(strftime('%s','now') AS INTEGER) - MIN(queue_enqueued_at) AS oldest_pending_age
+            FROM assessment_queue WHERE queue_status = 'pending'
+            """
+        ) as cursor:
+            row = await cursor.fetchone()
+    result = {status: counts.get(status, 0) for status in ("pending", "leased", "done", "failed")}
+    result["oldest_pending_age_seconds"] = row["oldest_pending_age"] if row else None
+    return result
+
+async def get_assessment_queue_entries(job_id: str) -> list[dict]:
+    """Returns the queue history of a job, newest first."""
+    async with read_connection() as db, db.execute(
+        "SELECT * FROM assessment_queue WHERE job_id = ? ORDER BY queue_id DESC", (job_id,)
+    ) as cursor:
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+
+# --- LLM response cache ---
+async def get_llm_response_cache(cache_key: str) -> Optional[dict]:
+    """
+    Returns {"response_text", "expires_at"} for an unexpired cache entry, or None.
+    Hit bookkeeping (last hit time, hit count) is written separately by touch_llm_response_cache.
+    """
+    async with read_connection() as db, db.execute(
+        """
+        SELECT cache_encoding, cache_data, cache_expires_at FROM llm_response_cache
+        WHERE cache_key = ? AND cache_expires_at > CAST(strftime('%s','now') AS INTEGER)
+        """,
+        (cache_key,)
+    ) as cursor:
+        row = await cursor.fetchone()
+    if row is None:
+        return None
+    return {"response_text": _decode_blob(row["cache_encoding"], row["cache_data"]), "expires_at": row["cache_expires_at"]}
+
+async def upsert_llm_response_cache(cache_key: str, model_id: Optional[str], response_text: str, ttl_seconds: int):
+    """Stores (or refreshes) a cached response; compressed like llm_blob payloads."""
+    _, encoding, size, data = _encode_blob(response_text)
+    now = int(time.time())
+
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO llm_response_cache (
+                cache_key, cache_model_id, cache_encoding, cache_size, cache_data,
+                cache_created_at, cache_expires_at, cache_last_hit_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(cache_key) DO UPDATE SET
+                cache_model_id=excluded.cache_model_id,
+                cache_encoding=excluded.cache_encoding,
+                cache_size=excluded.cache_size,
+                cache_data=excluded.cache_data,
+                cache_created_at=excluded.cache_created_at,
+                cache_expires_at=excluded.cache_expires_at,
+                cache_last_hit_at=excluded.cache_last_hit_at;
+            """,
+            (cache_key, model_id, encoding, size, data, now, now + ttl_seconds, now)
+        )
+    await run_write(_write)
+
+async def touch_llm_response_cache(cache_key: str):
+    """Queues a last-hit/hit-count update without waiting for its commit (rides along in the next group commit)."""
+    now = int(time.time())
+
+    async def _write(db):
+        await db.execute(
+            "UPDATE llm_response_cache SET cache_last_hit_at = ?, cache_hit_count = cache_hit_count + 1 WHERE cache_key = ?",
+            (now, cache_key)
+        )
+    future = await queue_write(_write)
+    # Best-effort bookkeeping: retrieve the outcome so a failure is not reported as an unhandled exception
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+async def evict_llm_response_cache(max_entries: int, max_bytes: int) -> int:
+    """
+    Deletes expired entries, then least-recently-hit entries beyond `max_entries` or beyond
+    `max_bytes` of uncompressed response data (0 disables a limit). Returns the number of rows deleted.
+    """
+    async def _write(db):
+        deleted = 0
+        cursor = await db.execute(
+            "DELETE FROM llm_response_cache WHERE cache_expires_at <= CAST(strftime('%s','now') AS INTEGER)"
+        )
+        deleted += cursor.rowcount or 0
+        if max_entries > 0:
+            cursor = await db.execute(
+                """
+                DELETE FROM llm_response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_response_cache
+                    ORDER BY cache_last_hit_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (max_entries,)
+            )
+            deleted += cursor.rowcount or 0
+        if max_bytes > 0:
+            cursor = await db.execute(
+                """
+                DELETE FROM llm_response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM (
+                        SELECT cache_key, SUM(cache_size) OVER (ORDER BY cache_last_hit_at DESC, cache_key) AS running_size
+                        FROM llm_response_cache
+                    ) WHERE running_size > ?
+                )
+                """,
+                (max_bytes,)
+            )
+            deleted += cursor.rowcount or 0
+        return deleted
+    return await run_write(_write)
+
+async def get_llm_response_cache_summary() -> dict:
+    async with read_connection() as db, db.execute(
+        """
+        SELECT COUNT(*) AS entries, COALESCE(SUM(cache_size), 0) AS bytes,
+               COALESCE(SUM(LENGTH(cache_data)), 0) AS stored_bytes, COALESCE(SUM(cache_hit_count), 0) AS hits
+        FROM llm_response_cache
         """
+    ) as cursor:
+        row = await cursor.fetchone()
+        return dict(row)
+
+async def clear_llm_response_cache() -> int:
+    async def _write(db):
+        cursor = await db.execute("DELETE FROM llm_response_cache")
+        return cursor.rowcount or 0
+    return await run_write(_write)
+
+async def get_assessed_job_ids(days_back: Optional[int] = None) -> list[str]:
+    """Returns ids of jobs that have an assessment, optionally only those assessed within `days_back` days."""
+    sql = "SELECT job_id FROM job_assessment_summary WHERE skills_total > 0"
+    params: tuple = ()
+    if days_back is not None:
+        sql += " AND last_assessed_at >= CAST(strftime('%s','now') AS INTEGER) - (? * 86400)"
+        params = (days_back,)
+    async with read_connection() as db, db.execute(sql + " ORDER BY last_assessed_at DESC", params) as cursor:
+        rows = await cursor.fetchall()
+        return [row["job_id"] for row in rows]
+
+# --- Stage outputs ---
+STAGE_TABLES = ("job_stage_output", "job_stage_checkpoint")
+
+async def get_job_stage_outputs(job_id: str, table: str = "job_stage_output") -> dict[str, dict]:
+    """
+    Returns {stage_run_type: {"input_hash", "prompt_id", "output"}} for a job (output decoded from JSON)
+    from job_stage_output (last successful assessment) or job_stage_checkpoint (in-progress/failed run).
+    """
+    if table not in STAGE_TABLES:
+        raise ValueError(f"Unknown stage table: {table}")
+    async with read_connection() as db, db.execute(
+        f"SELECT stage_run_type, stage_input_hash, stage_prompt_id, stage_output FROM {table} WHERE job_id = ?",
+        (job_id,)
     ) as cursor:
         rows = await cursor.fetchall()
-        stale_ids = [r["job_id"] for r in rows]
-    deleted = 0
-    if stale_ids:
-        # Use executemany for efficiency
+    return {
+        row["stage_run_type"]: {
+            "input_hash": row["stage_input_hash"],
+            "prompt_id": row["stage_prompt_id"],
+            "output": json.loads(row["stage_output"]),
+        }
+        for row in rows
+    }
+
+def _stage_rows(job_id: str, outputs: list[dict], now: int) -> list[tuple]:
+    return [
+        (job_id, o["stage_run_type"], o["input_hash"], o.get("prompt_id"), json.dumps(o["output"], ensure_ascii=False), now)
+        for o in outputs
+    ]
+
+async def upsert_job_stage_checkpoint(job_id: str, output: dict):
+    """Checkpoints one validated stage output ({"stage_run_type", "input_hash", "prompt_id", "output"})."""
+    row = _stage_rows(job_id, [output], int(time.time()))[0]
+
+    async def _write(db):
+        await db.execute(
+            """
+            INSERT INTO job_stage_checkpoint (
+                job_id, stage_run_type, stage_input_hash, stage_prompt_id, stage_output, stage_created_at
+            ) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id, stage_run_type) DO UPDATE SET
+                stage_input_hash=excluded.stage_input_hash,
+                stage_prompt_id=excluded.stage_prompt_id,
+                stage_output=excluded.stage_output,
+                stage_created_at=excluded.stage_created_at;
+            """,
+            row
+        )
+    await run_write(_write)
+
+async def purge_job_stage_checkpoints(older_than_days: int) -> int:
+    """Deletes checkpoints of assessments abandoned more than `older_than_days` ago."""
+    async def _write(db):
+        cursor = await db.execute(
+            "DELETE FROM job_stage_checkpoint WHERE stage_created_at < CAST(strftime('%s','now') AS INTEGER) - (? * 86400)",
+            (older_than_days,)
+        )
+        return cursor.rowcount or 0
+    return await run_write(_write)
+
+async def upsert_job_stage_outputs(job_id: str, outputs: list[dict]) -> int:
+    """
+    Stores validated stage outputs for a job in one transaction and clears its checkpoints
+    (the assessment completed). Each item: {"stage_run_type", "input_hash", "prompt_id", "output"};
+    replaces the previous output of that stage.
+    """
+    now = int(time.time())
+    rows = _stage_rows(job_id, outputs, now)
+
+    async def _write(db):
+        await db.execute("DELETE FROM job_stage_checkpoint WHERE job_id = ?", (job_id,))
+        if not rows:
+            return 0
         await db.executemany(
-            "DELETE FROM job_quarantine WHERE job_id = ?",
-            [(jid,) for jid in stale_ids]
+            """
+            INSERT INTO job_stage_output (
+                job_id, stage_run_type, stage_input_hash, stage_prompt_id, stage_output, stage_created_at
+            ) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id, stage_run_type) DO UPDATE SET
+                stage_input_hash=excluded.stage_input_hash,
+                stage_prompt_id=excluded.stage_prompt_id,
+                stage_output=excluded.stage_output,
+                stage_created_at=excluded.stage_created_at;
+            """,
+            rows
         )
-        await db.commit()
-        deleted = len(stale_ids)
-        logger.info(f"cleanup_stale_quarantine: removed quarantine rows for {deleted} job(s): {stale_ids}")
+        return len(rows)
+    return await run_write(_write)
+
+# --- Requirement match cache ---
+async def get_requirement_match_candidates(match_context: str, req_norms: list[str], band_keys: list[str]) -> list[dict]:
+    """
+    Returns requirement_match rows of `match_context` whose req_norm is in `req_norms` (exact hits) or
+    that share at least one MinHash LSH band with `band_keys` (near-duplicate candidates).
+    """
+    if not req_norms and not band_keys:
+        return []
+    norm_marks = ",".join("?" for _ in req_norms) or "NULL"
+    band_marks = ",".join("?" for _ in band_keys) or "NULL"
+    sql = f"""
+        SELECT req_norm, req_numbers, req_minhash, req_string, match, match_reasoning
+        FROM requirement_match
+        WHERE match_context = ? AND req_norm IN ({norm_marks})
+        UNION
+        SELECT m.req_norm, m.req_numbers, m.req_minhash, m.req_string, m.match, m.match_reasoning
+        FROM requirement_match_band b
+        JOIN requirement_match m ON m.match_context = b.match_context AND m.req_norm = b.req_norm
+        WHERE b.match_context = ? AND b.band_key IN ({band_marks})
+    """
+    params = (match_context, *req_norms, match_context, *band_keys)
+    async with read_connection() as db, db.execute(sql, params) as cursor:
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+
+async def upsert_requirement_matches(match_context: str, matches: list[dict]) -> int:
+    """
+    Stores requirement match results under `match_context` (latest result per normalized requirement wins).
+    Each item: {"req_norm", "req_numbers", "req_minhash", "req_string", "match", "match_reasoning",
+    "source_job_id", "band_keys"}.
+    """
+    if not matches:
+        return 0
+    now = int(time.time())
+    rows = [
+        (match_context, m["req_norm"], m["req_numbers"], m["req_minhash"], m["req_string"],
+         1 if m["match"] else 0, m.get("match_reasoning"), m.get("source_job_id"), now)
+        for m in matches
+    ]
+    bands = [(match_context, band_key, m["req_norm"]) for m in matches for band_key in m["band_keys"]]
+
+    async def _write(db):
+        await db.executemany(
+            "DELETE FROM requirement_match_band WHERE match_context = ? AND req_norm = ?",
+            [(match_context, m["req_norm"]) for m in matches]
+        )
+        await db.executemany(
+            """
+            INSERT INTO requirement_match (
+                match_context, req_norm, req_numbers, req_minhash, req_string, match, match_reasoning, source_job_id, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(match_context, req_norm) DO UPDATE SET
+                req_numbers=excluded.req_numbers,
+                req_minhash=excluded.req_minhash,
+                req_string=excluded.req_string,
+                match=excluded.match,
+                match_reasoning=excluded.match_reasoning,
+                source_job_id=excluded.source_job_id,
+                created_at=excluded.created_at;
+            """,
+            rows
+        )
+        await db.executemany(
+            "INSERT OR IGNORE INTO requirement_match_band (match_context, band_key, req_norm) VALUES (?, ?, ?)",
+            bands
+        )
+        return len(rows)
+    return await run_write(_write)
+
+async def count_requirement_matches(match_context: Optional[str] = None) -> int:
+    """Counts requirement_match rows, all of them or only those of `match_context`."""
+    if match_context is None:
+        query, params = "SELECT COUNT(*) FROM requirement_match", ()
     else:
-        logger.info("cleanup_stale_quarantine: no stale quarantine rows found")
-    return deleted
+        query, params = "SELECT COUNT(*) FROM requirement_match WHERE match_context = ?", (match_context,)
+    async with read_connection() as db, db.execute(query, params) as cursor:
+        return (await cursor.fetchone())[0]
+
+async def delete_requirement_matches_except(match_context: str) -> int:
+    """Deletes the requirement matches of every context other than `match_context`. Returns rows deleted."""
+    async def _write(db):
+        await db.execute("DELETE FROM requirement_match_band WHERE match_context != ?", (match_context,))
+        cursor = await db.execute("DELETE FROM requirement_match WHERE match_context != ?", (match_context,))
+        return cursor.rowcount or 0
+    return await run_write(_write)
+
+def iter_assessed_job_skills(resume_id: str, match_context: str, batch_size: int = DB_STREAM_BATCH_SIZE) -> AsyncIterator[dict]:
+    """
+    Streams `resume_id`'s assessed (match decided) job_skills rows of `match_context`, or of no recorded
+    context, oldest first, for cache backfills.
+    """
+    return _iter_rows(
+        """
+        SELECT job_id, job_skills_atomic_string, job_skills_match, job_skills_match_reasoning, job_skills_match_context
+        FROM job_skills
+        WHERE job_skills_match IS NOT NULL AND job_skills_resume_id = ?
+          AND (job_skills_match_context = ? OR job_skills_match_context IS NULL)
+        ORDER BY rowid
+        """,
+        params=(resume_id, match_context),
+        batch_size=batch_size,
+    )
 
+async def get_latest_llm_run(job_id: str, llm_run_type: str) -> Optional[dict]:
+    """Returns the rehydrated llm_runs_v2 row of `job_id` and `llm_run_type` that ended last, or None."""
+    async with read_connection() as db, db.execute(LLM_RUNS_V2_SELECT + """
+        WHERE r.job_id = ? AND r.llm_run_type = ?
+        ORDER BY r.llm_run_end DESC
+        LIMIT 1
+    """, (job_id, llm_run_type)) as cursor:
+        row = await cursor.fetchone()
+        return _rehydrate_llm_run(row) if row else None
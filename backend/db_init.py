@@ -4,7 +4,8 @@ import aiosqlite
 import aiofiles
 import asyncio
 
-from utilities import setup_logging, get_logger
+from .utilities import setup_logging, get_logger
+from .db_migrations import apply_migrations
 
 setup_logging()
 logger = get_logger(__name__)
@@ -14,7 +15,8 @@ SQL_DIR = "sql"
 async def initialize_database():
     """
     Initializes the database for asynchronous access.
-    Creates the DB file and runs all .sql scripts from the SQL_DIR.
+    Creates the DB file, runs all .sql scripts from the SQL_DIR and then applies
+    any pending versioned migrations from SQL_DIR/migrations.
     """
 
     async with aiosqlite.connect(DB_FILE, timeout=3) as db:
@@ -41,6 +43,9 @@ async def initialize_database():
 
         await db.commit()
 
+        applied = await apply_migrations(db)
+        logger.info(f"Applied {len(applied)} migration(s): {applied}")
+
     logger.info("\nDatabase initialization complete. All tables are ready.")
 
 def main():
@@ -0,0 +1,158 @@
+"""Versioned, forward-only schema migrations.
+
+Migrations live in sql/migrations as NNNN_description.sql files and are applied
+in version order on top of the base table scripts in sql/. Each migration runs
+in one write transaction together with its schema_version row, and the applied
+versions are re-read after the write lock is taken, so processes migrating the
+same database concurrently (API workers, db_init) apply every version exactly
+once. Scripts are not required to be idempotent: ALTER TABLE ... ADD COLUMN
+fails when re-run, so a database changed by other means must have its
+schema_version rows filled in by hand. After any migration is applied the
+query planner statistics are refreshed with ANALYZE.
+"""
+from __future__ import annotations
+import os
+import re
+import glob
+import time
+import asyncio
+import sqlite3
+from dataclasses import dataclass
+from typing import List
+
+import aiosqlite
+
+from .utilities import setup_logging, get_logger
+
+setup_logging()
+logger = get_logger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "sql", "migrations")
+# How long to wait for another process's migration (or any writer) to release the write lock
+MIGRATION_LOCK_TIMEOUT = float(os.getenv("MIGRATION_LOCK_TIMEOUT", "300"))  # seconds
+_MIGRATION_FILE_RE = re.compile(r"^(\d+)_([\w\-]+)\.sql$")
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    path: str
+
+def discover_migrations(migrations_dir: str = MIGRATIONS_DIR) -> List[Migration]:
+    """Return all migration scripts in ascending version order."""
+    migrations: List[Migration] = []
+    for path in glob.glob(os.path.join(migrations_dir, "*.sql")):
+        match = _MIGRATION_FILE_RE.match(os.path.basename(path))
+        if not match:
+            logger.warning(f"Ignoring migration file with unexpected name: {os.path.basename(path)}")
+            continue
+        migrations.append(Migration(version=int(match.group(1)), name=match.group(2), path=path))
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {migrations_dir}: {versions}")
+    return migrations
+
+def split_statements(script: str) -> List[str]:
+    """Split a SQL script into complete statements (trigger bodies and comments with ';' stay intact)."""
+    statements: List[str] = []
+    buffer = ""
+    for piece in script.split(";"):
+        buffer += piece + ";"
+        if sqlite3.complete_statement(buffer):
+            if _has_sql(buffer):
+                statements.append(buffer.strip())
+            buffer = ""
+    if _has_sql(buffer):
+        statements.append(buffer.strip())
+    return statements
+
+def _has_sql(text: str) -> bool:
+    lines = (line.split("--", 1)[0] for line in text.splitlines())
+    return bool("".join(lines).strip(" \t\r\n;"))
+
+async def get_applied_versions(db: aiosqlite.Connection) -> set[int]:
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version     INTEGER PRIMARY KEY,
+            name        TEXT NOT NULL,
+            applied_at  INTEGER NOT NULL
+        )
+        """
+    )
+    async with db.execute("SELECT version FROM schema_version") as cursor:
+        rows = await cursor.fetchall()
+        return {row[0] for row in rows}
+
+async def apply_migrations(db: aiosqlite.Connection, migrations_dir: str = MIGRATIONS_DIR) -> List[int]:
+    """Apply all pending migrations on `db`, each in its own transaction.
+
+    Must be called on a connection that is not inside a transaction. Other
+    processes may migrate the same database at the same time: each version is
+    checked again under the write lock, so whoever gets the lock second skips
+    what the first one applied. Returns the versions applied by this call.
+    """
+    if db.in_transaction:
+        await db.commit()
+    async with db.execute("PRAGMA busy_timeout") as cursor:
+        busy_timeout_ms = (await cursor.fetchone())[0]
+    await db.execute(f"PRAGMA busy_timeout = {int(MIGRATION_LOCK_TIMEOUT * 1000)}")
+    try:
+        newly_applied = await _apply_pending(db, migrations_dir)
+    finally:
+        await db.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+
+    if newly_applied:
+        # Refresh planner statistics so the new indexes are picked up immediately
+        await db.execute("ANALYZE")
+        if db.in_transaction:
+            await db.commit()
+    return newly_applied
+
+async def _apply_pending(db: aiosqlite.Connection, migrations_dir: str) -> List[int]:
+    applied = await get_applied_versions(db)
+    if db.in_transaction:
+        await db.commit()
+    newly_applied: List[int] = []
+    for migration in discover_migrations(migrations_dir):
+        if migration.version in applied:
+            continue
+        with open(migration.path, "r") as f:
+            statements = split_statements(f.read())
+        try:
+            # Take the write lock first, then check again: another process may have applied it meanwhile
+            await db.execute("BEGIN IMMEDIATE")
+            async with db.execute("SELECT 1 FROM schema_version WHERE version = ?", (migration.version,)) as cursor:
+                if await cursor.fetchone() is not None:
+                    await db.execute("ROLLBACK")
+                    applied.add(migration.version)
+                    continue
+            for statement in statements:
+                await db.execute(statement)
+            await db.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (migration.version, migration.name, int(time.time())),
+            )
+            await db.execute("COMMIT")
+        except Exception:
+            if db.in_transaction:
+                await db.execute("ROLLBACK")
+            logger.exception(f"Migration {migration.version:04d}_{migration.name} failed; later migrations were not applied.")
+            raise
+        newly_applied.append(migration.version)
+        logger.info(f"Applied migration {migration.version:04d}_{migration.name}")
+    return newly_applied
+
+async def migrate_database(db_file: str) -> List[int]:
+    async with aiosqlite.connect(db_file, timeout=3, isolation_level=None) as db:
+        await db.execute("PRAGMA foreign_keys = ON;")
+        return await apply_migrations(db)
+
+def main():
+    from .db_init import DB_FILE
+    applied = asyncio.run(migrate_database(DB_FILE))
+    logger.info(f"Migrations applied: {applied if applied else 'none (schema up to date)'}")
+
+if __name__ == "__main__":
+    main()
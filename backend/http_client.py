@@ -0,0 +1,139 @@
+import os
+import time
+import asyncio
+from typing import Optional
+
+import httpx
+
+from .utilities import setup_logging, get_logger
+
+setup_logging()
+logger = get_logger(__name__)
+
+# Shared outbound HTTP client configuration (env-overridable)
+HTTP_CLIENT_HTTP2 = os.getenv("HTTP_CLIENT_HTTP2", "1") == "1"
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "20"))
+HTTP_CLIENT_MAX_KEEPALIVE = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", "10"))
+HTTP_CLIENT_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", "120"))  # seconds
+HTTP_CLIENT_CONNECT_TIMEOUT = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", "30"))
+HTTP_CLIENT_READ_TIMEOUT = float(os.getenv("HTTP_CLIENT_READ_TIMEOUT", "60"))
+HTTP_CLIENT_POOL_TIMEOUT = float(os.getenv("HTTP_CLIENT_POOL_TIMEOUT", "30"))
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (installed via `httpx[http2]`)
+        return True
+    except ImportError:
+        return False
+
+class _ConnectionStats:
+    """Counts requests and the TCP/TLS handshakes they triggered, from httpcore trace events."""
+
+    def __init__(self):
+        self.requests = 0
+        self.responses = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.connect_ms_total = 0.0
+        self.http_versions: dict[str, int] = {}
+
+    def snapshot(self) -> dict:
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "requests": self.requests,
+            "responses": self.responses,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else None,
+            "tls_handshakes": self.tls_handshakes,
+            "connect_ms_avg": round(self.connect_ms_total / self.new_connections, 3) if self.new_connections else 0.0,
+            "http_versions": dict(self.http_versions),
+        }
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_stats = _ConnectionStats()
+
+async def _on_request(request: httpx.Request):
+    _stats.requests += 1
+    started: dict[str, float] = {}
+
+    async def trace(event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.started":
+            started["connect"] = time.perf_counter()
+        elif event_name == "connection.connect_tcp.complete":
+            _stats.new_connections += 1
+            if "connect" in started:
+                _stats.connect_ms_total += (time.perf_counter() - started["connect"]) * 1000
+        elif event_name == "connection.start_tls.complete":
+            _stats.tls_handshakes += 1
+
+    request.extensions["trace"] = trace
+
+async def _on_response(response: httpx.Response):
+    _stats.responses += 1
+    _stats.http_versions[response.http_version] = _stats.http_versions.get(response.http_version, 0) + 1
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = HTTP_CLIENT_HTTP2 and _http2_available()
+    if HTTP_CLIENT_HTTP2 and not http2:
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed (pip install 'httpx[http2]'); using HTTP/1.1 keep-alive.")
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=HTTP_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_CLIENT_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_CLIENT_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=HTTP_CLIENT_CONNECT_TIMEOUT,
+            read=HTTP_CLIENT_READ_TIMEOUT,
+            write=HTTP_CLIENT_READ_TIMEOUT,
+            pool=HTTP_CLIENT_POOL_TIMEOUT,
+        ),
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+    )
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Creates the application-wide client (called from the FastAPI lifespan). Idempotent."""
+    return get_http_client()
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared pooled AsyncClient, creating it on first use.
+    Outside the API server (scripts, CLIs) the client is created lazily; a client created on an
+    event loop that has since closed is replaced, since its pooled connections belong to that loop.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = _build_client()
+        _client_loop = loop
+        logger.info(
+            "Created shared HTTP client (http2=%s, max_connections=%d, max_keepalive=%d)",
+            HTTP_CLIENT_HTTP2 and _http2_available(),
+            HTTP_CLIENT_MAX_CONNECTIONS,
+            HTTP_CLIENT_MAX_KEEPALIVE,
+        )
+    return _client
+
+async def close_http_client():
+    """Closes the shared client and its pooled connections."""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+        logger.info("Shared HTTP client closed.")
+    _client = None
+    _client_loop = None
+
+def http_client_stats() -> dict:
+    """Connection reuse statistics for the shared client (cumulative since process start)."""
+    snapshot = _stats.snapshot()
+    snapshot.update({
+        "open": _client is not None and not _client.is_closed,
+        "http2_enabled": HTTP_CLIENT_HTTP2 and _http2_available(),
+        "max_connections": HTTP_CLIENT_MAX_CONNECTIONS,
+        "max_keepalive_connections": HTTP_CLIENT_MAX_KEEPALIVE,
+        "keepalive_expiry": HTTP_CLIENT_KEEPALIVE_EXPIRY,
+    })
+    return snapshot
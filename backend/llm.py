@@ -3,8 +3,9 @@ import uuid
 import time
 import asyncio
 import json
+from contextlib import nullcontext
 from jinja2 import Template
-from typing import Optional, List
+from typing import Awaitable, Callable, Optional, List
 from enum import Enum
 from typing import Type
 
@@ -14,15 +15,29 @@ from pydantic import BaseModel, Field
 import json_repair
 
 from .utilities import setup_logging, get_logger
+from .http_client import get_http_client
+from .llm_cache import LLM_CACHE_ENABLED, llm_cache_key, llm_response_cache
+from .requirement_cache import requirement_match_cache, match_context_key
+from .model_health import hedged_call, parse_fallback_models
+from .rate_limiter import (
+    LLM_RATE_LIMIT_ENABLED,
+    get_model_limiter,
+    get_retry_budget,
+    estimate_tokens,
+    parse_retry_after,
+)
 from .db import (
     get_document_master_resume,
     get_document_master_resume_json,
     upsert_job_quarantine,
     get_latest_prompt,
-    get_job_details,
+    get_job_detail_by_id,
     upsert_llm_run_v2,
-    upsert_job_skills,
-    get_job_skills_for_job
+    upsert_job_skills_many,
+    get_job_skills_for_job,
+    get_job_stage_outputs,
+    upsert_job_stage_outputs,
+    upsert_job_stage_checkpoint,
 )
 from .llm_examples import LLMExamples
 
@@ -71,7 +86,9 @@ class ResponseData_2_3(BaseModel):
 class ResponseData_3_1(BaseModel):
     assessed_objects: List[AssessedObject] = Field(..., description="A list of assessed objects with match reasoning and boolean match.")
 
-url = "https://openrouter.ai/api/v1/chat/completions"
+# OpenAI-compatible API root; point it at a local stand-in (backend/mock_openrouter.py) for offline runs
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1").rstrip("/")
+url = f"{OPENROUTER_BASE_URL}/chat/completions"
 headers = {
     "Authorization": f"Bearer {os.getenv('OPENROUTER_API_KEY')}",
     "Content-Type": "application/json"
@@ -84,6 +101,198 @@ DEFAULT_HTTP_WRITE_TIMEOUT = float(os.getenv("LLM_HTTP_WRITE_TIMEOUT", "180"))
 DEFAULT_HTTP_POOL_TIMEOUT = float(os.getenv("LLM_HTTP_POOL_TIMEOUT", "30"))
 DEFAULT_HTTP_MAX_RETRIES = int(os.getenv("LLM_HTTP_MAX_RETRIES", "2"))
 DEFAULT_HTTP_BACKOFF_BASE = float(os.getenv("LLM_HTTP_BACKOFF_BASE", "0.75"))  # seconds
+DEFAULT_HTTP_MAX_THROTTLE_RETRIES = int(os.getenv("LLM_HTTP_MAX_THROTTLE_RETRIES", "5"))  # HTTP 429 retries
+# Provider prompt caching: mark the end of the stable message prefix with a cache_control breakpoint
+LLM_PROMPT_CACHE_CONTROL = os.getenv("LLM_PROMPT_CACHE_CONTROL", "1") == "1"
+# Stage 3.1 renders its template once and splits it here: the resume part before the marker is the
+# stable context message, the job's requirement list from the marker on is the request content
+STAGE_3_1_CONTENT_MARKER = "<requirement_strings>"
+# Streamed completions (server-sent events): fail a call once no token arrives for the stall timeout
+LLM_STREAMING = os.getenv("LLM_STREAMING", "0") == "1"
+LLM_STREAM_STALL_TIMEOUT = float(os.getenv("LLM_STREAM_STALL_TIMEOUT", "30"))  # seconds between tokens
+# Wait for the first token (queueing, prompt processing); 0 = the call's read timeout (LLM_HTTP_TIMEOUT)
+LLM_STREAM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_STREAM_FIRST_TOKEN_TIMEOUT", "0"))  # seconds
+# Stage 3.1 requirements per request; chunks run concurrently and are retried independently (0 = one request)
+LLM_3_1_CHUNK_SIZE = int(os.getenv("LLM_3_1_CHUNK_SIZE", "15"))
+# Optional cross-job batching of stage 3.1 (see Stage31Batcher)
+LLM_BATCH_3_1_ENABLED = os.getenv("LLM_BATCH_3_1_ENABLED", "0") == "1"
+LLM_BATCH_3_1_WINDOW_SECONDS = float(os.getenv("LLM_BATCH_3_1_WINDOW_SECONDS", "0.5"))
+LLM_BATCH_3_1_MAX_TOKENS = int(os.getenv("LLM_BATCH_3_1_MAX_TOKENS", "4000"))  # estimated requirement-list tokens
+LLM_BATCH_3_1_MAX_JOBS = int(os.getenv("LLM_BATCH_3_1_MAX_JOBS", "8"))
+
+def build_messages(
+    system_instructions: str,
+    content: str,
+    examples: Optional[List[dict]] = None,
+    context: Optional[str] = None,
+) -> List[dict]:
+    """Chat messages ordered stable-first: system prompt, few-shot examples, shared context, then content.
+
+    Everything before `content` is identical across calls of a stage (and, with a context, across jobs
+    for the same resume), so providers can serve it from their prompt cache. With
+    LLM_PROMPT_CACHE_CONTROL the last stable message carries an ephemeral cache_control breakpoint
+    (used by Anthropic and Gemini; OpenAI-style providers cache identical prefixes automatically).
+    """
+    messages = [{"role": "system", "content": system_instructions}]
+    if examples:
+        messages.extend(dict(example) for example in examples)
+    if context:
+        messages.append({"role": "user", "content": context})
+    if LLM_PROMPT_CACHE_CONTROL:
+        last = messages[-1]
+        last["content"] = [{"type": "text", "text": last["content"], "cache_control": {"type": "ephemeral"}}]
+    messages.append({"role": "user", "content": content})
+    return messages
+
+def split_prompt_context(rendered: str, marker: str) -> tuple[Optional[str], str]:
+    """Splits a rendered prompt at `marker` into (stable context, request content).
+
+    Returns (None, rendered) when the marker is missing (e.g. an edited template), which keeps the
+    whole prompt in one message.
+    """
+    index = rendered.find(marker)
+    if index <= 0 or not rendered[:index].strip():
+        return None, rendered
+    return rendered[:index].rstrip() + "\n", rendered[index:]
+
+class StreamStallTimeout(httpx.ReadTimeout):
+    """A streamed completion produced no first token in time, or no tokens for LLM_STREAM_STALL_TIMEOUT seconds."""
+
+class _ArrayElementScanner:
+    """Incremental parser for streamed structured output of the form {"<key>": [{...}, {...}, ...]}.
+
+    `feed` takes the next piece of the completion text and returns the elements of the first array that
+    became complete, so callers can use e.g. the first assessed requirements before the response ends.
+    Only tracks nesting and string/escape state; every element is parsed once, when it closes.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._array_depth: Optional[int] = None
+        self._element_start: Optional[int] = None
+        self._done = False
+
+    def feed(self, text: str) -> list:
+        start = len(self._buffer)
+        self._buffer += text
+        completed = []
+        for i in range(start, len(self._buffer)):
+            ch = self._buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+                if self._done:
+                    continue
+                if self._array_depth is None:
+                    if ch == "[" and self._depth == 2:
+                        self._array_depth = self._depth
+                elif self._depth == self._array_depth + 1:
+                    self._element_start = i
+            elif ch in "}]":
+                if not self._done and self._array_depth is not None:
+                    if self._depth == self._array_depth + 1 and self._element_start is not None:
+                        try:
+                            completed.append(json.loads(self._buffer[self._element_start:i + 1]))
+                        except ValueError:
+                            pass  # malformed element; the final validation reports it
+                        self._element_start = None
+                    elif self._depth == self._array_depth:
+                        self._done = True
+                self._depth -= 1
+        return completed
+
+async def _read_stream(
+    client: httpx.AsyncClient,
+    payload: dict,
+    timeout: httpx.Timeout,
+    stall_timeout: float,
+    on_partial: Optional[Callable[[dict], None]] = None,
+    first_token_timeout: Optional[float] = None,
+) -> dict:
+    """POSTs `payload` with stream=True and assembles the server-sent events into a non-streamed response.
+
+    Raises StreamStallTimeout when no content or reasoning delta arrives within `first_token_timeout`
+    seconds of the request (default: `stall_timeout`), or for `stall_timeout` seconds between deltas
+    after that (OpenRouter's ': processing' keep-alive comments do not count), and RemoteProtocolError
+    for an error event mid-stream; both are retried like their non-streamed counterparts.
+    """
+    if first_token_timeout is None:
+        first_token_timeout = stall_timeout
+    started = time.monotonic()
+    async with client.stream("POST", url, headers=headers, json={**payload, "stream": True}, timeout=timeout) as response:
+        if response.is_error:
+            await response.aread()
+            response.raise_for_status()
+        parts: list[str] = []
+        usage = None
+        meta: dict = {}
+        scanner = _ArrayElementScanner() if on_partial is not None else None
+        lines = response.aiter_lines()
+        last_progress: Optional[float] = None  # time of the latest delta; None until the first one
+        while True:
+            if last_progress is None:
+                remaining = first_token_timeout - (time.monotonic() - started)
+            else:
+                remaining = stall_timeout - (time.monotonic() - last_progress)
+            try:
+                line = await asyncio.wait_for(lines.__anext__(), timeout=max(remaining, 0.001))
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                if last_progress is None:
+                    raise StreamStallTimeout(f"No first streamed token within {first_token_timeout:g}s from model {payload['model']}")
+                raise StreamStallTimeout(f"No streamed tokens for {stall_timeout:.0f}s from model {payload['model']}")
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                logger.debug(f"Skipping unparsable stream event: {data[:200]}")
+                continue
+            if chunk.get("error"):
+                raise httpx.RemoteProtocolError(f"Stream error from OpenRouter: {chunk['error']}")
+            for field in ("id", "model", "provider"):
+                if field in chunk:
+                    meta[field] = chunk[field]
+            if chunk.get("usage"):
+                usage = chunk["usage"]
+            for choice in chunk.get("choices") or []:
+                delta = choice.get("delta") or {}
+                if delta.get("reasoning"):
+                    last_progress = time.monotonic()
+                piece = delta.get("content")
+                if piece:
+                    last_progress = time.monotonic()
+                    parts.append(piece)
+                    if scanner is not None:
+                        for element in scanner.feed(piece):
+                            try:
+                                on_partial(element)  # type: ignore
+                            except Exception as e:
+                                logger.warning(f"Partial result callback failed: {e}")
+    if usage is None:
+        logger.warning(f"Streamed response from model {payload['model']} reported no usage")
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    return {
+        **meta,
+        "choices": [{"message": {"role": "assistant", "content": "".join(parts)}}],
+        "usage": usage,
+    }
 
 async def fetch_response(
     content: str, 
@@ -93,6 +302,9 @@ async def fetch_response(
     response_schema: Type[BaseModel], 
     max_reasoning_tokens: Optional[int] = 2000,
     examples: Optional[List[dict]] = None,
+    context: Optional[str] = None,
+    stream: Optional[bool] = None,
+    on_partial: Optional[Callable[[dict], None]] = None,
     timeout_read: Optional[float] = None,
     timeout_connect: Optional[float] = None,
     timeout_write: Optional[float] = None,
@@ -100,9 +312,14 @@ async def fetch_response(
     """Call the OpenRouter chat completions endpoint with a JSON schema enforced response.
 
     This function:
-      * Assembles the messages (system + optional few-shot examples + user)
+      * Assembles the messages stable-prefix first (system + optional few-shot examples + optional
+        shared context, with a provider cache_control hint) followed by the user content
       * Specifies a JSON schema (pydantic model) the model must conform to
+      * Optionally streams the completion (SSE), failing on an inter-token stall instead of a total
+        read timeout and handing each completed array element to `on_partial` as it arrives
       * Implements retry logic for transient network/server errors with exponential backoff
+      * Paces calls through the per-model rate limiter (RPM/TPM buckets, AIMD concurrency) and honours
+        HTTP 429 Retry-After; all retries draw on a shared retry budget
       * Attempts several lightweight repairs of model output (code fences, key aliases, category normalization)
       * Validates (or re-validates) the repaired JSON against the provided pydantic schema
 
@@ -122,6 +339,14 @@ async def fetch_response(
         Reserved reasoning token budget passed to provider (if applicable).
     examples : Optional[List[dict]]
         Few-shot example messages (each item must have role+content as expected by API).
+    context : Optional[str]
+        Request-independent user context (e.g. the resume for stage 3.1), sent after the examples
+        as part of the cacheable prefix.
+    stream : Optional[bool]
+        Stream the completion; defaults to LLM_STREAMING.
+    on_partial : Optional[Callable[[dict], None]]
+        With streaming, called with each element of the response's list (e.g. one assessed requirement)
+        as soon as it is complete. Elements of an attempt that is later retried are reported again.
     timeout_read / timeout_connect / timeout_write : Optional[float]
         Optional overrides for httpx timeout phases (seconds).
     max_retries : Optional[int]
@@ -145,10 +370,7 @@ async def fetch_response(
         model, temperature, max_reasoning_tokens
     )
 
-    messages = [{"role": "system", "content": system_instructions}]
-    if examples:
-        messages.extend(examples)
-    messages.append({"role": "user", "content": content})
+    messages = build_messages(system_instructions, content, examples=examples, context=context)
 
     payload = {
         "model": model,
@@ -176,6 +398,7 @@ async def fetch_response(
     conn_t = timeout_connect if timeout_connect is not None else DEFAULT_HTTP_CONNECT_TIMEOUT
     write_t = timeout_write if timeout_write is not None else DEFAULT_HTTP_WRITE_TIMEOUT
     retries = DEFAULT_HTTP_MAX_RETRIES if max_retries is None else max_retries
+    streaming = LLM_STREAMING if stream is None else stream
 
     def _strip_code_fences(s: str) -> str:
         s_strip = s.strip()
@@ -263,43 +486,74 @@ async def fetch_response(
                                     item["match"] = False
         return obj
 
+    # Per-model RPM/TPM buckets + AIMD concurrency, and a process-wide retry budget
+    limiter = get_model_limiter(model) if LLM_RATE_LIMIT_ENABLED else None
+    retry_budget = get_retry_budget()
+    retry_budget.deposit()
+    estimated_tokens = estimate_tokens(messages)
+
     attempt = 0
+    throttle_retries = 0
     while True:
         try:
-            async with httpx.AsyncClient(
-                timeout=httpx.Timeout(connect=conn_t, read=read_t, write=write_t, pool=DEFAULT_HTTP_POOL_TIMEOUT)
-            ) as client:
-                response = await client.post(url, headers=headers, json=payload)
+            # Shared pooled client: connections (and TLS sessions) are reused across attempts and stages
+            client = get_http_client()
+            async with (limiter.slot(estimated_tokens) if limiter is not None else nullcontext()):
+                if streaming:
+                    first_token_t = LLM_STREAM_FIRST_TOKEN_TIMEOUT or read_t
+                    resp_json = await _read_stream(
+                        client,
+                        payload,
+                        # The socket read timeout must not cut the (longer) wait for the first token short
+                        httpx.Timeout(connect=conn_t, read=max(first_token_t, LLM_STREAM_STALL_TIMEOUT), write=write_t, pool=DEFAULT_HTTP_POOL_TIMEOUT),
+                        LLM_STREAM_STALL_TIMEOUT,
+                        on_partial,
+                        first_token_timeout=first_token_t,
+                    )
+                else:
+                    response = await client.post(
+                        url,
+                        headers=headers,
+                        json=payload,
+                        timeout=httpx.Timeout(connect=conn_t, read=read_t, write=write_t, pool=DEFAULT_HTTP_POOL_TIMEOUT),
+                    )
+            if not streaming:
                 response.raise_for_status()
                 # resp_json = response.json()
                 resp_json = json_repair.repair_json(response.text, return_objects=True)
-                text = resp_json['choices'][0]['message']['content'] # type: ignore
-                # First, strip potential code fences
-                candidate_text = _strip_code_fences(text)
+            if limiter is not None:
+                usage = resp_json.get('usage') if isinstance(resp_json, dict) else None
+                await limiter.on_success(estimated_tokens, usage.get('total_tokens') if isinstance(usage, dict) else None)
+            text = resp_json['choices'][0]['message']['content'] # type: ignore
+            # First, strip potential code fences
+            candidate_text = _strip_code_fences(text)
+            try:
+                response_schema.model_validate_json(candidate_text)
+                # If we stripped fences, embed the cleaned text back; otherwise return original
+                if candidate_text != text:
+                    resp_json['choices'][0]['message']['content'] = candidate_text # type: ignore
+                return resp_json
+            except ValueError:
+                # Attempt to repair common key/format issues and revalidate
                 try:
-                    response_schema.model_validate_json(candidate_text)
-                    # If we stripped fences, embed the cleaned text back; otherwise return original
-                    if candidate_text != text:
-                        resp_json['choices'][0]['message']['content'] = candidate_text # type: ignore
+                    data_obj = json.loads(candidate_text)
+                    repaired = _repair_payload_for_schema(data_obj)
+                    repaired_text = json.dumps(repaired, ensure_ascii=False)
+                    response_schema.model_validate_json(repaired_text)
+                    resp_json['choices'][0]['message']['content'] = repaired_text # type: ignore
                     return resp_json
-                except ValueError:
-                    # Attempt to repair common key/format issues and revalidate
-                    try:
-                        data_obj = json.loads(candidate_text)
-                        repaired = _repair_payload_for_schema(data_obj)
-                        repaired_text = json.dumps(repaired, ensure_ascii=False)
-                        response_schema.model_validate_json(repaired_text)
-                        resp_json['choices'][0]['message']['content'] = repaired_text # type: ignore
-                        return resp_json
-                    except Exception as ve2:
-                        logger.exception(f"Response content: {text}")
-                        raise ValueError(f"Response validation error: {ve2}")
+                except Exception as ve2:
+                    logger.exception(f"Response content: {text}")
+                    raise ValueError(f"Response validation error: {ve2}")
         except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.WriteTimeout, httpx.RemoteProtocolError) as e:
             if attempt >= retries:
                 logger.exception(
                     f"HTTP timeout-related error after {attempt+1} attempt(s): {e}"
                 )
                 raise
+            if not retry_budget.try_spend():
+                logger.error(f"Retry budget exhausted; not retrying {type(e).__name__} for model {model}")
+                raise
             # Exponential backoff with small jitter based on loop time fraction
             jitter = 0.1 * (asyncio.get_running_loop().time() % 1)
             backoff = DEFAULT_HTTP_BACKOFF_BASE * (2 ** attempt) + jitter
@@ -311,8 +565,25 @@ async def fetch_response(
             attempt += 1
         except httpx.HTTPStatusError as e:
             status = e.response.status_code
+            if status == 429:
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                if limiter is not None:
+                    limiter.on_throttled(retry_after)
+                if throttle_retries < DEFAULT_HTTP_MAX_THROTTLE_RETRIES and retry_budget.try_spend():
+                    throttle_retries += 1
+                    if limiter is None or retry_after is None:
+                        # Without Retry-After (or a limiter to enforce it) fall back to exponential backoff
+                        jitter = 0.1 * (asyncio.get_running_loop().time() % 1)
+                        delay = retry_after if retry_after is not None else DEFAULT_HTTP_BACKOFF_BASE * (2 ** throttle_retries) + jitter
+                        await asyncio.sleep(delay)
+                    logger.warning(
+                        f"HTTP 429 from OpenRouter for model {model} (throttle retry {throttle_retries}/{DEFAULT_HTTP_MAX_THROTTLE_RETRIES})"
+                    )
+                    continue
+                logger.error(f"HTTP 429 for model {model}; throttle retries or retry budget exhausted")
+                raise
             is_server_error = 500 <= status < 600
-            if is_server_error and attempt < retries:
+            if is_server_error and attempt < retries and retry_budget.try_spend():
                 jitter = 0.1 * (asyncio.get_running_loop().time() % 1)
                 backoff = DEFAULT_HTTP_BACKOFF_BASE * (2 ** attempt) + jitter
                 logger.warning(
@@ -334,34 +605,65 @@ async def generate(
         llm_run_system_prompt_id: str,
         llm_run_type: str,
         max_thinking: Optional[int] = 2000,
-        examples: Optional[List[dict]] = None
+        examples: Optional[List[dict]] = None,
+        bypass_cache: bool = False,
+        context: Optional[str] = None,
+        on_partial: Optional[Callable[[dict], None]] = None,
+        fallback_models: Optional[List[str]] = None
         ):
     """High-level wrapper around `fetch_response` that records metadata in persistence layer.
 
     Responsibilities:
-      * Invoke the LLM (structured) via `fetch_response`.
+      * Serve byte-identical requests from the LLM response cache (unless `bypass_cache`; a bypassed
+        call still refreshes the cache entry).
+      * Invoke the LLM (structured) via `fetch_response`, hedged across `fallback_models` (see
+        model_health.hedged_call); the run is recorded under the model that answered.
       * Parse validated JSON content.
-      * Extract usage metrics (tokens, reasoning tokens if available).
+      * Extract usage metrics (tokens, reasoning tokens and provider prompt-cache hits if available).
       * Record the run (audit trail) to the database via `upsert_llm_run_v2`.
 
     Returns
     -------
     dict
-        {"data": <parsed json>, "tokens": {model, input_tokens, output_tokens, thinking_tokens, total_tokens}}
+        {"data": <parsed json>, "tokens": {model, input_tokens, output_tokens, thinking_tokens, cached_tokens, total_tokens}}
+
+    `context` (see fetch_response) is part of the cache key. `content` is recorded as the run input and
+    `context` as the run context (a separate, shared llm_blob).
+    `on_partial` is passed to fetch_response (streaming only; not called for cache hits).
+    Only answers from `model` are written to the response cache, so a fallback answer is not replayed
+    once the primary has recovered.
     """
     llm_run_id = str(uuid.uuid4())
 
     try:
         time_start = time.time()
-        response = await fetch_response(
-            content=content,
-            system_instructions=system_instructions,
-            model=model,
-            temperature=temperature,
-            response_schema=response_schema,
-            max_reasoning_tokens=max_thinking,
-            examples=examples
-        )
+        cache_key = None
+        response = None
+        if LLM_CACHE_ENABLED:
+            cache_key = llm_cache_key(model, system_instructions, examples, content, temperature, response_schema, context=context)
+            if bypass_cache:
+                llm_response_cache.bypasses += 1
+            else:
+                response = await llm_response_cache.get(cache_key)
+        cache_hit = response is not None
+        served_by = model
+        if response is None:
+            response, served_by = await hedged_call(
+                [model, *(fallback_models or [])],
+                lambda candidate: fetch_response(
+                    content=content,
+                    system_instructions=system_instructions,
+                    model=candidate,
+                    temperature=temperature,
+                    response_schema=response_schema,
+                    max_reasoning_tokens=max_thinking,
+                    examples=examples,
+                    context=context,
+                    on_partial=on_partial
+                ),
+            )
+            if cache_key is not None and served_by == model:
+                await llm_response_cache.put(cache_key, model, response)  # type: ignore
         time_end = time.time()
 
         # Extract response data
@@ -373,6 +675,7 @@ async def generate(
         input_tokens = usage['prompt_tokens']  # type: ignore
         output_tokens = usage['completion_tokens']  # type: ignore
         reasoning_tokens = usage.get('completion_tokens_details', {}).get('reasoning_tokens', 0) or 0  # type: ignore
+        cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens')  # type: ignore
         total_tokens = usage['total_tokens']  # type: ignore
 
         llm_run_output = str(parsed_data)
@@ -381,7 +684,7 @@ async def generate(
             llm_run_id=llm_run_id,
             job_id=job_id,
             llm_run_type=llm_run_type,
-            llm_run_model_id=model,
+            llm_run_model_id=served_by,
             llm_run_system_prompt_id=llm_run_system_prompt_id,
             llm_run_input=content,
             llm_run_output=llm_run_output,
@@ -391,15 +694,21 @@ async def generate(
             llm_run_total_tokens=total_tokens,  # type: ignore
             llm_run_start=time_start,
             llm_run_end=time_end,
+            llm_run_cache_hit=cache_hit,
+            llm_run_cached_tokens=cached_tokens,
+            llm_run_context=context,
+            # A cache hit should cost microseconds, so its audit row is group-committed in the background
+            wait=not cache_hit,
         )
 
         return {
             "data": parsed_data,
             "tokens": {
-                "model": model,
+                "model": served_by,
                 "input_tokens": input_tokens,
                 "output_tokens": output_tokens,
                 "thinking_tokens": reasoning_tokens,
+                "cached_tokens": cached_tokens,
                 "total_tokens": total_tokens,
             }
         }
@@ -407,251 +716,728 @@ async def generate(
         logger.exception(f"Error generating content: {e}")
         raise e
 
-async def process_single_job_assessment(
-    job: dict, 
-    resume: dict,
-    resume_json: dict,
-    prompt_configuration_2_1: dict,
-    prompt_configuration_2_2: dict, 
-    prompt_configuration_2_3: dict,
-    prompt_configuration_3_1: dict,
-    semaphore: asyncio.Semaphore
-) -> bool:
-    """Process assessment for a single job with semaphore control for concurrency.
-    
-    Returns:
-        bool: True if the job assessment was completed successfully, False if it failed.
+class _Stage31Batch:
+    __slots__ = ("key", "prompt_configuration", "resume", "resume_json", "entries", "content_chars", "flushed")
+
+    def __init__(self, key: tuple, prompt_configuration: dict, resume: dict, resume_json: dict):
+        self.key = key
+        self.prompt_configuration = prompt_configuration
+        self.resume = resume
+        self.resume_json = resume_json
+        self.entries: list[tuple[str, list[dict], str, asyncio.Future]] = []  # (job_id, items, content, future)
+        self.content_chars = 0
+        self.flushed = False
+
+class Stage31Batcher:
+    """Coalesces the stage 3.1 requests of concurrently assessed jobs into one LLM call.
+
+    Jobs that reach 3.1 with the same prompt and resume within LLM_BATCH_3_1_WINDOW_SECONDS are sent
+    as one combined requirement list, so the resume prefix is paid for once. A batch is sent early once
+    its requirement content reaches LLM_BATCH_3_1_MAX_TOKENS (estimated) or LLM_BATCH_3_1_MAX_JOBS jobs.
+    The results are split back per job by position, and each slice must echo exactly that job's
+    requirement strings; otherwise (a dropped, extra or reordered item) every job is re-sent on its own.
+    Each job gets its own llm_runs_v2 row for the batched call (also when its answer was discarded),
+    with the call's token usage apportioned by the job's share of the requirement content / response.
+    A failed batch call fails every member; their retries go out unbatched.
     """
-    # Helper for consistent token usage aggregation (local, inner to avoid exporting globally)
-    def _accumulate_tokens(model_name: str, token_details_by_model: dict, result: dict):
-        details = token_details_by_model.setdefault(model_name, {'input': 0, 'output': 0, 'thinking': 0})
-        details['input'] += result['tokens']['input_tokens']
-        details['output'] += result['tokens']['output_tokens']
-        details['thinking'] += result['tokens']['thinking_tokens']
-    async with semaphore:
-        job_id = job['job_id']
-        logger.info(f"Generating job assessment for job_id {job_id}")
 
-        has_errors = False
-        token_details_by_model: dict = {}  # Track detailed token consumption by model
+    def __init__(
+        self,
+        window_seconds: float = LLM_BATCH_3_1_WINDOW_SECONDS,
+        max_tokens: int = LLM_BATCH_3_1_MAX_TOKENS,
+        max_jobs: int = LLM_BATCH_3_1_MAX_JOBS,
+    ):
+        self.window_seconds = window_seconds
+        self.max_tokens = max_tokens
+        self.max_jobs = max(1, max_jobs)
+        self._pending: dict[tuple, _Stage31Batch] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched_jobs = 0
+        self.failed_batches = 0
+        self.mismatched_batches = 0
+
+    @staticmethod
+    def _render(prompt_configuration: dict, resume: dict, resume_json: dict, items: list[dict]) -> tuple[Optional[str], str]:
+        return split_prompt_context(
+            Template(prompt_configuration['prompt_template']).render(
+                candidate_profile=resume_json['document_markdown'],
+                resume_text=resume['document_markdown'],
+                requirement_strings=items
+            ),
+            STAGE_3_1_CONTENT_MARKER,
+        )
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def submit(self, job_id: str, prompt_configuration: dict, resume: dict, resume_json: dict, items: list[dict]) -> dict:
+        """Queues `items` of job_id for a batched 3.1 call; returns the job's {"data", "tokens"} like `generate`."""
+        key = (prompt_configuration['prompt_id'], resume['document_id'], resume_json['document_id'])
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = _Stage31Batch(key, prompt_configuration, resume, resume_json)
+            self._pending[key] = batch
+            self._spawn(self._flush_later(batch))
+        items = [dict(item) for item in items]
+        _, content = self._render(prompt_configuration, resume, resume_json, items)
+        future = asyncio.get_running_loop().create_future()
+        batch.entries.append((job_id, items, content, future))
+        batch.content_chars += len(content)
+        if len(batch.entries) >= self.max_jobs or batch.content_chars // 4 >= self.max_tokens:
+            self._spawn(self._flush(batch))
+        return await future
+
+    async def _flush_later(self, batch: _Stage31Batch):
+        await asyncio.sleep(self.window_seconds)
+        await self._flush(batch)
+
+    async def _flush(self, batch: _Stage31Batch):
+        if batch.flushed:
+            return
+        batch.flushed = True
+        if self._pending.get(batch.key) is batch:
+            del self._pending[batch.key]
+        entries = [entry for entry in batch.entries if not entry[3].done()]  # skip cancelled waiters
+        if not entries:
+            return
+        if len(entries) == 1:
+            await self._run_single(batch, entries[0])
+            return
 
-        # Step 2.1: Job description tagging
-        content_2_1_template = Template(prompt_configuration_2_1['prompt_template'])
-        content_2_1 = content_2_1_template.render(job_description=job['job_description'])
         try:
-            result_2_1 = await generate(
-                content=content_2_1,
-                system_instructions=prompt_configuration_2_1['prompt_system_prompt'],
-                model=prompt_configuration_2_1['model_id'],
-                temperature=prompt_configuration_2_1['prompt_temperature'],
-                response_schema=ResponseData_2_1,
-                max_thinking=prompt_configuration_2_1['prompt_thinking_budget'],
-                job_id=job['job_id'],
-                llm_run_system_prompt_id=prompt_configuration_2_1['prompt_id'],
-                llm_run_type=prompt_configuration_2_1['llm_run_type'],
-                examples=LLMExamples.example_2_1
-            )
-            _accumulate_tokens(result_2_1['tokens']['model'], token_details_by_model, result_2_1)
+            distributed = await self._run_batch(batch, entries)
         except Exception as e:
-            logger.exception(f"Error generating job description tagging for job {job['job_id']}: {e}")
-            await upsert_job_quarantine(
-                job_quarantine_id=str(uuid.uuid4()),
-                job_id=job['job_id'],
-                job_quarantine_reason="failed_generate_jobdesc_tagging",
-                job_quarantine_timestamp=int(time.time())
-            )
-            return False
-
-        # Step 2.2: Job description atomizing
-        content_2_2_template = Template(prompt_configuration_2_2['prompt_template'])
-        content_2_2 = content_2_2_template.render(tagged_list=str(result_2_1['data']['tagged_list']))  # type: ignore
+            self.failed_batches += 1
+            logger.warning(f"Batched 3.1 call for {len(entries)} jobs failed: {e}")
+            for entry in entries:
+                if not entry[3].done():
+                    entry[3].set_exception(e)
+            return
+        if not distributed:
+            # The merged answer could not be attributed safely; every job asks on its own instead
+            self.mismatched_batches += 1
+            await asyncio.gather(*(self._run_single(batch, entry) for entry in entries if not entry[3].done()))
+
+    async def _run_single(self, batch: _Stage31Batch, entry: tuple):
+        job_id, items, content, future = entry
+        prompt_configuration = batch.prompt_configuration
+        context, _ = self._render(prompt_configuration, batch.resume, batch.resume_json, items)
         try:
-            result_2_2 = await generate(
-                content=content_2_2,
-                system_instructions=prompt_configuration_2_2['prompt_system_prompt'],
-                model=prompt_configuration_2_2['model_id'],
-                temperature=prompt_configuration_2_2['prompt_temperature'],
-                response_schema=ResponseData_2_2,
-                max_thinking=prompt_configuration_2_2['prompt_thinking_budget'],
-                job_id=job['job_id'],
-                llm_run_system_prompt_id=prompt_configuration_2_2['prompt_id'],
-                llm_run_type=prompt_configuration_2_2['llm_run_type'],
-                examples=LLMExamples.example_2_2
+            result = await generate(
+                content=content,
+                system_instructions=prompt_configuration['prompt_system_prompt'],
+                model=prompt_configuration['model_id'],
+                temperature=prompt_configuration['prompt_temperature'],
+                response_schema=ResponseData_3_1,
+                max_thinking=prompt_configuration['prompt_thinking_budget'],
+                job_id=job_id,
+                llm_run_system_prompt_id=prompt_configuration['prompt_id'],
+                llm_run_type=prompt_configuration['llm_run_type'],
+                examples=LLMExamples.example_3_1,
+                context=context,
+                fallback_models=parse_fallback_models(
+                    prompt_configuration.get('prompt_fallback_model_ids'), prompt_configuration['model_id']
+                ),
             )
-            _accumulate_tokens(result_2_2['tokens']['model'], token_details_by_model, result_2_2)
         except Exception as e:
-            logger.exception(f"Error generating job description atomizing for job {job['job_id']}: {e}")
-            await upsert_job_quarantine(
-                job_quarantine_id=str(uuid.uuid4()),
-                job_id=job['job_id'],
-                job_quarantine_reason="failed_generate_jobdesc_atomizing",
-                job_quarantine_timestamp=int(time.time())
-            )
-            return False
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def _split(entries: list, assessed_objects: list) -> Optional[list[list]]:
+        """Per-job slices of the merged answer, or None unless every slice echoes exactly that job's requirements."""
+        combined_items = [item for entry in entries for item in entry[1]]
+        if len(assessed_objects) != len(combined_items):
+            logger.warning(f"Batched 3.1 returned {len(assessed_objects)} results for {len(combined_items)} requirements")
+            return None
+        slices = []
+        offset = 0
+        for job_id, items, _, _ in entries:
+            part = assessed_objects[offset:offset + len(items)]
+            offset += len(items)
+            for item, assessed in zip(items, part):
+                expected = " ".join(str(item.get('requirement_string', '')).split())
+                returned = " ".join(str(assessed.get('requirement_string', '')).split())
+                if expected != returned:
+                    logger.warning(f"Batched 3.1 result for job_id {job_id} is out of order ({returned!r} where {expected!r} was sent)")
+                    return None
+            slices.append(part)
+        return slices
+
+    async def _run_batch(self, batch: _Stage31Batch, entries: list) -> bool:
+        """
+        Sends the merged request and resolves every entry's future from its slice of the answer.
+        Returns False (futures untouched) when the answer cannot be attributed to the jobs; the call's
+        tokens are still recorded, apportioned to the jobs, with the raw answer as output.
+        """
+        prompt_configuration = batch.prompt_configuration
+        primary_model = prompt_configuration['model_id']
+        combined_items = [item for entry in entries for item in entry[1]]
+        context, combined_content = self._render(prompt_configuration, batch.resume, batch.resume_json, combined_items)
+        logger.info(f"Sending batched 3.1 request for {len(entries)} jobs ({len(combined_items)} requirements)")
+
+        time_start = time.time()
+        response, model = await hedged_call(
+            [primary_model, *parse_fallback_models(prompt_configuration.get('prompt_fallback_model_ids'), primary_model)],
+            lambda candidate: fetch_response(
+                content=combined_content,
+                system_instructions=prompt_configuration['prompt_system_prompt'],
+                model=candidate,
+                temperature=prompt_configuration['prompt_temperature'],
+                response_schema=ResponseData_3_1,
+                max_reasoning_tokens=prompt_configuration['prompt_thinking_budget'],
+                examples=LLMExamples.example_3_1,
+                context=context,
+            ),
+        )
+        time_end = time.time()
 
-        # Step 2.3: Final classification for all atomic objects at once
-        content_2_3_template = Template(prompt_configuration_2_3['prompt_template'])
-        content_2_3 = content_2_3_template.render(atomic_objects=result_2_2['data']['atomic_objects'])  # type: ignore
+        raw_output = response['choices'][0]['message']['content']  # type: ignore
         try:
-            result_2_3 = await generate(
-                content=content_2_3,
-                system_instructions=prompt_configuration_2_3['prompt_system_prompt'],
-                model=prompt_configuration_2_3['model_id'],
-                temperature=prompt_configuration_2_3['prompt_temperature'],
-                response_schema=ResponseData_2_3,
-                max_thinking=prompt_configuration_2_3['prompt_thinking_budget'],
-                job_id=job['job_id'],
-                llm_run_system_prompt_id=prompt_configuration_2_3['prompt_id'],
-                llm_run_type=prompt_configuration_2_3['llm_run_type'],
-                examples=LLMExamples.example_2_3
-            )
-            _accumulate_tokens(result_2_3['tokens']['model'], token_details_by_model, result_2_3)
-
-            final_classifications = []
-            for classified_obj in result_2_3['data']['classified_objects']:  # type: ignore
-                final_classifications.append({
-                    "requirement_string": classified_obj['requirement_string'],
-                    "classification": classified_obj['classification']
-                })
-        except Exception as e:
-            logger.exception(f"Error generating final classification for job {job['job_id']}: {e}")
-            has_errors = True
-
-        if has_errors:
-            await upsert_job_quarantine(
-                job_quarantine_id=str(uuid.uuid4()),
-                job_id=job['job_id'],
-                job_quarantine_reason="failed_generate_jobdesc_final",
-                job_quarantine_timestamp=int(time.time())
+            slices = self._split(entries, json.loads(raw_output)['assessed_objects'])
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.warning(f"Batched 3.1 returned a malformed answer: {e}")
+            slices = None
+        if slices is None:
+            outputs = [raw_output] * len(entries)
+        else:
+            outputs = [str({"assessed_objects": part}) for part in slices]
+
+        usage = response['usage']  # type: ignore
+        reasoning_tokens = usage.get('completion_tokens_details', {}).get('reasoning_tokens', 0) or 0  # type: ignore
+        cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens')  # type: ignore
+        content_total = sum(len(entry[2]) for entry in entries) or 1
+        output_total = sum(len(text) for text in outputs) or 1
+
+        results = []
+        for index, ((job_id, items, content, future), output_text) in enumerate(zip(entries, outputs)):
+            # Shared prefix tokens go by requirement content share, completion tokens by response share
+            in_share = len(content) / content_total
+            out_share = len(output_text) / output_total
+            tokens = {
+                "model": model,
+                "input_tokens": round(usage['prompt_tokens'] * in_share),  # type: ignore
+                "output_tokens": round(usage['completion_tokens'] * out_share),  # type: ignore
+                "thinking_tokens": round(reasoning_tokens * out_share),
+                "cached_tokens": round(cached_tokens * in_share) if cached_tokens is not None else None,
+            }
+            tokens["total_tokens"] = tokens["input_tokens"] + tokens["output_tokens"]
+            await upsert_llm_run_v2(
+                llm_run_id=str(uuid.uuid4()),
+                job_id=job_id,
+                llm_run_type=prompt_configuration['llm_run_type'],
+                llm_run_model_id=model,
+                llm_run_system_prompt_id=prompt_configuration['prompt_id'],
+                llm_run_input=content,
+                llm_run_output=output_text,
+                llm_run_input_tokens=tokens["input_tokens"],
+                llm_run_output_tokens=tokens["output_tokens"],
+                llm_run_thinking_tokens=tokens["thinking_tokens"],
+                llm_run_total_tokens=tokens["total_tokens"],
+                llm_run_start=time_start,
+                llm_run_end=time_end,
+                llm_run_cached_tokens=tokens["cached_tokens"],
+                llm_run_context=context,
             )
+            if slices is not None:
+                results.append((future, {"data": {"assessed_objects": slices[index]}, "tokens": tokens}))
+        if slices is None:
             return False
 
-        # Step 3.1: Assessment for all filtered items at once
-        filtered_items = [item for item in final_classifications if item['classification'] != 'evaluated_qualification' and item['classification'] is not None and item['classification'] != '']
+        self.batches += 1
+        self.batched_jobs += len(entries)
+        for future, result in results:
+            if not future.done():
+                future.set_result(result)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "enabled": LLM_BATCH_3_1_ENABLED,
+            "window_seconds": self.window_seconds,
+            "max_tokens": self.max_tokens,
+            "max_jobs": self.max_jobs,
+            "batches": self.batches,
+            "batched_jobs": self.batched_jobs,
+            "jobs_per_batch_avg": round(self.batched_jobs / self.batches, 2) if self.batches else None,
+            "failed_batches": self.failed_batches,
+            "mismatched_batches": self.mismatched_batches,
+            "pending_batches": len(self._pending),
+        }
 
-        if filtered_items:
-            content_3_1_template = Template(prompt_configuration_3_1['prompt_template'])
-            content_3_1 = content_3_1_template.render(
-                candidate_profile=resume_json['document_markdown'],
-                resume_text=resume['document_markdown'],
-                requirement_strings=filtered_items
+stage_3_1_batcher = Stage31Batcher()
+
+async def generate_stage(
+        job_id: str,
+        prompt_configuration: dict,
+        content: str,
+        response_schema,
+        examples: Optional[List[dict]] = None,
+        previous_outputs: Optional[dict] = None,
+        bypass_cache: bool = False,
+        checkpoint: bool = False,
+        context: Optional[str] = None,
+        batch: Optional[Callable[[], Awaitable[dict]]] = None,
+        on_partial: Optional[Callable[[dict], None]] = None,
+        stage_key: Optional[str] = None
+        ):
+    """Run one assessment stage through `generate`, or reuse its stored output.
+
+    A stage is reused when `previous_outputs` (from get_job_stage_outputs) holds an output for this
+    llm_run_type produced by the same prompt_id and an identical request (same hash as the response
+    cache key: model, system prompt, examples, context, content, temperature, schema).
+    With `checkpoint`, a freshly generated output is written to job_stage_checkpoint before returning,
+    so a later retry of the job resumes after this stage.
+    `batch`, when given, produces the fresh result instead of `generate` (e.g. Stage31Batcher.submit);
+    reuse and checkpointing are unchanged.
+    `stage_key` names the stored output when a stage is split into several requests (e.g. 3.1 chunks);
+    it defaults to the llm_run_type.
+    The prompt's prompt_fallback_model_ids are passed to `generate` for hedging / failover; the reuse
+    hash is keyed on the prompt's model_id whichever model answered.
+
+    Returns
+    -------
+    dict
+        {"data", "tokens", "reused", "stage_output"}; tokens is None for a reused stage and
+        stage_output is the record to persist with upsert_job_stage_outputs once validated.
+    """
+    run_type = prompt_configuration['llm_run_type']
+    stage_key = stage_key or run_type
+    input_hash = llm_cache_key(
+        prompt_configuration['model_id'],
+        prompt_configuration['prompt_system_prompt'],
+        examples,
+        content,
+        prompt_configuration['prompt_temperature'],
+        response_schema,
+        context=context,
+    )
+    stored = (previous_outputs or {}).get(stage_key)
+    if (not bypass_cache and stored is not None
+            and stored['input_hash'] == input_hash
+            and stored['prompt_id'] == prompt_configuration['prompt_id']):
+        logger.info(f"Reusing stored {stage_key} output for job_id {job_id}")
+        data = stored['output']
+        result = {"data": data, "tokens": None, "reused": True}
+    elif batch is not None:
+        result = dict(await batch())
+        result["reused"] = False
+        data = result["data"]
+    else:
+        result = await generate(
+            content=content,
+            system_instructions=prompt_configuration['prompt_system_prompt'],
+            model=prompt_configuration['model_id'],
+            temperature=prompt_configuration['prompt_temperature'],
+            response_schema=response_schema,
+            max_thinking=prompt_configuration['prompt_thinking_budget'],
+            job_id=job_id,
+            llm_run_system_prompt_id=prompt_configuration['prompt_id'],
+            llm_run_type=run_type,
+            examples=examples,
+            bypass_cache=bypass_cache,
+            context=context,
+            on_partial=on_partial,
+            fallback_models=parse_fallback_models(
+                prompt_configuration.get('prompt_fallback_model_ids'), prompt_configuration['model_id']
             )
+        )
+        result["reused"] = False
+        data = result["data"]
+    result["stage_output"] = {
+        "stage_run_type": stage_key,
+        "input_hash": input_hash,
+        "prompt_id": prompt_configuration['prompt_id'],
+        "output": data,
+    }
+    if checkpoint and not result["reused"]:
+        try:
+            await upsert_job_stage_checkpoint(job_id, result["stage_output"])
+        except Exception as e:
+            # Losing a checkpoint only costs a rerun of this stage on retry
+            logger.warning(f"Failed to checkpoint {stage_key} for job_id {job_id}: {e}")
+    return result
+
+class JobAssessment:
+    """One job's state as it moves through the assessment stages (see ASSESSMENT_STAGES)."""
+
+    def __init__(
+        self,
+        job: dict,
+        resume: dict,
+        resume_json: dict,
+        prompt_configuration_2_1: dict,
+        prompt_configuration_2_2: dict,
+        prompt_configuration_2_3: dict,
+        prompt_configuration_3_1: dict,
+        reuse_stage_outputs: bool = False,
+    ):
+        self.job = job
+        self.job_id = job['job_id']
+        self.resume = resume
+        self.resume_json = resume_json
+        self.prompt_configuration_2_1 = prompt_configuration_2_1
+        self.prompt_configuration_2_2 = prompt_configuration_2_2
+        self.prompt_configuration_2_3 = prompt_configuration_2_3
+        self.prompt_configuration_3_1 = prompt_configuration_3_1
+        self.reuse_stage_outputs = reuse_stage_outputs
+        self.previous_outputs: dict = {}
+        self.stage_outputs: list[dict] = []  # validated outputs, persisted once the whole assessment succeeds
+        self.token_details_by_model: dict = {}  # Track detailed token consumption by model
+        self.tagged_list: list = []
+        self.atomic_objects: list = []
+        self.final_classifications: list[dict] = []
+        self.filtered_items: list[dict] = []
+        self.uncached_items: list[dict] = []
+        self.match_context: Optional[str] = None  # requirement cache key of the 3.1 prompt and resume (match_context_key)
+        self.stage_seconds: dict[str, float] = {}  # wall time per stage (run_assessment_stages)
+
+    def record(self, result: dict):
+        """Keeps a stage result's output for persistence and adds its token usage (unless reused)."""
+        if not result['reused']:
+            tokens = result['tokens']
+            details = self.token_details_by_model.setdefault(tokens['model'], {'input': 0, 'cached': 0, 'output': 0, 'thinking': 0})
+            details['input'] += tokens['input_tokens']
+            details['cached'] += tokens.get('cached_tokens') or 0
+            details['output'] += tokens['output_tokens']
+            details['thinking'] += tokens['thinking_tokens']
+        self.stage_outputs.append(result['stage_output'])
+
+async def _quarantine_job(job_id: str, reason: str):
+    await upsert_job_quarantine(
+        job_quarantine_id=str(uuid.uuid4()),
+        job_id=job_id,
+        job_quarantine_reason=reason,
+        job_quarantine_timestamp=int(time.time())
+    )
 
-            max_retries = 2
-            retry_count = 0
-            result_3_1 = None
+async def assess_stage_2_1(state: JobAssessment) -> bool:
+    """Step 2.1: Job description tagging."""
+    logger.info(f"Generating job assessment for job_id {state.job_id}")
+    # Checkpoints of an earlier failed attempt let a retry resume at the failed stage; a reassessment
+    # also reuses the outputs of the last successful assessment
+    state.previous_outputs = await get_job_stage_outputs(state.job_id) if state.reuse_stage_outputs else {}
+    state.previous_outputs.update(await get_job_stage_outputs(state.job_id, table="job_stage_checkpoint"))
 
-            while retry_count <= max_retries:
-                try:
-                    result_3_1 = await generate(
-                        content=content_3_1,
-                        system_instructions=prompt_configuration_3_1['prompt_system_prompt'],
-                        model=prompt_configuration_3_1['model_id'],
-                        temperature=prompt_configuration_3_1['prompt_temperature'],
-                        response_schema=ResponseData_3_1,
-                        max_thinking=prompt_configuration_3_1['prompt_thinking_budget'],
-                        job_id=job['job_id'],
-                        llm_run_system_prompt_id=prompt_configuration_3_1['prompt_id'],
-                        llm_run_type=prompt_configuration_3_1['llm_run_type'],
-                        examples=LLMExamples.example_3_1
+    content_2_1_template = Template(state.prompt_configuration_2_1['prompt_template'])
+    content_2_1 = content_2_1_template.render(job_description=state.job['job_description'])
+    try:
+        result_2_1 = await generate_stage(
+            job_id=state.job_id,
+            prompt_configuration=state.prompt_configuration_2_1,
+            content=content_2_1,
+            response_schema=ResponseData_2_1,
+            examples=LLMExamples.example_2_1,
+            previous_outputs=state.previous_outputs,
+            checkpoint=True
+        )
+        state.record(result_2_1)
+        state.tagged_list = result_2_1['data']['tagged_list']  # type: ignore
+    except Exception as e:
+        logger.exception(f"Error generating job description tagging for job {state.job_id}: {e}")
+        await _quarantine_job(state.job_id, "failed_generate_jobdesc_tagging")
+        return False
+    return True
+
+async def assess_stage_2_2(state: JobAssessment) -> bool:
+    """Step 2.2: Job description atomizing."""
+    content_2_2_template = Template(state.prompt_configuration_2_2['prompt_template'])
+    content_2_2 = content_2_2_template.render(tagged_list=str(state.tagged_list))
+    try:
+        result_2_2 = await generate_stage(
+            job_id=state.job_id,
+            prompt_configuration=state.prompt_configuration_2_2,
+            content=content_2_2,
+            response_schema=ResponseData_2_2,
+            examples=LLMExamples.example_2_2,
+            previous_outputs=state.previous_outputs,
+            checkpoint=True
+        )
+        state.record(result_2_2)
+        state.atomic_objects = result_2_2['data']['atomic_objects']  # type: ignore
+    except Exception as e:
+        logger.exception(f"Error generating job description atomizing for job {state.job_id}: {e}")
+        await _quarantine_job(state.job_id, "failed_generate_jobdesc_atomizing")
+        return False
+    return True
+
+async def assess_stage_2_3(state: JobAssessment) -> bool:
+    """Step 2.3: Final classification for all atomic objects at once."""
+    content_2_3_template = Template(state.prompt_configuration_2_3['prompt_template'])
+    content_2_3 = content_2_3_template.render(atomic_objects=state.atomic_objects)
+    try:
+        result_2_3 = await generate_stage(
+            job_id=state.job_id,
+            prompt_configuration=state.prompt_configuration_2_3,
+            content=content_2_3,
+            response_schema=ResponseData_2_3,
+            examples=LLMExamples.example_2_3,
+            previous_outputs=state.previous_outputs,
+            checkpoint=True
+        )
+        state.record(result_2_3)
+
+        final_classifications = []
+        for classified_obj in result_2_3['data']['classified_objects']:  # type: ignore
+            final_classifications.append({
+                "requirement_string": classified_obj['requirement_string'],
+                "classification": classified_obj['classification']
+            })
+        state.final_classifications = final_classifications
+    except Exception as e:
+        logger.exception(f"Error generating final classification for job {state.job_id}: {e}")
+        await _quarantine_job(state.job_id, "failed_generate_jobdesc_final")
+        return False
+    return True
+
+async def assess_stage_3_1(state: JobAssessment) -> bool:
+    """Step 3.1: Assessment for all filtered items, minus those the requirement cache answers."""
+    job_id = state.job_id
+    resume, resume_json = state.resume, state.resume_json
+    prompt_configuration_3_1 = state.prompt_configuration_3_1
+    filtered_items = [item for item in state.final_classifications if item['classification'] != 'evaluated_qualification' and item['classification'] is not None and item['classification'] != '']
+    state.match_context = match_context_key(prompt_configuration_3_1, resume, resume_json)
+    cached_matches = await requirement_match_cache.lookup(
+        state.match_context, [item['requirement_string'] for item in filtered_items]
+    )
+    uncached_items = [item for i, item in enumerate(filtered_items) if i not in cached_matches]
+    for i, cached in cached_matches.items():
+        filtered_items[i].update(cached)
+    if cached_matches:
+        logger.info(f"Requirement cache answered {len(cached_matches)}/{len(filtered_items)} requirement(s) for job_id {job_id}")
+    state.filtered_items = filtered_items
+    state.uncached_items = uncached_items
+    if not uncached_items:
+        return True
+
+    content_3_1_template = Template(prompt_configuration_3_1['prompt_template'])
+    # Chunks are assessed concurrently and retried independently; a single chunk keeps the
+    # plain run type as its stage key so earlier stored outputs stay reusable
+    chunk_size = LLM_3_1_CHUNK_SIZE if LLM_3_1_CHUNK_SIZE > 0 else len(uncached_items)
+    chunks = [uncached_items[i:i + chunk_size] for i in range(0, len(uncached_items), chunk_size)]
+    max_retries = 2
+    started_3_1 = time.monotonic()
+    partial_3_1: list = []
+
+    def _on_partial_3_1(assessed_obj: dict):
+        # Streaming only: each requirement's assessment as soon as the model has finished it
+        partial_3_1.append(assessed_obj)
+        if len(partial_3_1) == 1:
+            logger.info(f"First 3.1 result for job_id {job_id} after {time.monotonic() - started_3_1:.2f}s")
+        logger.debug(f"3.1 partial result {len(partial_3_1)} for job_id {job_id}: {assessed_obj.get('requirement_string')!r} match={assessed_obj.get('match')}")
+
+    async def _assess_chunk(chunk_index: int, chunk_items: list) -> bool:
+        stage_key = (
+            prompt_configuration_3_1['llm_run_type'] if len(chunks) == 1
+            else f"{prompt_configuration_3_1['llm_run_type']}:{chunk_index}"
+        )
+        label = f"job {job_id}" + (f" chunk {chunk_index + 1}/{len(chunks)}" if len(chunks) > 1 else "")
+        # The resume part is the same for every job, so it goes into the cacheable prefix
+        context_3_1, content_3_1 = split_prompt_context(
+            content_3_1_template.render(
+                candidate_profile=resume_json['document_markdown'],
+                resume_text=resume['document_markdown'],
+                requirement_strings=chunk_items
+            ),
+            STAGE_3_1_CONTENT_MARKER,
+        )
+        retry_count = 0
+        while retry_count <= max_retries:
+            try:
+                result_3_1 = await generate_stage(
+                    job_id=job_id,
+                    prompt_configuration=prompt_configuration_3_1,
+                    content=content_3_1,
+                    response_schema=ResponseData_3_1,
+                    examples=LLMExamples.example_3_1,
+                    context=context_3_1,
+                    previous_outputs=state.previous_outputs,
+                    # A retry after a rejected result must reach the model, not replay the cached answer
+                    bypass_cache=retry_count > 0,
+                    checkpoint=len(chunks) > 1,
+                    stage_key=stage_key,
+                    on_partial=_on_partial_3_1,
+                    # Only first attempts join a cross-job batch; retries go out on their own
+                    batch=(
+                        (lambda: stage_3_1_batcher.submit(
+                            job_id, prompt_configuration_3_1, resume, resume_json, chunk_items
+                        ))
+                        if LLM_BATCH_3_1_ENABLED and retry_count == 0 else None
                     )
+                )
 
-                    assessed_objects = result_3_1['data']['assessed_objects']  # type: ignore
-                    if (not assessed_objects or
-                        len(assessed_objects) != len(filtered_items) or
-                        any(obj['match_reasoning'] is None or obj['match'] is None for obj in assessed_objects)):
-                        if retry_count < max_retries:
-                            retry_count += 1
-                            logger.warning(f"Invalid result for job {job['job_id']}, retry {retry_count}/{max_retries}")
-                            continue
-                        else:
-                            logger.error(f"Failed validation after {max_retries} retries for job {job['job_id']}")
-                            has_errors = True
-                            break
-
-                    _accumulate_tokens(result_3_1['tokens']['model'], token_details_by_model, result_3_1)
-
-                    for i, assessed_obj in enumerate(assessed_objects):
-                        if i < len(filtered_items):
-                            filtered_items[i]['match_reasoning'] = assessed_obj['match_reasoning']
-                            filtered_items[i]['match'] = assessed_obj['match']
-
-                    break
-
-                except Exception as e:
+                assessed_objects = result_3_1['data']['assessed_objects']  # type: ignore
+                if (not assessed_objects or
+                    len(assessed_objects) != len(chunk_items) or
+                    any(obj['match_reasoning'] is None or obj['match'] is None for obj in assessed_objects)):
                     if retry_count < max_retries:
                         retry_count += 1
-                        logger.warning(f"Error generating assessment for job {job['job_id']}, retry {retry_count}/{max_retries}: {e}")
+                        logger.warning(f"Invalid result for {label}, retry {retry_count}/{max_retries}")
                         continue
-                    else:
-                        logger.exception(f"Error generating assessment for job {job['job_id']} after {max_retries} retries: {e}")
-                        has_errors = True
-                        break
-
-        if has_errors:
-            await upsert_job_quarantine(
-                job_quarantine_id=str(uuid.uuid4()),
-                job_id=job['job_id'],
-                job_quarantine_reason="failed_generate_assessment",
-                job_quarantine_timestamp=int(time.time())
-            )
+                    logger.error(f"Failed validation after {max_retries} retries for {label}")
+                    return False
+
+                state.record(result_3_1)
+                for i, assessed_obj in enumerate(assessed_objects):
+                    chunk_items[i]['match_reasoning'] = assessed_obj['match_reasoning']
+                    chunk_items[i]['match'] = assessed_obj['match']
+                return True
+
+            except Exception as e:
+                if retry_count < max_retries:
+                    retry_count += 1
+                    logger.warning(f"Error generating assessment for {label}, retry {retry_count}/{max_retries}: {e}")
+                    continue
+                logger.exception(f"Error generating assessment for {label} after {max_retries} retries: {e}")
+                return False
+        return False
+
+    if len(chunks) > 1:
+        logger.info(f"Assessing {len(uncached_items)} requirement(s) for job_id {job_id} in {len(chunks)} chunks")
+    chunk_results = await asyncio.gather(*[_assess_chunk(i, chunk) for i, chunk in enumerate(chunks)])
+    if not all(chunk_results):
+        await _quarantine_job(job_id, "failed_generate_assessment")
+        return False
+    return True
+
+async def save_assessment(state: JobAssessment) -> bool:
+    """Final step: persists stage outputs, the job's skills and the new requirement matches."""
+    job_id = state.job_id
+    # First occurrence wins for duplicated requirement strings
+    match_by_requirement: dict = {}
+    for filtered_item in state.filtered_items:
+        match_by_requirement.setdefault(filtered_item['requirement_string'], filtered_item)
+
+    job_skills = []
+    for item in state.final_classifications:
+        match_data = match_by_requirement.get(item['requirement_string'])
+        job_skills.append({
+            "job_skill_id": str(uuid.uuid4()),
+            "job_id": job_id,
+            "job_skills_atomic_string": item['requirement_string'],
+            "job_skills_type": item['classification'],
+            "job_skills_match": match_data.get('match') if match_data else None,
+            "job_skills_match_reasoning": match_data.get('match_reasoning') if match_data else None,
+            "job_skills_resume_id": state.resume['document_id'],
+            "job_skills_match_context": state.match_context,
+        })
+    # Also clears this job's checkpoints
+    await upsert_job_stage_outputs(job_id, state.stage_outputs)
+    # Swap the job's skill list in one transaction so pollers never see a partial assessment
+    await upsert_job_skills_many(job_skills, replace_for_job_id=job_id)
+    if state.match_context is not None:
+        await requirement_match_cache.store(state.match_context, state.uncached_items, source_job_id=job_id)
+
+    token_summary = "; ".join(
+        f"{model}: input={d['input']} (cached={d['cached']}), output={d['output']}, thinking={d['thinking']}"
+        for model, d in state.token_details_by_model.items()
+    )
+    logger.info(f"Completed job assessment for job_id {job_id}")
+    logger.info(f"Usage for job_id {job_id}: {token_summary}")
+    return True
+
+# Pipeline stages in order: (stage name, handler). A handler returns False after quarantining the job.
+ASSESSMENT_STAGES: list[tuple[str, Callable[[JobAssessment], Awaitable[bool]]]] = [
+    ("2_1", assess_stage_2_1),
+    ("2_2", assess_stage_2_2),
+    ("2_3", assess_stage_2_3),
+    ("3_1", assess_stage_3_1),
+    ("save", save_assessment),
+]
+
+# --- Stage timing notifications ---
+StageTimingListener = Callable[[str, str, float, bool], None]
+_stage_timing_listeners: list[StageTimingListener] = []
+
+def add_stage_timing_listener(listener: StageTimingListener):
+    """Register a callback invoked with (job_id, stage name, seconds, accepted) after each stage that
+    run_assessment_stages runs (e.g. benchmarks); the staged executor reports its own stage metrics."""
+    _stage_timing_listeners.append(listener)
+
+def remove_stage_timing_listener(listener: StageTimingListener):
+    if listener in _stage_timing_listeners:
+        _stage_timing_listeners.remove(listener)
+
+def _notify_stage_timing(job_id: str, stage_name: str, seconds: float, accepted: bool):
+    for listener in list(_stage_timing_listeners):
+        try:
+            listener(job_id, stage_name, seconds, accepted)
+        except Exception as e:
+            logger.error(f"Stage timing listener failed for job_id {job_id}: {e}")
+
+async def run_assessment_stages(state: JobAssessment) -> bool:
+    """Runs every stage for one job in order, in the calling task, timing each into state.stage_seconds."""
+    for name, stage in ASSESSMENT_STAGES:
+        started = time.perf_counter()
+        accepted = await stage(state)
+        state.stage_seconds[name] = time.perf_counter() - started
+        _notify_stage_timing(state.job_id, name, state.stage_seconds[name], accepted)
+        if not accepted:
             return False
+    return True
 
-        for item in final_classifications:
-            match_data = next((filtered_item for filtered_item in filtered_items
-                               if filtered_item['requirement_string'] == item['requirement_string']), None)
-
-            if match_data:
-                await upsert_job_skills(
-                    job_skill_id=str(uuid.uuid4()),
-                    job_id=job['job_id'],
-                    job_skills_atomic_string=item['requirement_string'],
-                    job_skills_type=item['classification'],
-                    job_skills_match=match_data['match'],
-                    job_skills_match_reasoning=match_data['match_reasoning'],
-                    job_skills_resume_id=resume['document_id'],
-                )
-            else:
-                await upsert_job_skills(
-                    job_skill_id=str(uuid.uuid4()),
-                    job_id=job['job_id'],
-                    job_skills_atomic_string=item['requirement_string'],
-                    job_skills_type=item['classification'],
-                    job_skills_match=None,
-                    job_skills_match_reasoning=None,
-                    job_skills_resume_id=resume['document_id'],
-                )
+async def process_single_job_assessment(
+    job: dict, 
+    resume: dict,
+    resume_json: dict,
+    prompt_configuration_2_1: dict,
+    prompt_configuration_2_2: dict, 
+    prompt_configuration_2_3: dict,
+    prompt_configuration_3_1: dict,
+    semaphore: asyncio.Semaphore,
+    reuse_stage_outputs: bool = False
+) -> bool:
+    """Process assessment for a single job with semaphore control for concurrency.
 
-        token_summary = "; ".join(
-            f"{model}: input={d['input']}, output={d['output']}, thinking={d['thinking']}"
-            for model, d in token_details_by_model.items()
-        )
-        logger.info(f"Completed job assessment for job_id {job_id}")
-        logger.info(f"Usage for job_id {job_id}: {token_summary}")
+    With `reuse_stage_outputs`, stages whose request is unchanged since the job's last successful
+    assessment reuse the stored output, so e.g. a resume edit only reruns 3.1.
 
-        return True
+    Returns:
+        bool: True if the job assessment was completed successfully, False if it failed.
+    """
+    state = JobAssessment(
+        job, resume, resume_json,
+        prompt_configuration_2_1, prompt_configuration_2_2, prompt_configuration_2_3, prompt_configuration_3_1,
+        reuse_stage_outputs=reuse_stage_outputs,
+    )
+    async with semaphore:
+        return await run_assessment_stages(state)
 
-async def generate_job_assessment_with_id(job_id: str):
+async def generate_job_assessment_with_id(
+    job_id: str,
+    reassess: bool = False,
+    pipeline: Optional[Callable[[JobAssessment], Awaitable[bool]]] = None,
+):
     """
     Generate job assessment for a specific job_id if not yet performed.
-    - If job_skills already exist for the job_id, return them immediately.
+    - If job_skills already exist for the job_id, return them immediately (unless `reassess`).
     - Otherwise, run the same pipeline used in generate_job_assessment for that single job,
       then return the resulting job_skills for the job_id.
+    - With `reassess`, rerun the pipeline even if the job is assessed, reusing every stage whose
+      request is unchanged (e.g. only 3.1 after a master resume edit). The existing job_skills stay
+      visible until the new set replaces them.
+    - `pipeline` runs the stages (e.g. StagedExecutor.run); by default they run in this task.
     """
     # NOTE: This function intentionally keeps a linear flow for clarity; early returns handle failure cases.
 
-    try:
-        existing = await get_job_skills_for_job(job_id)
-    except Exception as e:
-        logger.exception(f"Failed to query existing job skills for job_id {job_id}: {e}")
-        return {"error": f"Failed to query existing job skills for job_id {job_id}"}
+    if not reassess:
+        try:
+            existing = await get_job_skills_for_job(job_id)
+        except Exception as e:
+            logger.exception(f"Failed to query existing job skills for job_id {job_id}: {e}")
+            return {"error": f"Failed to query existing job skills for job_id {job_id}"}
 
-    if existing:
-        return existing
+        if existing:
+            return existing
 
     try:
-        all_jobs = await get_job_details()
-        job = next((j for j in all_jobs if j.get("job_id") == job_id), None)
+        job = await get_job_detail_by_id(job_id)
     except Exception as e:
         logger.exception(f"Failed to load job details for job_id {job_id}: {e}")
         return {"error": f"Failed to load job details for job_id {job_id}"}
@@ -689,18 +1475,18 @@ async def generate_job_assessment_with_id(job_id: str):
         logger.error("Prompt configuration for job assessment not found.")
         return {"error": "Prompt configuration for job assessment not found"}
 
-    semaphore = asyncio.Semaphore(1)
+    state = JobAssessment(
+        job={"job_id": job_id, "job_description": job["job_description"]},
+        resume=resume,
+        resume_json=resume_json,
+        prompt_configuration_2_1=prompt_configuration_2_1,
+        prompt_configuration_2_2=prompt_configuration_2_2,
+        prompt_configuration_2_3=prompt_configuration_2_3,
+        prompt_configuration_3_1=prompt_configuration_3_1,
+        reuse_stage_outputs=reassess,
+    )
     try:
-        success = await process_single_job_assessment(
-            job={"job_id": job_id, "job_description": job["job_description"]},
-            resume=resume,
-            resume_json=resume_json,
-            prompt_configuration_2_1=prompt_configuration_2_1,
-            prompt_configuration_2_2=prompt_configuration_2_2,
-            prompt_configuration_2_3=prompt_configuration_2_3,
-            prompt_configuration_3_1=prompt_configuration_3_1,
-            semaphore=semaphore,
-        )
+        success = await (pipeline or run_assessment_stages)(state)
     except Exception as e:
         logger.exception(f"Exception while processing assessment for job_id {job_id}: {e}")
         return {"error": f"Failed to generate assessment for job_id {job_id}"}
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import hashlib
+from functools import lru_cache
+from collections import OrderedDict
+from typing import Optional, Type
+
+from pydantic import BaseModel
+
+from .utilities import setup_logging, get_logger
+from .db import (
+    get_llm_response_cache,
+    upsert_llm_response_cache,
+    touch_llm_response_cache,
+    evict_llm_response_cache,
+    get_llm_response_cache_summary,
+    clear_llm_response_cache,
+)
+
+setup_logging()
+logger = get_logger(__name__)
+
+# Response cache configuration (env-overridable)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 86400)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+LLM_CACHE_EVICT_EVERY = int(os.getenv("LLM_CACHE_EVICT_EVERY", "100"))  # stores between eviction passes
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+# Bump to invalidate every existing entry when the request format changes
+LLM_CACHE_KEY_VERSION = "1"
+
+@lru_cache(maxsize=64)
+def _schema_fingerprint(response_schema: Type[BaseModel]) -> str:
+    # model_json_schema() costs about a millisecond; response models are fixed classes
+    return json.dumps(response_schema.model_json_schema(), sort_keys=True)
+
+def llm_cache_key(
+    model: str,
+    system_instructions: str,
+    examples: Optional[list[dict]],
+    content: str,
+    temperature: float,
+    response_schema: Type[BaseModel],
+    context: Optional[str] = None,
+) -> str:
+    """sha256 over a canonical JSON encoding of everything that determines the LLM request."""
+    material = {
+        "v": LLM_CACHE_KEY_VERSION,
+        "model": model,
+        "system": system_instructions,
+        "examples": examples or [],
+        "content": content,
+        "temperature": temperature,
+        "schema": _schema_fingerprint(response_schema),
+    }
+    if context is not None:
+        # Only present for split prompts, so keys of single-message requests are unchanged
+        material["context"] = context
+    canonical = json.dumps(material, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class LLMResponseCache:
+    """
+    Two-level response cache: a small in-process LRU in front of the llm_response_cache table.
+    Memory hits are served without touching SQLite; every hit still bumps the row's last-hit time
+    through a queued (group-committed) write so size-based eviction stays LRU.
+    """
+
+    def __init__(self, memory_entries: int = LLM_CACHE_MEMORY_ENTRIES):
+        self.memory_entries = memory_entries
+        self._memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()  # key -> (expires_at, response)
+        self._stores_since_evict = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _remember(self, key: str, expires_at: float, response: dict):
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = (expires_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Returns the cached raw response for `key`, or None on a miss (or any cache error)."""
+        cached = self._memory.get(key)
+        if cached is not None:
+            expires_at, response = cached
+            if expires_at > time.time():
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                await self._touch(key)
+                return response
+            del self._memory[key]
+        try:
+            row = await get_llm_response_cache(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM cache lookup failed (treated as miss): {e}")
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        response = json.loads(row["response_text"])
+        self._remember(key, row["expires_at"], response)
+        self.db_hits += 1
+        await self._touch(key)
+        return response
+
+    async def _touch(self, key: str):
+        try:
+            await touch_llm_response_cache(key)
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f"LLM cache hit bookkeeping failed: {e}")
+
+    async def put(self, key: str, model: str, response: dict):
+        """Stores a validated response; runs an eviction pass every LLM_CACHE_EVICT_EVERY stores."""
+        try:
+            await upsert_llm_response_cache(key, model, json.dumps(response, ensure_ascii=False), LLM_CACHE_TTL_SECONDS)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM cache store failed: {e}")
+            return
+        self.stores += 1
+        self._remember(key, time.time() + LLM_CACHE_TTL_SECONDS, response)
+        self._stores_since_evict += 1
+        if self._stores_since_evict >= LLM_CACHE_EVICT_EVERY:
+            self._stores_since_evict = 0
+            await self.evict()
+
+    async def evict(self) -> int:
+        try:
+            evicted = await evict_llm_response_cache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_BYTES)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM cache eviction failed: {e}")
+            return 0
+        if evicted:
+            self.evictions += evicted
+            self._memory.clear()  # cheap way to drop anything evicted from the table
+            logger.info(f"Evicted {evicted} LLM cache entr{'y' if evicted == 1 else 'ies'}")
+        return evicted
+
+    async def clear(self) -> int:
+        self._memory.clear()
+        return await clear_llm_response_cache()
+
+    async def stats(self) -> dict:
+        hits = self.memory_hits + self.db_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "bypasses": self.bypasses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "memory_entries": len(self._memory),
+            "ttl_seconds": LLM_CACHE_TTL_SECONDS,
+            "max_entries": LLM_CACHE_MAX_ENTRIES,
+            "max_bytes": LLM_CACHE_MAX_BYTES,
+            "table": await get_llm_response_cache_summary(),
+        }
+
+llm_response_cache = LLMResponseCache()
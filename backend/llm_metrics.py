@@ -0,0 +1,258 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from .utilities import setup_logging, get_logger
+from .db import (
+    aggregate_llm_runs,
+    get_llm_metrics_state,
+    get_llm_metrics_daily,
+    get_llm_metrics_latency_buckets,
+    get_llm_metrics_job_costs,
+)
+
+setup_logging()
+logger = get_logger(__name__)
+
+# Histogram upper bounds (seconds) for per-run latency; indexes are stored in llm_metrics_latency_bucket,
+# so changing them requires rebuilding the rollups (drop the llm_metrics_* rows and the watermark).
+LATENCY_BUCKETS = [0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 90.0, 120.0, 180.0]
+# llm_runs_v2 rows folded per write transaction, so a large backlog does not hold the writer for long
+LLM_METRICS_BATCH_SIZE = int(os.getenv("LLM_METRICS_BATCH_SIZE", "5000"))
+# Report window when none is given
+LLM_METRICS_DEFAULT_DAYS = int(os.getenv("LLM_METRICS_DEFAULT_DAYS", "30"))
+
+PROMETHEUS_PREFIX = "job_search_llm"
+
+def _histogram_quantile(counts: list[int], q: float) -> Optional[float]:
+    """Quantile interpolated linearly within its LATENCY_BUCKETS bucket (as Prometheus does)."""
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if count and cumulative + count >= rank:
+            if index >= len(LATENCY_BUCKETS):
+                return LATENCY_BUCKETS[-1]  # +Inf bucket: the best bound we have
+            lower = LATENCY_BUCKETS[index - 1] if index else 0.0
+            return lower + (LATENCY_BUCKETS[index] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return LATENCY_BUCKETS[-1]
+
+def _percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _round(value: Optional[float], digits: int = 3) -> Optional[float]:
+    return round(value, digits) if value is not None else None
+
+class _Group:
+    """Accumulates llm_metrics_daily rows and latency histogram counts for one report group."""
+
+    def __init__(self):
+        self.runs = 0
+        self.cache_hits = 0
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+        self.thinking_tokens = 0
+        self.latency_s_sum = 0.0
+        self.latency_s_max = 0.0
+        self.cost_usd = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add_daily(self, row: dict):
+        self.runs += row["runs"]
+        self.cache_hits += row["cache_hits"]
+        self.input_tokens += row["input_tokens"]
+        self.cached_tokens += row["cached_tokens"]
+        self.output_tokens += row["output_tokens"]
+        self.thinking_tokens += row["thinking_tokens"]
+        self.latency_s_sum += row["latency_s_sum"]
+        self.latency_s_max = max(self.latency_s_max, row["latency_s_max"])
+        self.cost_usd += row["cost_usd"] or 0.0
+
+    def as_dict(self) -> dict:
+        billed = self.runs - self.cache_hits
+
+        def quantile(q: float) -> Optional[float]:
+            # Interpolation cannot know where in a bucket the runs fell; never report past the observed max
+            value = _histogram_quantile(self.buckets, q)
+            return _round(min(value, self.latency_s_max)) if value is not None else None
+
+        return {
+            "runs": self.runs,
+            "cache_hits": self.cache_hits,
+            "latency_s_p50": quantile(0.50),
+            "latency_s_p95": quantile(0.95),
+            "latency_s_p99": quantile(0.99),
+            "latency_s_avg": _round(self.latency_s_sum / billed) if billed else None,
+            "latency_s_max": _round(self.latency_s_max),
+            # Completion tokens per second of request latency (time to first token included)
+            "output_tokens_per_s": _round(self.output_tokens / self.latency_s_sum, 1) if self.latency_s_sum else None,
+            "input_tokens": self.input_tokens,
+            "cached_tokens": self.cached_tokens,
+            "output_tokens": self.output_tokens,
+            "thinking_tokens": self.thinking_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+class LLMMetrics:
+    """
+    Latency, throughput and cost report over the llm_metrics_* rollups.
+
+    refresh() folds the llm_runs_v2 rows added since the last refresh into the rollups (see
+    db.aggregate_llm_runs), so the cost of a report does not grow with the size of llm_runs_v2.
+    Runs are priced when they are folded, at the llm_models prices in effect then (provider-cached prompt
+    tokens at model_cpmt_cached), and the spend accumulates, so a price change only affects later runs.
+    Runs of models without a llm_models row at that time cost nothing and are listed under unpriced_models.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    async def refresh(self) -> int:
+        """Folds all pending llm_runs_v2 rows into the rollups. Returns the number of rows folded."""
+        async with self._lock:
+            total = 0
+            start = time.perf_counter()
+            while True:
+                folded = await aggregate_llm_runs(LATENCY_BUCKETS, LLM_METRICS_BATCH_SIZE)
+                total += folded
+                if folded < LLM_METRICS_BATCH_SIZE:
+                    break
+            if total:
+                logger.info(f"Folded {total} llm_runs_v2 rows into the LLM metrics in {time.perf_counter() - start:.2f}s")
+            return total
+
+    async def report(self, days: Optional[int] = LLM_METRICS_DEFAULT_DAYS) -> dict:
+        """Per-stage, per-model and per-day metrics over the last `days` UTC days (None = all time)."""
+        since_day = None
+        if days is not None:
+            since_day = (datetime.now(timezone.utc) - timedelta(days=max(days, 1) - 1)).strftime("%Y-%m-%d")
+        daily, buckets, job_costs, state = await asyncio.gather(
+            get_llm_metrics_daily(since_day),
+            get_llm_metrics_latency_buckets(since_day),
+            get_llm_metrics_job_costs(since_day),
+            get_llm_metrics_state(),
+        )
+
+        by_stage: dict[str, _Group] = {}
+        by_model: dict[str, _Group] = {}
+        by_stage_model: dict[tuple[str, str], _Group] = {}
+        by_day: dict[str, dict] = {}
+        unpriced = set()
+        for row in daily:
+            stage, model = row["llm_run_type"], row["model_id"]
+            for group in (
+                by_stage.setdefault(stage, _Group()),
+                by_model.setdefault(model, _Group()),
+                by_stage_model.setdefault((stage, model), _Group()),
+            ):
+                group.add_daily(row)
+            day = by_day.setdefault(row["metrics_day"], {"runs": 0, "cache_hits": 0, "cost_usd": 0.0})
+            day["runs"] += row["runs"]
+            day["cache_hits"] += row["cache_hits"]
+            day["cost_usd"] += row["cost_usd"] or 0.0
+            if row["unpriced_runs"]:
+                unpriced.add(model)
+        for row in buckets:
+            stage, model, bucket = row["llm_run_type"], row["model_id"], row["metrics_bucket"]
+            if bucket >= len(LATENCY_BUCKETS) + 1:
+                continue
+            for group in (by_stage.get(stage), by_model.get(model), by_stage_model.get((stage, model))):
+                if group is not None:
+                    group.buckets[bucket] += row["runs"]
+
+        costs = [row["cost_usd"] or 0.0 for row in job_costs]
+        stages = {stage: group.as_dict() for stage, group in sorted(by_stage.items())}
+        return {
+            "since_day": since_day,
+            "latency_buckets_s": LATENCY_BUCKETS,
+            "by_stage": stages,
+            "by_model": {model: group.as_dict() for model, group in sorted(by_model.items())},
+            "by_stage_model": [
+                {"llm_run_type": stage, "model_id": model, **group.as_dict()}
+                for (stage, model), group in sorted(by_stage_model.items())
+            ],
+            "by_day": [
+                {"day": day, **values, "cost_usd": round(values["cost_usd"], 6)}
+                for day, values in sorted(by_day.items())
+            ],
+            "cost_per_job": {
+                "jobs": len(costs),
+                "total_usd": round(sum(costs), 6),
+                "avg_usd": round(sum(costs) / len(costs), 6) if costs else None,
+                "p50_usd": _round(_percentile(costs, 0.50), 6),
+                "p95_usd": _round(_percentile(costs, 0.95), 6),
+            },
+            "slowest_stages": sorted(stages, key=lambda s: stages[s]["latency_s_p95"] or 0.0, reverse=True)[:3],
+            "costliest_stages": sorted(stages, key=lambda s: stages[s]["cost_usd"], reverse=True)[:3],
+            "unpriced_models": sorted(unpriced),
+            "watermark": state,
+        }
+
+    async def prometheus_text(self) -> str:
+        """All-time metrics in the Prometheus text exposition format (counters and a latency histogram)."""
+        daily, buckets, job_costs = await asyncio.gather(
+            get_llm_metrics_daily(None),
+            get_llm_metrics_latency_buckets(None),
+            get_llm_metrics_job_costs(None),
+        )
+        totals: dict[tuple[str, str], _Group] = {}
+        for row in daily:
+            totals.setdefault((row["llm_run_type"], row["model_id"]), _Group()).add_daily(row)
+        for row in buckets:
+            group = totals.get((row["llm_run_type"], row["model_id"]))
+            if group is not None and row["metrics_bucket"] < len(LATENCY_BUCKETS) + 1:
+                group.buckets[row["metrics_bucket"]] += row["runs"]
+
+        def labels(stage: str, model: str, **extra: str) -> str:
+            pairs = {"stage": stage, "model": model, **extra}
+            return ",".join(
+                f'{key}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                for key, value in pairs.items()
+            )
+
+        lines = []
+        counters = [
+            ("runs_total", "LLM runs, cache hits included", lambda g: g.runs),
+            ("cache_hits_total", "LLM runs served from the response cache", lambda g: g.cache_hits),
+            ("input_tokens_total", "Billed prompt tokens", lambda g: g.input_tokens),
+            ("cached_tokens_total", "Billed prompt tokens served from the provider's prompt cache", lambda g: g.cached_tokens),
+            ("output_tokens_total", "Billed completion tokens, thinking included", lambda g: g.output_tokens),
+            ("thinking_tokens_total", "Billed thinking tokens", lambda g: g.thinking_tokens),
+            ("cost_usd_total", "Spend in USD, priced at the llm_models prices in effect when the runs were folded", lambda g: round(g.cost_usd, 6)),
+        ]
+        for name, help_text, value in counters:
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} counter")
+            for (stage, model), group in sorted(totals.items()):
+                lines.append(f"{PROMETHEUS_PREFIX}_{name}{{{labels(stage, model)}}} {value(group)}")
+
+        name = f"{PROMETHEUS_PREFIX}_latency_seconds"
+        lines.append(f"# HELP {name} Latency of billed LLM runs")
+        lines.append(f"# TYPE {name} histogram")
+        for (stage, model), group in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, group.buckets):
+                cumulative += count
+                lines.append(f"{name}_bucket{{{labels(stage, model, le=repr(bound))}}} {cumulative}")
+            cumulative += group.buckets[-1]
+            lines.append(f"{name}_bucket{{{labels(stage, model, le='+Inf')}}} {cumulative}")
+            lines.append(f"{name}_sum{{{labels(stage, model)}}} {round(group.latency_s_sum, 6)}")
+            lines.append(f"{name}_count{{{labels(stage, model)}}} {cumulative}")
+
+        costs = [row["cost_usd"] or 0.0 for row in job_costs]
+        name = f"{PROMETHEUS_PREFIX}_cost_per_job_usd"
+        lines.append(f"# HELP {name} Mean LLM spend per assessed job in USD")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {round(sum(costs) / len(costs), 6) if costs else 0}")
+        return "\n".join(lines) + "\n"
+
+llm_metrics = LLMMetrics()
@@ -0,0 +1,401 @@
+"""Local OpenRouter stand-in for offline pipeline runs and benchmarks.
+
+Serves the OpenAI-compatible chat completions endpoint (JSON and server-sent events) that
+backend/llm.py calls. A request is answered by replaying the latest llm_runs_v2 run whose input
+(the last user message) has the same hash, or, failing that, by a deterministic schema-valid
+response synthesized from the request. The replay database is opened read-only and never
+migrated, so it can be a live job_tracker.db. Latency, HTTP 500s and HTTP 429s are drawn from
+configurable distributions, seeded per request so runs are reproducible.
+
+    python -m backend.mock_openrouter --port 8010 --replay-db job_tracker.db --latency-median 2
+
+then point the API or the benchmark at it with OPENROUTER_BASE_URL=http://127.0.0.1:8010/api/v1.
+"""
+import os
+import re
+import ast
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import aiosqlite
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from .utilities import setup_logging, get_logger
+from .db import get_recorded_llm_run, open_read_only_connection
+
+setup_logging()
+logger = get_logger(__name__)
+
+# Mock behaviour (env-overridable; the CLI flags take precedence)
+MOCK_LATENCY_MEDIAN = float(os.getenv("MOCK_LATENCY_MEDIAN", "1.0"))  # seconds to the first token
+MOCK_LATENCY_SIGMA = float(os.getenv("MOCK_LATENCY_SIGMA", "0.5"))  # lognormal shape; 0 = fixed latency
+MOCK_TOKENS_PER_SECOND = float(os.getenv("MOCK_TOKENS_PER_SECOND", "0"))  # completion speed; 0 = instant
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))  # fraction of requests answered with HTTP 500
+MOCK_THROTTLE_RATE = float(os.getenv("MOCK_THROTTLE_RATE", "0"))  # fraction answered with HTTP 429
+MOCK_RETRY_AFTER = float(os.getenv("MOCK_RETRY_AFTER", "1"))  # Retry-After seconds sent with a 429
+MOCK_SEED = int(os.getenv("MOCK_SEED", "0"))
+# Database with recorded llm_runs_v2 to replay; empty = synthesize every response
+MOCK_REPLAY_DB = os.getenv("MOCK_REPLAY_DB", "")
+# Sleep for the recorded run duration instead of the latency distribution when replaying
+MOCK_REPLAY_LATENCY = os.getenv("MOCK_REPLAY_LATENCY", "0") == "1"
+# JSON object of per-model overrides of the settings above, e.g. {"slow/model": {"latency_median": 20}}
+MOCK_MODEL_PROFILES = os.getenv("MOCK_MODEL_PROFILES", "")
+
+_PROFILE_FIELDS = ("latency_median", "latency_sigma", "tokens_per_second", "error_rate", "throttle_rate", "retry_after")
+_STREAM_CHUNK_CHARS = 48
+
+class MockConfig:
+    """Server-wide behaviour plus per-model overrides (see MOCK_MODEL_PROFILES)."""
+
+    def __init__(self):
+        self.latency_median = MOCK_LATENCY_MEDIAN
+        self.latency_sigma = MOCK_LATENCY_SIGMA
+        self.tokens_per_second = MOCK_TOKENS_PER_SECOND
+        self.error_rate = MOCK_ERROR_RATE
+        self.throttle_rate = MOCK_THROTTLE_RATE
+        self.retry_after = MOCK_RETRY_AFTER
+        self.seed = MOCK_SEED
+        self.replay_db = MOCK_REPLAY_DB
+        self.replay_latency = MOCK_REPLAY_LATENCY
+        self.model_profiles: dict[str, dict] = {}
+        if MOCK_MODEL_PROFILES:
+            self.set_model_profiles(MOCK_MODEL_PROFILES)
+
+    def set_model_profiles(self, value: str):
+        try:
+            profiles = json.loads(value)
+        except json.JSONDecodeError:
+            logger.error("MOCK_MODEL_PROFILES is not valid JSON; ignoring per-model profiles.")
+            return
+        if isinstance(profiles, dict):
+            self.model_profiles = {model: p for model, p in profiles.items() if isinstance(p, dict)}
+
+    def profile(self, model: str) -> dict:
+        overrides = self.model_profiles.get(model, {})
+        return {field: float(overrides.get(field, getattr(self, field))) for field in _PROFILE_FIELDS}
+
+    def as_dict(self) -> dict:
+        return {
+            **{field: getattr(self, field) for field in _PROFILE_FIELDS},
+            "seed": self.seed,
+            "replay_db": self.replay_db or None,
+            "replay_latency": self.replay_latency,
+            "model_profiles": self.model_profiles,
+        }
+
+mock_config = MockConfig()
+
+# --- Request parsing and response synthesis ---
+
+def _message_text(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):  # content parts (e.g. text with a cache_control hint)
+        return "".join(str(part.get("text") or "") for part in content if isinstance(part, dict))
+    return str(content)
+
+def _between(text: str, tag: str) -> str:
+    match = re.search(rf"<{tag}>\s*(.*?)\s*</{tag}>", text, re.S)
+    return match.group(1) if match else ""
+
+def _literal_list(text: str) -> list:
+    """Parses a rendered list (Python repr or JSON) of dicts from a prompt section; [] if it is neither."""
+    for parse in (ast.literal_eval, json.loads):
+        try:
+            value = parse(text)
+        except (ValueError, SyntaxError):
+            continue
+        if isinstance(value, list):
+            return [item for item in value if isinstance(item, dict)]
+    return []
+
+def _stable_fraction(*parts: str) -> float:
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+def _split_atomic(raw: str) -> list[str]:
+    pieces = [p.strip(" .;") for p in re.split(r";|,\s+(?:and\s+)?|\s+and\s+", raw)]
+    return [p for p in pieces if p] or [raw]
+
+def _synthesize_stage(title: str, user: str, seed: int) -> Optional[dict]:
+    """Plausible outputs for the assessment stage schemas, derived from the request's own input."""
+    if title == "ResponseData_2_1":
+        lines = [line.strip(" -*•\t") for line in _between(user, "job_description").splitlines()]
+        lines = [line for line in lines if line][:40]
+        return {"tagged_list": [
+            {"raw_string": line, "category": "required" if _stable_fraction(str(seed), line) < 0.7 else "additional"}
+            for line in lines
+        ]}
+    if title == "ResponseData_2_2":
+        return {"atomic_objects": [
+            {"requirement_string": piece, "category": item.get("category") or "required"}
+            for item in _literal_list(_between(user, "tagged_list"))
+            for piece in _split_atomic(str(item.get("raw_string") or ""))
+        ]}
+    if title == "ResponseData_2_3":
+        classes = ["required_qualification", "additional_qualification", "evaluated_qualification"]
+        classified = []
+        for item in _literal_list(_between(user, "atomic_objects")):
+            text = str(item.get("requirement_string") or "")
+            if item.get("category") == "additional":
+                classification = classes[1]
+            else:
+                classification = classes[0] if _stable_fraction(str(seed), text) < 0.8 else classes[2]
+            classified.append({"requirement_string": text, "classification": classification})
+        return {"classified_objects": classified}
+    if title == "ResponseData_3_1":
+        assessed = []
+        for item in _literal_list(_between(user, "requirement_strings")):
+            text = str(item.get("requirement_string") or "")
+            match = _stable_fraction(str(seed), "match", text) < 0.6
+            assessed.append({
+                "requirement_string": text,
+                "match_reasoning": f"Synthetic assessment: the profile {'covers' if match else 'does not show'} '{text}'.",
+                "match": match,
+            })
+        return {"assessed_objects": assessed}
+    return None
+
+def _instance_for_schema(schema: dict, defs: dict, depth: int = 0):
+    """Minimal instance of a JSON schema (objects with their required properties, one-element arrays)."""
+    if "$ref" in schema:
+        return _instance_for_schema(defs.get(schema["$ref"].rsplit("/", 1)[-1], {}), defs, depth)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if schema.get(key):
+            return _instance_for_schema(schema[key][0], defs, depth)
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        properties = schema.get("properties", {})
+        return {name: _instance_for_schema(properties[name], defs, depth + 1) for name in schema.get("required", properties)}
+    if kind == "array":
+        return [_instance_for_schema(schema.get("items", {}), defs, depth + 1)] if depth < 8 else []
+    return {"boolean": False, "integer": 0, "number": 0.0, "null": None}.get(kind, "synthetic")
+
+def synthesize_response(json_schema: dict, user: str, seed: int = 0) -> dict:
+    """Schema-valid structured output for a request: stage-aware for ResponseData_2_1..3_1, generic otherwise."""
+    synthesized = _synthesize_stage(json_schema.get("title", ""), user, seed)
+    if synthesized is None:
+        synthesized = _instance_for_schema(json_schema, json_schema.get("$defs", {}))
+    return synthesized
+
+def _recorded_output(text: str) -> Optional[str]:
+    """llm_runs_v2 stores str(parsed output); convert it back to JSON text."""
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            return json.dumps(parse(text), ensure_ascii=False)
+        except (ValueError, SyntaxError):
+            continue
+    return None
+
+# --- Server ---
+
+_replay_db: Optional[aiosqlite.Connection] = None
+_replay_db_lock = asyncio.Lock()
+
+async def _replay_connection(path: str) -> aiosqlite.Connection:
+    """Read-only connection to the replay database; opened once, never migrated or written."""
+    global _replay_db
+    async with _replay_db_lock:
+        if _replay_db is None:
+            _replay_db = await open_read_only_connection(path)
+        return _replay_db
+
+class MockOpenRouter:
+    """Request handling and counters for the mock; one instance per server process."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self._attempts: dict[tuple[str, str], int] = {}
+        self.requests = 0
+        self.replayed = 0
+        self.synthesized = 0
+        self.errors = 0
+        self.throttled = 0
+        self.streamed = 0
+        self.latency_s_total = 0.0
+
+    def _rng(self, model: str, input_hash: str) -> random.Random:
+        # Seeded per (model, input, attempt): the same request sequence gets the same draws whatever the interleaving
+        attempt = self._attempts.get((model, input_hash), 0)
+        self._attempts[(model, input_hash)] = attempt + 1
+        return random.Random(f"{self.config.seed}:{model}:{input_hash}:{attempt}")
+
+    async def _replay(self, input_hash: str, model: str) -> Optional[dict]:
+        if not self.config.replay_db:
+            return None
+        try:
+            run = await get_recorded_llm_run(input_hash, model, connection=await _replay_connection(self.config.replay_db))
+        except Exception as e:
+            logger.warning(f"Replay lookup failed (synthesizing instead): {e}")
+            return None
+        if run is None or run.get("llm_run_output") is None:
+            return None
+        content = _recorded_output(run["llm_run_output"])
+        if content is None:
+            return None
+        return {"run": run, "content": content}
+
+    async def complete(self, request: dict):
+        self.requests += 1
+        model = str(request.get("model") or "")
+        messages = request.get("messages") or []
+        user = _message_text(messages[-1]) if messages else ""
+        input_hash = hashlib.sha256(user.encode("utf-8")).hexdigest()  # same as db.blob_hash
+        profile = self.config.profile(model)
+        rng = self._rng(model, input_hash)
+
+        draw = rng.random()
+        if draw < profile["throttle_rate"]:
+            self.throttled += 1
+            return JSONResponse(
+                {"error": {"code": 429, "message": "Rate limit exceeded (mock)"}},
+                status_code=429,
+                headers={"Retry-After": f"{profile['retry_after']:g}"},
+            )
+        if draw < profile["throttle_rate"] + profile["error_rate"]:
+            self.errors += 1
+            return JSONResponse({"error": {"code": 500, "message": "Internal error (mock)"}}, status_code=500)
+
+        replayed = await self._replay(input_hash, model)
+        prompt_chars = sum(len(_message_text(m)) for m in messages)
+        if replayed is not None:
+            self.replayed += 1
+            run, content = replayed["run"], replayed["content"]
+            usage = {
+                "prompt_tokens": run.get("llm_run_input_tokens") or prompt_chars // 4,
+                "completion_tokens": run.get("llm_run_output_tokens") or len(content) // 4,
+                "completion_tokens_details": {"reasoning_tokens": run.get("llm_run_thinking_tokens") or 0},
+            }
+            if run.get("llm_run_cached_tokens") is not None:
+                usage["prompt_tokens_details"] = {"cached_tokens": run["llm_run_cached_tokens"]}
+            recorded_seconds = (run.get("llm_run_end") or 0) - (run.get("llm_run_start") or 0)
+        else:
+            self.synthesized += 1
+            json_schema = ((request.get("response_format") or {}).get("json_schema")) or {}
+            content = json.dumps(synthesize_response(json_schema, user, self.config.seed), ensure_ascii=False)
+            usage = {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": max(1, len(content) // 4),
+                "completion_tokens_details": {"reasoning_tokens": 0},
+            }
+            recorded_seconds = 0.0
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if replayed is not None and self.config.replay_latency and recorded_seconds > 0:
+            first_token, generation = recorded_seconds, 0.0
+        else:
+            first_token = profile["latency_median"] * math.exp(profile["latency_sigma"] * rng.gauss(0.0, 1.0))
+            generation = usage["completion_tokens"] / profile["tokens_per_second"] if profile["tokens_per_second"] > 0 else 0.0
+        self.latency_s_total += first_token + generation
+
+        completion_id = f"gen-mock-{input_hash[:16]}"
+        if request.get("stream"):
+            self.streamed += 1
+            return StreamingResponse(
+                self._stream(completion_id, model, content, usage, first_token, generation),
+                media_type="text/event-stream",
+            )
+        await asyncio.sleep(first_token + generation)
+        return JSONResponse({
+            "id": completion_id,
+            "model": model,
+            "provider": "mock",
+            "created": int(time.time()),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        })
+
+    async def _stream(self, completion_id: str, model: str, content: str, usage: dict, first_token: float, generation: float):
+        yield ": OPENROUTER PROCESSING\n\n"
+        await asyncio.sleep(first_token)
+        pieces = [content[i:i + _STREAM_CHUNK_CHARS] for i in range(0, len(content), _STREAM_CHUNK_CHARS)] or [""]
+        for piece in pieces:
+            chunk = {"id": completion_id, "model": model, "provider": "mock", "choices": [{"index": 0, "delta": {"content": piece}}]}
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            if generation:
+                await asyncio.sleep(generation / len(pieces))
+        final = {"id": completion_id, "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    def stats(self) -> dict:
+        answered = self.replayed + self.synthesized
+        return {
+            "requests": self.requests,
+            "replayed": self.replayed,
+            "synthesized": self.synthesized,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "streamed": self.streamed,
+            "latency_s_avg": round(self.latency_s_total / answered, 3) if answered else None,
+            "config": self.config.as_dict(),
+        }
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _replay_db
+    yield
+    if _replay_db is not None:
+        await _replay_db.close()
+        _replay_db = None
+
+mock = MockOpenRouter(mock_config)
+app = FastAPI(title="OpenRouter stand-in", lifespan=lifespan)
+
+@app.post("/api/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions_endpoint(request: Request):
+    return await mock.complete(await request.json())
+
+@app.get("/api/v1/credits")
+@app.get("/v1/credits")
+async def credits_endpoint():
+    return {"data": {"total_credits": 1000.0, "total_usage": 0.0}}
+
+@app.get("/mock/stats")
+async def mock_stats_endpoint():
+    """Replayed / synthesized / failed request counters and the active configuration."""
+    return mock.stats()
+
+@app.post("/mock/reset")
+async def mock_reset_endpoint():
+    """Zeroes the counters and the per-request attempt numbers (restarts the seeded draw sequence)."""
+    global mock
+    mock = MockOpenRouter(mock_config)
+    return {"status": "success"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenRouter-compatible stand-in for offline runs and benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--replay-db", default=mock_config.replay_db, help="database whose llm_runs_v2 responses are replayed")
+    parser.add_argument("--replay-latency", action="store_true", default=mock_config.replay_latency, help="sleep for recorded run durations")
+    parser.add_argument("--latency-median", type=float, default=mock_config.latency_median)
+    parser.add_argument("--latency-sigma", type=float, default=mock_config.latency_sigma)
+    parser.add_argument("--tokens-per-second", type=float, default=mock_config.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=mock_config.error_rate)
+    parser.add_argument("--throttle-rate", type=float, default=mock_config.throttle_rate)
+    parser.add_argument("--retry-after", type=float, default=mock_config.retry_after)
+    parser.add_argument("--seed", type=int, default=mock_config.seed)
+    parser.add_argument("--model-profiles", default=None, help="JSON object of per-model overrides")
+    args = parser.parse_args()
+
+    for field in _PROFILE_FIELDS + ("seed", "replay_db", "replay_latency"):
+        setattr(mock_config, field, getattr(args, field))
+    if args.model_profiles:
+        mock_config.set_model_profiles(args.model_profiles)
+    import uvicorn
+    logger.info(f"Mock OpenRouter listening on http://{args.host}:{args.port}/api/v1 ({json.dumps(mock_config.as_dict())})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
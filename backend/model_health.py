@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from .utilities import setup_logging, get_logger
+from .rate_limiter import get_retry_budget
+
+setup_logging()
+logger = get_logger(__name__)
+
+# Hedged requests across a prompt's fallback models (env-overridable)
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "1") == "1"
+# Latency percentile after which a duplicate request goes to the next model
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+# Completed calls a model needs before its percentile is trusted; until then LLM_HEDGE_DEFAULT_DELAY applies
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "60"))  # seconds
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))  # seconds
+# Per-model tracker: EWMA smoothing, latency window for percentiles, error-rate demotion
+LLM_HEALTH_EWMA_ALPHA = float(os.getenv("LLM_HEALTH_EWMA_ALPHA", "0.2"))
+LLM_HEALTH_WINDOW = int(os.getenv("LLM_HEALTH_WINDOW", "200"))
+# A model whose EWMA error rate is above this is tried after the healthy fallbacks
+LLM_HEALTH_ERROR_THRESHOLD = float(os.getenv("LLM_HEALTH_ERROR_THRESHOLD", "0.5"))
+# The error rate decays with this half-life while a model gets no traffic, so a demoted model is retried
+LLM_HEALTH_ERROR_HALF_LIFE = float(os.getenv("LLM_HEALTH_ERROR_HALF_LIFE", "120"))  # seconds
+
+def _percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def parse_fallback_models(value: Optional[str], primary: Optional[str] = None) -> list[str]:
+    """Model ids from a prompt's prompt_fallback_model_ids (JSON array), without duplicates or the primary."""
+    if not value:
+        return []
+    try:
+        models = json.loads(value)
+    except json.JSONDecodeError:
+        logger.error(f"prompt_fallback_model_ids is not valid JSON ({value!r}); ignoring fallbacks.")
+        return []
+    if isinstance(models, str):
+        models = [models]
+    if not isinstance(models, list):
+        logger.error(f"prompt_fallback_model_ids must be a JSON array of model ids ({value!r}); ignoring fallbacks.")
+        return []
+    fallbacks = []
+    for model in models:
+        if isinstance(model, str) and model and model != primary and model not in fallbacks:
+            fallbacks.append(model)
+    return fallbacks
+
+class ModelHealth:
+    """
+    Latency and error tracker for one model.
+
+    Keeps EWMAs of call latency and error rate plus a window of recent latencies for percentiles.
+    Latency is measured around the whole fetch_response call (rate limiter wait and transport retries
+    included), i.e. what an assessment actually waits for. Losing hedged calls are cancelled; their
+    elapsed time is only a lower bound on the model's latency, so they are counted but kept out of the
+    latency window (a censored sample would pull the hedge percentile down towards the hedge delay).
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.latency_ewma: Optional[float] = None
+        self._error_ewma = 0.0
+        self._error_updated = time.monotonic()
+        self.latencies: deque[float] = deque(maxlen=LLM_HEALTH_WINDOW)
+        self.successes = 0
+        self.failures = 0
+        self.cancelled = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def error_rate(self) -> float:
+        elapsed = time.monotonic() - self._error_updated
+        if LLM_HEALTH_ERROR_HALF_LIFE <= 0:
+            return self._error_ewma
+        return self._error_ewma * 0.5 ** (elapsed / LLM_HEALTH_ERROR_HALF_LIFE)
+
+    def _record_outcome(self, failed: bool):
+        self._error_ewma = self.error_rate() + LLM_HEALTH_EWMA_ALPHA * (float(failed) - self.error_rate())
+        self._error_updated = time.monotonic()
+
+    def _record_latency(self, latency: float):
+        self.latencies.append(latency)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += LLM_HEALTH_EWMA_ALPHA * (latency - self.latency_ewma)
+
+    def record_success(self, latency: float):
+        self.successes += 1
+        self._record_latency(latency)
+        self._record_outcome(False)
+
+    def record_failure(self):
+        self.failures += 1
+        self._record_outcome(True)
+
+    def record_cancelled(self):
+        self.cancelled += 1
+
+    @property
+    def healthy(self) -> bool:
+        return self.error_rate() <= LLM_HEALTH_ERROR_THRESHOLD
+
+    def latency_percentile(self, q: float = LLM_HEDGE_QUANTILE) -> Optional[float]:
+        return _percentile(list(self.latencies), q)
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait on this model before hedging to the next one."""
+        if len(self.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DEFAULT_DELAY
+        return max(LLM_HEDGE_MIN_DELAY, self.latency_percentile() or 0.0)
+
+    def stats(self) -> dict:
+        latencies = list(self.latencies)
+        return {
+            "healthy": self.healthy,
+            "successes": self.successes,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "error_rate_ewma": round(self.error_rate(), 4),
+            "latency_s_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "latency_s_p50": round(_percentile(latencies, 0.50), 3) if latencies else None,
+            "latency_s_p95": round(_percentile(latencies, 0.95), 3) if latencies else None,
+            "samples": len(latencies),
+            "hedge_delay_s": round(self.hedge_delay(), 3),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+        }
+
+_models: dict[str, ModelHealth] = {}
+
+def get_model_health(model: str) -> ModelHealth:
+    health = _models.get(model)
+    if health is None:
+        health = ModelHealth(model)
+        _models[model] = health
+    return health
+
+def order_models(models: list[str]) -> list[str]:
+    """Configured order, except that unhealthy models go after the healthy ones."""
+    return sorted(models, key=lambda model: not get_model_health(model).healthy)
+
+async def hedged_call(models: list[str], call: Callable[[str], Awaitable[Any]]) -> tuple[Any, str]:
+    """
+    Runs `call(model)` on the first model and returns (result, model) of the first call to succeed.
+
+    While a call is in flight past its model's hedge delay (observed LLM_HEDGE_QUANTILE latency), a
+    duplicate goes to the next model; a call that fails hands over to the next model immediately.
+    The first valid result wins and the calls still in flight are cancelled. Hedges draw on the shared
+    retry budget, so a degraded provider cannot double the request rate; failovers do not.
+    """
+    models = order_models(models) if len(models) > 1 else list(models)
+    if not models:
+        raise ValueError("hedged_call needs at least one model")
+    in_flight: dict[asyncio.Task, tuple[str, bool, float]] = {}  # task -> (model, is hedge, started)
+    next_index = 0
+    hedging = LLM_HEDGING_ENABLED
+    last_error: Optional[BaseException] = None
+
+    def launch(hedge: bool):
+        nonlocal next_index
+        model = models[next_index]
+        next_index += 1
+        if hedge:
+            get_model_health(model).hedges += 1
+        in_flight[asyncio.create_task(call(model))] = (model, hedge, time.perf_counter())
+
+    launch(False)
+    try:
+        while in_flight:
+            timeout = None
+            if hedging and next_index < len(models):
+                # Hedge off the most recently launched call (the previous hedge, if any)
+                model, _, started = in_flight[next(reversed(in_flight))]
+                timeout = max(0.0, get_model_health(model).hedge_delay() - (time.perf_counter() - started))
+            done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if get_retry_budget().try_spend():
+                    logger.info(f"Hedging {model} after {time.perf_counter() - started:.1f}s with {models[next_index]}")
+                    launch(True)
+                else:
+                    logger.warning(f"Retry budget exhausted; not hedging {model}")
+                    hedging = False
+                continue
+            for task in done:
+                model, hedge, started = in_flight.pop(task)
+                health = get_model_health(model)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    health.record_failure()
+                    last_error = e
+                    logger.warning(f"Call to {model} failed: {type(e).__name__}: {e}")
+                    continue
+                health.record_success(time.perf_counter() - started)
+                if hedge:
+                    health.hedge_wins += 1
+                return result, model
+            if not in_flight and next_index < len(models):
+                get_model_health(models[next_index]).failovers += 1
+                logger.warning(f"Failing over to {models[next_index]}")
+                launch(False)
+        assert last_error is not None
+        raise last_error
+    finally:
+        for task, (model, _, _) in in_flight.items():
+            task.cancel()
+            get_model_health(model).record_cancelled()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+def model_health_stats() -> dict:
+    """Per-model latency/error tracker state and the hedging configuration."""
+    return {
+        "hedging_enabled": LLM_HEDGING_ENABLED,
+        "hedge_quantile": LLM_HEDGE_QUANTILE,
+        "hedge_min_samples": LLM_HEDGE_MIN_SAMPLES,
+        "hedge_default_delay_s": LLM_HEDGE_DEFAULT_DELAY,
+        "error_threshold": LLM_HEALTH_ERROR_THRESHOLD,
+        "models": {model: health.stats() for model, health in _models.items()},
+    }
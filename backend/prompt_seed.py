@@ -11,7 +11,7 @@ import time
 from dataclasses import dataclass
 from typing import List
 
-from .db import get_db
+from .db import run_write
 from .utilities import get_logger
 from .prompt_catalog_initial import INITIAL_PROMPT_SPECS, REQUIRED_LLM_RUN_TYPES
 
@@ -28,47 +28,44 @@ async def seed_initial_prompts() -> SeedResult:
 
     Returns a SeedResult summarizing the action.
     """
-    db = await get_db()
+    async def _write(db):
+        # Fetch existing run types present already
+        async with db.execute(
+            "SELECT DISTINCT llm_run_type FROM prompt WHERE llm_run_type IS NOT NULL"
+        ) as cursor:
+            rows = await cursor.fetchall()
+            existing = {r[0] for r in rows if r[0] is not None}
 
-    # Fetch existing run types present already
-    async with db.execute(
-        "SELECT DISTINCT llm_run_type FROM prompt WHERE llm_run_type IS NOT NULL"
-    ) as cursor:
-        rows = await cursor.fetchall()
-        existing = {r[0] for r in rows if r[0] is not None}
+        inserted: List[str] = []
+        for spec in INITIAL_PROMPT_SPECS:
+            if spec.llm_run_type in existing:
+                continue
+            # Insert new prompt row
+            prompt_id = str(uuid.uuid4())
+            await db.execute(
+                """
+                INSERT INTO prompt (
+                    prompt_id, llm_run_type, model_id, prompt_system_prompt, prompt_template,
+                    prompt_temperature, prompt_response_schema, prompt_created_at, prompt_thinking_budget
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    prompt_id,
+                    spec.llm_run_type,
+                    spec.model_id,
+                    spec.prompt_system_prompt,
+                    spec.prompt_template,
+                    spec.prompt_temperature,
+                    None,  # response schema not used in initial seed
+                    int(time.time()),
+                    spec.prompt_thinking_budget,
+                ),
+            )
+            inserted.append(spec.llm_run_type)
+        return existing, inserted
 
-    inserted: List[str] = []
-    for spec in INITIAL_PROMPT_SPECS:
-        if spec.llm_run_type in existing:
-            continue
-        # Insert new prompt row
-        prompt_id = str(uuid.uuid4())
-        await db.execute(
-            """
-            INSERT INTO prompt (
-                prompt_id, llm_run_type, model_id, prompt_system_prompt, prompt_template,
-                prompt_temperature, prompt_response_schema, prompt_created_at, prompt_thinking_budget
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                prompt_id,
-                spec.llm_run_type,
-                spec.model_id,
-                spec.prompt_system_prompt,
-                spec.prompt_template,
-                spec.prompt_temperature,
-                None,  # response schema not used in initial seed
-                int(time.time()),
-                spec.prompt_thinking_budget,
-            ),
-        )
-        inserted.append(spec.llm_run_type)
-
-    if inserted:
-        await db.commit()
-    else:
-        # Still commit to release any implicit read transaction cleanly
-        await db.commit()
+    # Read and insert in one writer transaction so concurrent seeds cannot double insert
+    existing, inserted = await run_write(_write)
 
     existing_run_types = sorted(existing.intersection(REQUIRED_LLM_RUN_TYPES))
 
@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import asyncio
+import email.utils
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from .utilities import setup_logging, get_logger
+
+setup_logging()
+logger = get_logger(__name__)
+
+# Per-model request/token rate limits (env-overridable). 0 disables a limit.
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "1") == "1"
+LLM_DEFAULT_RPM = float(os.getenv("LLM_DEFAULT_RPM", "0"))
+LLM_DEFAULT_TPM = float(os.getenv("LLM_DEFAULT_TPM", "0"))
+# JSON object of per-model overrides, e.g. {"google/gemini-2.5-flash": {"rpm": 300, "tpm": 1000000}}
+LLM_MODEL_LIMITS = os.getenv("LLM_MODEL_LIMITS", "")
+# AIMD concurrency window per model
+LLM_CONCURRENCY_INITIAL = float(os.getenv("LLM_CONCURRENCY_INITIAL", "8"))
+LLM_CONCURRENCY_MIN = float(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+LLM_CONCURRENCY_MAX = float(os.getenv("LLM_CONCURRENCY_MAX", "64"))
+LLM_CONCURRENCY_DECREASE_FACTOR = float(os.getenv("LLM_CONCURRENCY_DECREASE_FACTOR", "0.5"))
+# Assumed completion size when reserving TPM before a call; corrected from reported usage afterwards
+LLM_TPM_OUTPUT_ESTIMATE = int(os.getenv("LLM_TPM_OUTPUT_ESTIMATE", "1500"))
+# Shared retry budget: each first attempt deposits RATIO retries, plus a MIN_PER_SEC trickle
+LLM_RETRY_BUDGET_RATIO = float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.2"))
+LLM_RETRY_BUDGET_MIN_PER_SEC = float(os.getenv("LLM_RETRY_BUDGET_MIN_PER_SEC", "0.5"))
+LLM_RETRY_BUDGET_MAX = float(os.getenv("LLM_RETRY_BUDGET_MAX", "50"))
+
+def _model_overrides() -> dict:
+    if not LLM_MODEL_LIMITS:
+        return {}
+    try:
+        overrides = json.loads(LLM_MODEL_LIMITS)
+        return overrides if isinstance(overrides, dict) else {}
+    except json.JSONDecodeError:
+        logger.error("LLM_MODEL_LIMITS is not valid JSON; using default limits for all models.")
+        return {}
+
+def estimate_tokens(messages: list[dict], output_tokens: int = LLM_TPM_OUTPUT_ESTIMATE) -> int:
+    """Rough request size for TPM accounting (~4 characters per token plus the expected completion)."""
+    chars = 0
+    for m in messages:
+        content = m.get("content") or ""
+        if isinstance(content, list):  # content parts (e.g. text with a cache_control hint)
+            chars += sum(len(str(part.get("text") or "")) for part in content if isinstance(part, dict))
+        else:
+            chars += len(str(content))
+    return chars // 4 + output_tokens
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header (delta seconds or HTTP date) into seconds from now."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(when.timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Continuous-refill token bucket; `capacity` tokens refill evenly over one minute. Waiters are served FIFO."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def take(self, amount: float) -> float:
+        """Waits until `amount` tokens are available and takes them. Returns seconds spent waiting."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def adjust(self, delta: float):
+        """Returns (delta > 0) or charges (delta < 0) tokens after the real cost is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+class ModelLimiter:
+    """RPM/TPM token buckets plus an AIMD concurrency window for one model."""
+
+    def __init__(self, model: str, rpm: float, tpm: float):
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.limit = min(max(LLM_CONCURRENCY_INITIAL, LLM_CONCURRENCY_MIN), LLM_CONCURRENCY_MAX)
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+        self._blocked_until = 0.0  # monotonic time before which no request is sent (Retry-After)
+        # Stats
+        self.requests = 0
+        self.successes = 0
+        self.throttled = 0
+        self.waiting = 0
+        self.wait_concurrency_s = 0.0
+        self.wait_rpm_s = 0.0
+        self.wait_tpm_s = 0.0
+        self.wait_retry_after_s = 0.0
+        self.tokens_used = 0
+
+    async def _acquire_slot(self) -> float:
+        start = time.monotonic()
+        async with self._cond:
+            while self.in_flight >= int(self.limit):
+                await self._cond.wait()
+            self.in_flight += 1
+        return time.monotonic() - start
+
+    async def _release_slot(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int) -> AsyncIterator["ModelLimiter"]:
+        """
+        Holds one concurrency slot for the duration of a request, after waiting out any Retry-After
+        block and taking one request and `estimated_tokens` tokens from the buckets.
+        """
+        self.waiting += 1
+        try:
+            blocked = self._blocked_until - time.monotonic()
+            if blocked > 0:
+                self.wait_retry_after_s += blocked
+                await asyncio.sleep(blocked)
+            self.wait_concurrency_s += await self._acquire_slot()
+        finally:
+            self.waiting -= 1
+        try:
+            if self._requests is not None:
+                self.wait_rpm_s += await self._requests.take(1)
+            if self._tokens is not None:
+                self.wait_tpm_s += await self._tokens.take(estimated_tokens)
+            self.requests += 1
+            yield self
+        finally:
+            await self._release_slot()
+
+    async def on_success(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Additive increase (about +1 per window of successes) and TPM correction from reported usage."""
+        self.successes += 1
+        if actual_tokens is not None:
+            self.tokens_used += actual_tokens
+            if self._tokens is not None:
+                self._tokens.adjust(estimated_tokens - actual_tokens)
+        previous = int(self.limit)
+        self.limit = min(LLM_CONCURRENCY_MAX, self.limit + 1.0 / max(self.limit, 1.0))
+        if int(self.limit) > previous:
+            async with self._cond:
+                self._cond.notify_all()
+
+    def on_throttled(self, retry_after: Optional[float]):
+        """Multiplicative decrease on HTTP 429; honours Retry-After for every caller of this model."""
+        self.throttled += 1
+        self.limit = max(LLM_CONCURRENCY_MIN, self.limit * LLM_CONCURRENCY_DECREASE_FACTOR)
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        if self._requests is not None:
+            # Drop any burst allowance so the refill rate paces the next attempts
+            self._requests.tokens = min(self._requests.tokens, 0.0)
+        logger.warning(
+            f"Model {self.model} throttled (429); concurrency limit now {self.limit:.2f}"
+            + (f", pausing {retry_after:.1f}s" if retry_after else "")
+        )
+
+    def stats(self) -> dict:
+        return {
+            "rpm_limit": self.rpm or None,
+            "tpm_limit": self.tpm or None,
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "requests": self.requests,
+            "successes": self.successes,
+            "throttled": self.throttled,
+            "tokens_used": self.tokens_used,
+            "rpm_tokens_available": round(self._requests.tokens, 2) if self._requests else None,
+            "tpm_tokens_available": round(self._tokens.tokens, 2) if self._tokens else None,
+            "blocked_for_s": round(max(self._blocked_until - time.monotonic(), 0.0), 2),
+            "wait_s": {
+                "concurrency": round(self.wait_concurrency_s, 3),
+                "rpm": round(self.wait_rpm_s, 3),
+                "tpm": round(self.wait_tpm_s, 3),
+                "retry_after": round(self.wait_retry_after_s, 3),
+            },
+        }
+
+class RetryBudget:
+    """
+    Process-wide cap on retries: each first attempt deposits `ratio` of a retry and the balance also
+    trickles up at `min_per_sec`. A retry is allowed only if a whole token is available, so a provider
+    outage cannot multiply load by the per-call retry count.
+    """
+
+    def __init__(self, ratio: float, min_per_sec: float, maximum: float):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.maximum = maximum
+        self.balance = maximum
+        self._updated = time.monotonic()
+        self.granted = 0
+        self.denied = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.balance = min(self.maximum, self.balance + (now - self._updated) * self.min_per_sec)
+        self._updated = now
+
+    def deposit(self):
+        self._refill()
+        self.balance = min(self.maximum, self.balance + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.balance >= 1.0:
+            self.balance -= 1.0
+            self.granted += 1
+            return True
+        self.denied += 1
+        return False
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "balance": round(self.balance, 2),
+            "maximum": self.maximum,
+            "ratio": self.ratio,
+            "min_per_sec": self.min_per_sec,
+            "granted": self.granted,
+            "denied": self.denied,
+        }
+
+_limiters: dict[str, ModelLimiter] = {}
+_retry_budget = RetryBudget(LLM_RETRY_BUDGET_RATIO, LLM_RETRY_BUDGET_MIN_PER_SEC, LLM_RETRY_BUDGET_MAX)
+
+def get_model_limiter(model: str) -> ModelLimiter:
+    """Returns the limiter for `model` (the prompt's model_id), creating it from config on first use."""
+    limiter = _limiters.get(model)
+    if limiter is None:
+        override = _model_overrides().get(model, {})
+        limiter = ModelLimiter(
+            model,
+            rpm=float(override.get("rpm", LLM_DEFAULT_RPM)),
+            tpm=float(override.get("tpm", LLM_DEFAULT_TPM)),
+        )
+        _limiters[model] = limiter
+    return limiter
+
+def get_retry_budget() -> RetryBudget:
+    return _retry_budget
+
+def rate_limiter_stats() -> dict:
+    """Per-model limiter state and the shared retry budget."""
+    return {
+        "enabled": LLM_RATE_LIMIT_ENABLED,
+        "models": {model: limiter.stats() for model, limiter in _limiters.items()},
+        "retry_budget": _retry_budget.stats(),
+    }
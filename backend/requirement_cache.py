@@ -0,0 +1,340 @@
+import os
+import re
+import random
+import json
+import hashlib
+import unicodedata
+from array import array
+from typing import Optional
+
+from .utilities import setup_logging, get_logger
+from .db import (
+    get_requirement_match_candidates,
+    upsert_requirement_matches,
+    count_requirement_matches,
+    delete_requirement_matches_except,
+    iter_assessed_job_skills,
+    get_latest_llm_run,
+    get_latest_prompt,
+    get_document_master_resume,
+    get_document_master_resume_json,
+)
+
+setup_logging()
+logger = get_logger(__name__)
+
+# Requirement match cache configuration (env-overridable)
+REQUIREMENT_CACHE_ENABLED = os.getenv("REQUIREMENT_CACHE_ENABLED", "1") == "1"
+# Minimum estimated Jaccard similarity (over word tokens) for a near-duplicate to reuse a match; it must also
+# have the same numbers and content words (see near_duplicate_score)
+REQUIREMENT_CACHE_MIN_SIMILARITY = float(os.getenv("REQUIREMENT_CACHE_MIN_SIMILARITY", "0.8"))
+REQUIREMENT_CACHE_BACKFILL_BATCH = int(os.getenv("REQUIREMENT_CACHE_BACKFILL_BATCH", "500"))
+
+# MinHash / LSH shape: 8 bands of 8 rows puts the LSH candidate threshold near 0.77 Jaccard.
+# Changing these invalidates stored signatures (rebuild the requirement_match table).
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 8
+_MINHASH_ROWS = MINHASH_PERMUTATIONS // MINHASH_BANDS
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1729)  # fixed seed: signatures are persisted
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?\+?")
+_POSSESSIVE_RE = re.compile(r"['’]s\b")
+# Keeps '+' and '#' ("C++", "C#", "5+ years") and decimal points ("2.5"); everything else separates words
+_NON_WORD_RE = re.compile(r"(?!(?<=\d)\.(?=\d))[^\w+#]+|_")
+# Dropped from the MinHash token set only; the normalized key keeps them. Negations ("not", "no", "without",
+# "non", the "t" of "n't") are deliberately not stopwords, so they always count as content words.
+_STOPWORDS = frozenset({"a", "an", "the", "of", "in", "on", "with", "and", "or", "to", "for", "as", "at", "by", "is", "be"})
+# Light suffix stripping for content-word comparison: "managing"/"managed"/"manages" -> "manag"
+_STEM_SUFFIXES = ("ing", "ies", "ed", "ly", "s")
+
+# The 3.1 prompt row and documents a cached match depends on; any change yields a new match context
+_PROMPT_CONTEXT_FIELDS = (
+    "prompt_id", "model_id", "prompt_system_prompt", "prompt_template", "prompt_temperature",
+    "prompt_thinking_budget", "prompt_response_schema",
+)
+
+def match_context_key(prompt_configuration: dict, resume: dict, resume_json: dict) -> str:
+    """
+    Hash of everything stage 3.1 sends besides the requirements: the 3.1 prompt row (id, model, system
+    prompt, template, sampling settings, schema) and the master resume and profile (id and text).
+    Cached matches are only reused under the same key, so editing the prompt, switching its model or
+    updating either document is a miss for every requirement and the reassessment reaches the model.
+    """
+    parts = [prompt_configuration.get(field) for field in _PROMPT_CONTEXT_FIELDS]
+    for document in (resume, resume_json):
+        parts += [document.get("document_id"), document.get("document_markdown")]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def normalize_requirement(text: str) -> str:
+    """Lowercased, accent-folded requirement with punctuation removed and whitespace collapsed."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = _POSSESSIVE_RE.sub("", text)
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+def requirement_numbers(normalized: str) -> str:
+    """Numbers in a normalized requirement, in order; near-duplicates must agree on them exactly."""
+    return " ".join(_NUMBER_RE.findall(normalized))
+
+def _tokens(normalized: str) -> set[str]:
+    tokens = set()
+    for word in normalized.split():
+        if word in _STOPWORDS:
+            continue
+        # Crude plural folding so "degrees"/"degree" and "years"/"year" share a token
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss") and not word[0].isdigit():
+            word = word[:-1]
+        tokens.add(word)
+    return tokens or {normalized}
+
+def _stem(word: str) -> str:
+    if word[0].isdigit():
+        return word
+    for suffix in _STEM_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            word = word[:-len(suffix)] + ("y" if suffix == "ies" else "")
+            break
+    # "manage"/"managed", "service"/"services" end up on the same stem
+    return word[:-1] if word.endswith("e") and len(word) > 4 else word
+
+def content_tokens(normalized: str) -> frozenset[str]:
+    """Stemmed non-stopword tokens of a normalized requirement; near-duplicates must share exactly these."""
+    return frozenset(_stem(word) for word in normalized.split() if word not in _STOPWORDS) or frozenset({normalized})
+
+def minhash_signature(normalized: str) -> list[int]:
+    """MinHash signature (MINHASH_PERMUTATIONS 32-bit values) over the requirement's word tokens."""
+    hashed = [
+        int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+        for token in _tokens(normalized)
+    ]
+    return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashed) for a, b in _PERMUTATIONS]
+
+def band_keys(signature: list[int]) -> list[str]:
+    """LSH band keys: requirements sharing any key are candidate near-duplicates."""
+    keys = []
+    for band in range(MINHASH_BANDS):
+        rows = signature[band * _MINHASH_ROWS:(band + 1) * _MINHASH_ROWS]
+        digest = hashlib.blake2b(array("I", rows).tobytes(), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
+
+def _pack(signature: list[int]) -> bytes:
+    return array("I", signature).tobytes()
+
+def _unpack(blob: bytes) -> list[int]:
+    signature = array("I")
+    signature.frombytes(blob)
+    return signature.tolist()
+
+def _similarity(a: list[int], b: list[int]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+def near_duplicate_score(
+    a_norm: str,
+    b_norm: str,
+    signature_a: Optional[list[int]] = None,
+    signature_b: Optional[list[int]] = None,
+) -> Optional[float]:
+    """
+    Estimated similarity of two normalized requirements if a cached match for `b_norm` may be reused for
+    `a_norm`, else None.
+
+    MinHash similarity only says that most words are shared; "must not be authorized" vs "must be
+    authorized" or "GCP, Docker" vs "AWS, Docker" score above any useful threshold. A near-duplicate
+    therefore also needs the same numbers and the same content words after stemming, so it may only differ
+    in stopwords, inflection, punctuation and word order.
+    """
+    if requirement_numbers(a_norm) != requirement_numbers(b_norm):
+        return None
+    if content_tokens(a_norm) != content_tokens(b_norm):
+        return None
+    score = _similarity(signature_a or minhash_signature(a_norm), signature_b or minhash_signature(b_norm))
+    return score if score >= REQUIREMENT_CACHE_MIN_SIMILARITY else None
+
+class _Fingerprint:
+    __slots__ = ("requirement_string", "req_norm", "req_numbers", "signature", "band_keys")
+
+    def __init__(self, requirement_string: str):
+        self.requirement_string = requirement_string
+        self.req_norm = normalize_requirement(requirement_string)
+        self.req_numbers = requirement_numbers(self.req_norm)
+        self.signature = minhash_signature(self.req_norm)
+        self.band_keys = band_keys(self.signature)
+
+    def row(self, match: bool, match_reasoning: Optional[str], source_job_id: Optional[str]) -> dict:
+        return {
+            "req_norm": self.req_norm,
+            "req_numbers": self.req_numbers,
+            "req_minhash": _pack(self.signature),
+            "req_string": self.requirement_string,
+            "match": match,
+            "match_reasoning": match_reasoning,
+            "source_job_id": source_job_id,
+            "band_keys": self.band_keys,
+        }
+
+class RequirementMatchCache:
+    """
+    (match context, normalized requirement) -> (match, reasoning), backed by requirement_match.
+    The match context is match_context_key of the 3.1 prompt and the master resume documents.
+
+    Lookups hit on an identical normalized string, or on a stored requirement that shares an LSH band,
+    has the same numbers and content words (see near_duplicate_score) and an estimated Jaccard similarity of
+    at least REQUIREMENT_CACHE_MIN_SIMILARITY.
+    Stage 3.1 then only sends the requirements that missed.
+    """
+
+    def __init__(self):
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    async def lookup(self, match_context: str, requirement_strings: list[str]) -> dict[int, dict]:
+        """Returns {index: {"match", "match_reasoning"}} for the cached entries of `requirement_strings`."""
+        if not REQUIREMENT_CACHE_ENABLED or not requirement_strings:
+            return {}
+        fingerprints = [_Fingerprint(s) for s in requirement_strings]
+        try:
+            candidates = await get_requirement_match_candidates(
+                match_context,
+                sorted({f.req_norm for f in fingerprints}),
+                sorted({key for f in fingerprints for key in f.band_keys}),
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Requirement cache lookup failed (treated as miss): {e}")
+            return {}
+
+        by_norm = {c["req_norm"]: c for c in candidates}
+        by_band: dict[str, list[dict]] = {}
+        for c in candidates:
+            c["signature"] = _unpack(c["req_minhash"])
+            for key in band_keys(c["signature"]):
+                by_band.setdefault(key, []).append(c)
+
+        hits: dict[int, dict] = {}
+        for i, f in enumerate(fingerprints):
+            exact = by_norm.get(f.req_norm)
+            if exact is not None:
+                hits[i] = {"match": bool(exact["match"]), "match_reasoning": exact["match_reasoning"]}
+                self.exact_hits += 1
+                continue
+            best, best_score = None, 0.0
+            for key in f.band_keys:
+                for c in by_band.get(key, ()):
+                    score = near_duplicate_score(f.req_norm, c["req_norm"], f.signature, c["signature"])
+                    if score is not None and score >= best_score:
+                        best, best_score = c, score
+            if best is not None:
+                hits[i] = {"match": bool(best["match"]), "match_reasoning": best["match_reasoning"]}
+                self.near_hits += 1
+            else:
+                self.misses += 1
+        return hits
+
+    async def store(self, match_context: str, assessed: list[dict], source_job_id: Optional[str] = None) -> int:
+        """Stores freshly assessed requirements ({"requirement_string", "match", "match_reasoning"})."""
+        if not REQUIREMENT_CACHE_ENABLED or not assessed:
+            return 0
+        rows = {}
+        for item in assessed:
+            if item.get("match") is None:
+                continue
+            row = _Fingerprint(item["requirement_string"]).row(item["match"], item.get("match_reasoning"), source_job_id)
+            rows[row["req_norm"]] = row
+        try:
+            stored = await upsert_requirement_matches(match_context, list(rows.values()))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Requirement cache store failed: {e}")
+            return 0
+        self.stores += stored
+        return stored
+
+    async def backfill(self, match_context: str, prompt_configuration: dict, resume: dict, resume_json: dict) -> int:
+        """
+        Builds `match_context` from the job_skills rows assessed for `resume` in that context (later
+        assessments win). Rows from before job_skills_match_context was recorded only count when their
+        job's latest 3.1 run used the same prompt and model and was sent the current resume and profile
+        text. Returns rows written.
+        """
+        pending: dict[str, dict] = {}
+        legacy_jobs: dict[str, bool] = {}  # job_id -> its unrecorded context is verified to be match_context
+        async for item in iter_assessed_job_skills(resume["document_id"], match_context):
+            f = _Fingerprint(item["job_skills_atomic_string"] or "")
+            if not f.req_norm:
+                continue
+            job_id = item["job_id"]
+            if item["job_skills_match_context"] is None:
+                if job_id not in legacy_jobs:
+                    legacy_jobs[job_id] = await self._assessed_in_context(job_id, prompt_configuration, resume, resume_json)
+                if not legacy_jobs[job_id]:
+                    continue
+            pending[f.req_norm] = f.row(item["job_skills_match"], item["job_skills_match_reasoning"], job_id)
+        rows = list(pending.values())
+        written = 0
+        for start in range(0, len(rows), REQUIREMENT_CACHE_BACKFILL_BATCH):
+            written += await upsert_requirement_matches(match_context, rows[start:start + REQUIREMENT_CACHE_BACKFILL_BATCH])
+        return written
+
+    @staticmethod
+    async def _assessed_in_context(job_id: str, prompt_configuration: dict, resume: dict, resume_json: dict) -> bool:
+        run = await get_latest_llm_run(job_id, prompt_configuration["llm_run_type"])
+        if run is None:
+            return False
+        if run["llm_run_system_prompt_id"] != prompt_configuration["prompt_id"]:
+            return False
+        if run["llm_run_model_id"] != prompt_configuration["model_id"]:
+            return False
+        sent = (run["llm_run_context"] or "") + (run["llm_run_input"] or "")
+        return resume["document_markdown"] in sent and resume_json["document_markdown"] in sent
+
+    async def ensure_built(self) -> int:
+        """
+        Prepares the cache for the current 3.1 prompt and master resume: drops the matches of any other
+        context, and backfills from job_skills when the current context has none (first start after the
+        migration, or after the prompt or resume changed while the server was down).
+        """
+        if not REQUIREMENT_CACHE_ENABLED:
+            return 0
+        prompt_configuration = await get_latest_prompt("ja_3_1_assessment")
+        resume = await get_document_master_resume()
+        resume_json = await get_document_master_resume_json()
+        if prompt_configuration is None or resume["document_markdown"] is None or resume_json["document_markdown"] is None:
+            return 0
+        match_context = match_context_key(prompt_configuration, resume, resume_json)
+        dropped = await delete_requirement_matches_except(match_context)
+        if dropped:
+            logger.info(f"Dropped {dropped} requirement match(es) from an earlier 3.1 prompt or resume")
+        if await count_requirement_matches(match_context) > 0:
+            return 0
+        written = await self.backfill(match_context, prompt_configuration, resume, resume_json)
+        if written:
+            logger.info(f"Built requirement match cache from job_skills: {written} requirement(s)")
+        return written
+
+    async def stats(self) -> dict:
+        hits = self.exact_hits + self.near_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": REQUIREMENT_CACHE_ENABLED,
+            "hits": hits,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "errors": self.errors,
+            "min_similarity": REQUIREMENT_CACHE_MIN_SIMILARITY,
+            "entries": await count_requirement_matches(),
+        }
+
+requirement_match_cache = RequirementMatchCache()
@@ -0,0 +1,4 @@
+-- Secondary indexes for the per-job lookups behind GET /job/{job_id} and the assessment pipeline.
+CREATE INDEX IF NOT EXISTS idx_job_skills_job_id ON job_skills (job_id);
+CREATE INDEX IF NOT EXISTS idx_llm_runs_v2_job_id_run_end ON llm_runs_v2 (job_id, llm_run_end);
+CREATE INDEX IF NOT EXISTS idx_job_quarantine_job_id_timestamp ON job_quarantine (job_id, job_quarantine_timestamp);
@@ -0,0 +1,3 @@
+-- Serve "latest document by name" and "latest prompt by run type" as index lookups.
+CREATE INDEX IF NOT EXISTS idx_document_store_name_timestamp ON document_store (document_name, document_timestamp);
+CREATE INDEX IF NOT EXISTS idx_prompt_run_type_created_at ON prompt (llm_run_type, prompt_created_at);
@@ -0,0 +1,203 @@
+-- Per-job assessment summary kept current by triggers on llm_runs_v2, job_skills and job_quarantine,
+-- so "recently assessed" listings no longer aggregate the whole llm_runs_v2 table per request.
+CREATE TABLE IF NOT EXISTS job_assessment_summary (
+    job_id                      TEXT PRIMARY KEY,
+    last_assessed_at            INTEGER, -- MAX(llm_runs_v2.llm_run_end) in epoch seconds
+    skills_total                INTEGER NOT NULL DEFAULT 0,
+    required_total              INTEGER NOT NULL DEFAULT 0,
+    required_matched            INTEGER NOT NULL DEFAULT 0,
+    additional_total            INTEGER NOT NULL DEFAULT 0,
+    additional_matched          INTEGER NOT NULL DEFAULT 0,
+    resume_id                   TEXT,    -- job_skills_resume_id of the most recently written skill
+    quarantine_count            INTEGER NOT NULL DEFAULT 0,
+    last_quarantine_reason      TEXT,
+    last_quarantine_timestamp   INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_assessment_summary_assessed
+    ON job_assessment_summary (last_assessed_at) WHERE skills_total > 0;
+
+-- Backfill from existing rows before the triggers exist, so nothing is counted twice.
+INSERT OR IGNORE INTO job_assessment_summary (job_id) SELECT DISTINCT job_id FROM llm_runs_v2 WHERE job_id IS NOT NULL;
+INSERT OR IGNORE INTO job_assessment_summary (job_id) SELECT DISTINCT job_id FROM job_skills;
+INSERT OR IGNORE INTO job_assessment_summary (job_id) SELECT DISTINCT job_id FROM job_quarantine;
+
+UPDATE job_assessment_summary SET
+    last_assessed_at = (
+        SELECT MAX(CAST(r.llm_run_end AS INTEGER)) FROM llm_runs_v2 r
+        WHERE r.job_id = job_assessment_summary.job_id AND r.llm_run_end IS NOT NULL
+    ),
+    skills_total = (SELECT COUNT(*) FROM job_skills s WHERE s.job_id = job_assessment_summary.job_id),
+    required_total = (
+        SELECT COUNT(*) FROM job_skills s
+        WHERE s.job_id = job_assessment_summary.job_id AND s.job_skills_type = 'required_qualification'
+    ),
+    required_matched = (
+        SELECT COUNT(*) FROM job_skills s
+        WHERE s.job_id = job_assessment_summary.job_id AND s.job_skills_type = 'required_qualification' AND s.job_skills_match = 1
+    ),
+    additional_total = (
+        SELECT COUNT(*) FROM job_skills s
+        WHERE s.job_id = job_assessment_summary.job_id AND s.job_skills_type = 'additional_qualification'
+    ),
+    additional_matched = (
+        SELECT COUNT(*) FROM job_skills s
+        WHERE s.job_id = job_assessment_summary.job_id AND s.job_skills_type = 'additional_qualification' AND s.job_skills_match = 1
+    ),
+    resume_id = (
+        SELECT s.job_skills_resume_id FROM job_skills s
+        WHERE s.job_id = job_assessment_summary.job_id AND s.job_skills_resume_id IS NOT NULL
+        ORDER BY s.rowid DESC LIMIT 1
+    ),
+    quarantine_count = (SELECT COUNT(*) FROM job_quarantine q WHERE q.job_id = job_assessment_summary.job_id),
+    last_quarantine_reason = (
+        SELECT q.job_quarantine_reason FROM job_quarantine q
+        WHERE q.job_id = job_assessment_summary.job_id
+        ORDER BY q.job_quarantine_timestamp DESC LIMIT 1
+    ),
+    last_quarantine_timestamp = (
+        SELECT MAX(q.job_quarantine_timestamp) FROM job_quarantine q WHERE q.job_id = job_assessment_summary.job_id
+    );
+
+-- llm_runs_v2: last_assessed_at only moves forward on insert/update; deletes recompute from the index.
+CREATE TRIGGER IF NOT EXISTS trg_llm_runs_v2_summary_insert
+AFTER INSERT ON llm_runs_v2
+WHEN NEW.job_id IS NOT NULL AND NEW.llm_run_end IS NOT NULL
+BEGIN
+    INSERT INTO job_assessment_summary (job_id, last_assessed_at)
+    VALUES (NEW.job_id, CAST(NEW.llm_run_end AS INTEGER))
+    ON CONFLICT(job_id) DO UPDATE SET
+        last_assessed_at = MAX(COALESCE(last_assessed_at, 0), excluded.last_assessed_at);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_llm_runs_v2_summary_update
+AFTER UPDATE OF job_id, llm_run_end ON llm_runs_v2
+WHEN NEW.job_id IS NOT NULL AND NEW.llm_run_end IS NOT NULL
+BEGIN
+    INSERT INTO job_assessment_summary (job_id, last_assessed_at)
+    VALUES (NEW.job_id, CAST(NEW.llm_run_end AS INTEGER))
+    ON CONFLICT(job_id) DO UPDATE SET
+        last_assessed_at = MAX(COALESCE(last_assessed_at, 0), excluded.last_assessed_at);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_llm_runs_v2_summary_delete
+AFTER DELETE ON llm_runs_v2
+WHEN OLD.job_id IS NOT NULL
+BEGIN
+    UPDATE job_assessment_summary SET
+        last_assessed_at = (
+            SELECT MAX(CAST(r.llm_run_end AS INTEGER)) FROM llm_runs_v2 r
+            WHERE r.job_id = OLD.job_id AND r.llm_run_end IS NOT NULL
+        )
+    WHERE job_id = OLD.job_id;
+END;
+
+-- job_skills: counters are adjusted by the delta of each row.
+CREATE TRIGGER IF NOT EXISTS trg_job_skills_summary_insert
+AFTER INSERT ON job_skills
+BEGIN
+    INSERT INTO job_assessment_summary (
+        job_id, skills_total, required_total, required_matched, additional_total, additional_matched, resume_id
+    ) VALUES (
+        NEW.job_id,
+        1,
+        NEW.job_skills_type = 'required_qualification',
+        IFNULL(NEW.job_skills_type = 'required_qualification' AND NEW.job_skills_match = 1, 0),
+        NEW.job_skills_type = 'additional_qualification',
+        IFNULL(NEW.job_skills_type = 'additional_qualification' AND NEW.job_skills_match = 1, 0),
+        NEW.job_skills_resume_id
+    )
+    ON CONFLICT(job_id) DO UPDATE SET
+        skills_total = skills_total + 1,
+        required_total = required_total + excluded.required_total,
+        required_matched = required_matched + excluded.required_matched,
+        additional_total = additional_total + excluded.additional_total,
+        additional_matched = additional_matched + excluded.additional_matched,
+        resume_id = COALESCE(excluded.resume_id, resume_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_job_skills_summary_delete
+AFTER DELETE ON job_skills
+BEGIN
+    UPDATE job_assessment_summary SET
+        skills_total = skills_total - 1,
+        required_total = required_total - (OLD.job_skills_type = 'required_qualification'),
+        required_matched = required_matched - IFNULL(OLD.job_skills_type = 'required_qualification' AND OLD.job_skills_match = 1, 0),
+        additional_total = additional_total - (OLD.job_skills_type = 'additional_qualification'),
+        additional_matched = additional_matched - IFNULL(OLD.job_skills_type = 'additional_qualification' AND OLD.job_skills_match = 1, 0)
+    WHERE job_id = OLD.job_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_job_skills_summary_update
+AFTER UPDATE ON job_skills
+BEGIN
+    UPDATE job_assessment_summary SET
+        skills_total = skills_total - 1,
+        required_total = required_total - (OLD.job_skills_type = 'required_qualification'),
+        required_matched = required_matched - IFNULL(OLD.job_skills_type = 'required_qualification' AND OLD.job_skills_match = 1, 0),
+        additional_total = additional_total - (OLD.job_skills_type = 'additional_qualification'),
+        additional_matched = additional_matched - IFNULL(OLD.job_skills_type = 'additional_qualification' AND OLD.job_skills_match = 1, 0)
+    WHERE job_id = OLD.job_id;
+    INSERT INTO job_assessment_summary (
+        job_id, skills_total, required_total, required_matched, additional_total, additional_matched, resume_id
+    ) VALUES (
+        NEW.job_id,
+        1,
+        NEW.job_skills_type = 'required_qualification',
+        IFNULL(NEW.job_skills_type = 'required_qualification' AND NEW.job_skills_match = 1, 0),
+        NEW.job_skills_type = 'additional_qualification',
+        IFNULL(NEW.job_skills_type = 'additional_qualification' AND NEW.job_skills_match = 1, 0),
+        NEW.job_skills_resume_id
+    )
+    ON CONFLICT(job_id) DO UPDATE SET
+        skills_total = skills_total + 1,
+        required_total = required_total + excluded.required_total,
+        required_matched = required_matched + excluded.required_matched,
+        additional_total = additional_total + excluded.additional_total,
+        additional_matched = additional_matched + excluded.additional_matched,
+        resume_id = COALESCE(excluded.resume_id, resume_id);
+END;
+
+-- job_quarantine: few rows per job, so recompute the job's quarantine state from the (job_id, timestamp) index.
+CREATE TRIGGER IF NOT EXISTS trg_job_quarantine_summary_insert
+AFTER INSERT ON job_quarantine
+BEGIN
+    INSERT INTO job_assessment_summary (job_id) VALUES (NEW.job_id) ON CONFLICT(job_id) DO NOTHING;
+    UPDATE job_assessment_summary SET
+        quarantine_count = (SELECT COUNT(*) FROM job_quarantine q WHERE q.job_id = NEW.job_id),
+        last_quarantine_reason = (
+            SELECT q.job_quarantine_reason FROM job_quarantine q
+            WHERE q.job_id = NEW.job_id ORDER BY q.job_quarantine_timestamp DESC LIMIT 1
+        ),
+        last_quarantine_timestamp = (SELECT MAX(q.job_quarantine_timestamp) FROM job_quarantine q WHERE q.job_id = NEW.job_id)
+    WHERE job_id = NEW.job_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_job_quarantine_summary_update
+AFTER UPDATE ON job_quarantine
+BEGIN
+    INSERT INTO job_assessment_summary (job_id) VALUES (NEW.job_id) ON CONFLICT(job_id) DO NOTHING;
+    UPDATE job_assessment_summary SET
+        quarantine_count = (SELECT COUNT(*) FROM job_quarantine q WHERE q.job_id = job_assessment_summary.job_id),
+        last_quarantine_reason = (
+            SELECT q.job_quarantine_reason FROM job_quarantine q
+            WHERE q.job_id = job_assessment_summary.job_id ORDER BY q.job_quarantine_timestamp DESC LIMIT 1
+        ),
+        last_quarantine_timestamp = (
+            SELECT MAX(q.job_quarantine_timestamp) FROM job_quarantine q WHERE q.job_id = job_assessment_summary.job_id
+        )
+    WHERE job_id IN (OLD.job_id, NEW.job_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_job_quarantine_summary_delete
+AFTER DELETE ON job_quarantine
+BEGIN
+    UPDATE job_assessment_summary SET
+        quarantine_count = (SELECT COUNT(*) FROM job_quarantine q WHERE q.job_id = OLD.job_id),
+        last_quarantine_reason = (
+            SELECT q.job_quarantine_reason FROM job_quarantine q
+            WHERE q.job_id = OLD.job_id ORDER BY q.job_quarantine_timestamp DESC LIMIT 1
+        ),
+        last_quarantine_timestamp = (SELECT MAX(q.job_quarantine_timestamp) FROM job_quarantine q WHERE q.job_id = OLD.job_id)
+    WHERE job_id = OLD.job_id;
+END;
@@ -0,0 +1,21 @@
+-- Content-addressed storage for large, highly repetitive LLM run inputs/outputs (prompts embed the whole resume).
+CREATE TABLE IF NOT EXISTS llm_blob (
+    blob_hash       TEXT PRIMARY KEY,   -- sha256 hex of the uncompressed UTF-8 text
+    blob_encoding   TEXT NOT NULL,      -- 'identity', 'zlib' or 'zstd'
+    blob_size       INTEGER NOT NULL,   -- uncompressed size in bytes
+    blob_data       BLOB NOT NULL,
+    blob_created_at INTEGER DEFAULT (strftime('%s', 'now'))
+);
+
+-- New runs reference blobs by hash and leave llm_run_input/llm_run_output NULL; older rows keep inline text.
+ALTER TABLE llm_runs_v2 ADD COLUMN llm_run_input_hash TEXT;
+ALTER TABLE llm_runs_v2 ADD COLUMN llm_run_output_hash TEXT;
+CREATE INDEX IF NOT EXISTS idx_llm_runs_v2_input_hash ON llm_runs_v2 (llm_run_input_hash);
+
+-- The stable part of a prompt (stage 3.1: candidate profile and resume text) is its own blob, so it is kept
+-- once per resume version instead of once per run
+ALTER TABLE llm_runs_v2 ADD COLUMN llm_run_context_hash TEXT;
+CREATE INDEX IF NOT EXISTS idx_llm_runs_v2_context_hash ON llm_runs_v2 (llm_run_context_hash);
+
+-- Reference lookups for garbage-collecting unreferenced llm_blob rows
+CREATE INDEX IF NOT EXISTS idx_llm_runs_v2_output_hash ON llm_runs_v2 (llm_run_output_hash);
@@ -0,0 +1,68 @@
+-- Full-text search over job title, company, description and atomic skill strings (one FTS row per job).
+-- job_details has a TEXT primary key, so its implicit rowid is not stable across VACUUM; job_search_doc
+-- assigns each job a permanent docid that is used as the FTS rowid.
+CREATE TABLE IF NOT EXISTS job_search_doc (
+    docid   INTEGER PRIMARY KEY,
+    job_id  TEXT NOT NULL UNIQUE
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS job_search USING fts5(
+    job_title,
+    job_company,
+    job_description,
+    job_skills,         -- ' | '-joined job_skills.job_skills_atomic_string for the job
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+
+-- Backfill
+INSERT OR IGNORE INTO job_search_doc (job_id) SELECT job_id FROM job_details;
+INSERT INTO job_search (rowid, job_title, job_company, job_description, job_skills)
+SELECT
+    d.docid, j.job_title, j.job_company, j.job_description,
+    (SELECT group_concat(s.job_skills_atomic_string, ' | ') FROM job_skills s WHERE s.job_id = j.job_id)
+FROM job_details j
+JOIN job_search_doc d ON d.job_id = j.job_id;
+
+-- job_details
+CREATE TRIGGER IF NOT EXISTS trg_job_details_search_insert
+AFTER INSERT ON job_details
+BEGIN
+    INSERT OR IGNORE INTO job_search_doc (job_id) VALUES (NEW.job_id);
+    DELETE FROM job_search WHERE rowid = (SELECT docid FROM job_search_doc WHERE job_id = NEW.job_id);
+    INSERT INTO job_search (rowid, job_title, job_company, job_description, job_skills)
+    SELECT
+        d.docid, NEW.job_title, NEW.job_company, NEW.job_description,
+        (SELECT group_concat(s.job_skills_atomic_string, ' | ') FROM job_skills s WHERE s.job_id = NEW.job_id)
+    FROM job_search_doc d WHERE d.job_id = NEW.job_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_job_details_search_update
+AFTER UPDATE OF job_title, job_company, job_description ON job_details
+BEGIN
+    UPDATE job_search SET
+        job_title = NEW.job_title,
+        job_company = NEW.job_company,
+        job_description = NEW.job_description
+    WHERE rowid = (SELECT docid FROM job_search_doc WHERE job_id = NEW.job_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_job_details_search_delete
+AFTER DELETE ON job_details
+BEGIN
+    DELETE FROM job_search WHERE rowid = (SELECT docid FROM job_search_doc WHERE job_id = OLD.job_id);
+    DELETE FROM job_search_doc WHERE job_id = OLD.job_id;
+END;
+
+-- job_skills: the writers in db.py recompute the job's skills column once per job, in the same transaction
+-- (_refresh_job_search_skills). Per-row triggers would rewrite the job's whole FTS document, description
+-- included, for every skill row. A skill row moved to another job (never done by the pipeline) still
+-- refreshes the job it left.
+CREATE TRIGGER IF NOT EXISTS trg_job_skills_search_move
+AFTER UPDATE OF job_id ON job_skills
+WHEN OLD.job_id IS NOT NEW.job_id
+BEGIN
+    UPDATE job_search SET job_skills = (
+        SELECT group_concat(s.job_skills_atomic_string, ' | ') FROM job_skills s WHERE s.job_id = OLD.job_id
+    )
+    WHERE rowid = (SELECT docid FROM job_search_doc WHERE job_id = OLD.job_id);
+END;
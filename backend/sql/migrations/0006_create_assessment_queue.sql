@@ -0,0 +1,39 @@
+-- Durable work queue for job assessments. Rows are claimed with a time-limited lease that workers
+-- extend by heartbeat; a lease that expires (worker crashed or was killed) makes the row claimable again.
+CREATE TABLE IF NOT EXISTS assessment_queue (
+    queue_id            INTEGER PRIMARY KEY,
+    job_id              TEXT NOT NULL,
+    queue_status        TEXT NOT NULL DEFAULT 'pending'
+                        CHECK (queue_status IN ('pending', 'leased', 'done', 'failed')),
+    queue_priority      INTEGER NOT NULL DEFAULT 0,  -- higher is claimed first
+    queue_attempts      INTEGER NOT NULL DEFAULT 0,
+    queue_max_attempts  INTEGER NOT NULL DEFAULT 3,
+    queue_available_at  INTEGER NOT NULL,            -- epoch seconds; retry backoff pushes this forward
+    lease_owner         TEXT,
+    lease_expires_at    INTEGER,
+    queue_last_error    TEXT,
+    queue_enqueued_at   INTEGER NOT NULL,
+    queue_updated_at    INTEGER NOT NULL,
+    queue_completed_at  INTEGER,
+
+    FOREIGN KEY (job_id) REFERENCES job_details (job_id) ON DELETE NO ACTION
+);
+
+-- At most one pending/leased entry per job (enqueue deduplication)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_assessment_queue_active_job
+    ON assessment_queue (job_id) WHERE queue_status IN ('pending', 'leased');
+
+-- Per-job history lookups
+CREATE INDEX IF NOT EXISTS idx_assessment_queue_job_id ON assessment_queue (job_id);
+
+-- Claim order for pending work
+CREATE INDEX IF NOT EXISTS idx_assessment_queue_pending
+    ON assessment_queue (queue_priority DESC, queue_available_at, queue_id) WHERE queue_status = 'pending';
+
+-- Expired lease recovery
+CREATE INDEX IF NOT EXISTS idx_assessment_queue_leased
+    ON assessment_queue (lease_expires_at) WHERE queue_status = 'leased';
+
+-- Retention purge of finished rows
+CREATE INDEX IF NOT EXISTS idx_assessment_queue_finished
+    ON assessment_queue (queue_updated_at) WHERE queue_status IN ('done', 'failed');
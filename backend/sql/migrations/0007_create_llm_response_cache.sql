@@ -0,0 +1,19 @@
+-- Persistent cache of validated LLM responses keyed by a hash of everything that determines the request
+-- (model, system prompt, few-shot examples, content, temperature, response schema).
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    cache_key           TEXT PRIMARY KEY,  -- sha256 hex of the canonical request
+    cache_model_id      TEXT,
+    cache_encoding      TEXT NOT NULL,     -- 'identity', 'zlib' or 'zstd' (see llm_blob)
+    cache_size          INTEGER NOT NULL,  -- uncompressed response size in bytes
+    cache_data          BLOB NOT NULL,     -- raw OpenRouter response JSON
+    cache_created_at    INTEGER NOT NULL,
+    cache_expires_at    INTEGER NOT NULL,
+    cache_last_hit_at   INTEGER NOT NULL,
+    cache_hit_count     INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_expires ON llm_response_cache (cache_expires_at);
+CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_hit ON llm_response_cache (cache_last_hit_at);
+
+-- 1 when the run was served from llm_response_cache (token counts are those of the original call)
+ALTER TABLE llm_runs_v2 ADD COLUMN llm_run_cache_hit INTEGER NOT NULL DEFAULT 0;
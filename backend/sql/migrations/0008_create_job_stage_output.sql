@@ -0,0 +1,21 @@
+-- Latest validated output of each assessment stage per job, with the hash of the exact request that
+-- produced it. A reassessment reuses a stage whose request is unchanged and reruns the rest.
+CREATE TABLE IF NOT EXISTS job_stage_output (
+    job_id              TEXT NOT NULL,
+    stage_run_type      TEXT NOT NULL,   -- prompts.llm_run_type, e.g. 'ja_2_1_assessment'
+    stage_input_hash    TEXT NOT NULL,   -- llm_cache_key of (model, system prompt, examples, content, temperature, schema)
+    stage_prompt_id     TEXT,
+    stage_output        TEXT NOT NULL,   -- validated response data as JSON
+    stage_created_at    INTEGER NOT NULL,
+
+    PRIMARY KEY (job_id, stage_run_type),
+    FOREIGN KEY (job_id) REFERENCES job_details (job_id) ON DELETE NO ACTION
+);
+
+-- 'assess' runs a job only if it has no skills yet; 'reassess' reruns it, reusing unchanged stages
+ALTER TABLE assessment_queue ADD COLUMN queue_mode TEXT NOT NULL DEFAULT 'assess';
+
+-- A reassessment requested while the job's entry is leased cannot be deduplicated into it (the running
+-- attempt may predate the change that prompted the request). It is recorded here ('assess'/'reassess')
+-- and requeued as a new pending entry when the lease completes or fails for good.
+ALTER TABLE assessment_queue ADD COLUMN queue_rerun_mode TEXT;
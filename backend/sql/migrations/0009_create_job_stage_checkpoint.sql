@@ -0,0 +1,16 @@
+-- Validated stage outputs of an in-progress (or failed) assessment, written as each stage succeeds so a
+-- retry resumes at the failed stage. Cleared when the job's assessment completes (outputs then live in
+-- job_stage_output); leftovers of abandoned jobs are purged by age.
+CREATE TABLE IF NOT EXISTS job_stage_checkpoint (
+    job_id              TEXT NOT NULL,
+    stage_run_type      TEXT NOT NULL,
+    stage_input_hash    TEXT NOT NULL,
+    stage_prompt_id     TEXT,
+    stage_output        TEXT NOT NULL,
+    stage_created_at    INTEGER NOT NULL,
+
+    PRIMARY KEY (job_id, stage_run_type),
+    FOREIGN KEY (job_id) REFERENCES job_details (job_id) ON DELETE NO ACTION
+);
+
+CREATE INDEX IF NOT EXISTS idx_job_stage_checkpoint_created_at ON job_stage_checkpoint (stage_created_at);
@@ -0,0 +1,29 @@
+-- Requirement-level match results, reused by stage 3.1 across jobs that share the same 3.1 context.
+-- req_norm is the normalized requirement text; near-duplicates are found through MinHash LSH bands.
+CREATE TABLE IF NOT EXISTS requirement_match (
+    match_context           TEXT NOT NULL,   -- requirement_cache.match_context_key: 3.1 prompt row, model, resume and profile
+    req_norm                TEXT NOT NULL,
+    req_numbers             TEXT NOT NULL,   -- numbers in the requirement; must match exactly for reuse
+    req_minhash             BLOB NOT NULL,   -- MinHash signature over word tokens
+    req_string              TEXT NOT NULL,   -- an original (un-normalized) requirement string
+    match                   INTEGER NOT NULL,
+    match_reasoning         TEXT,
+    source_job_id           TEXT,
+    created_at              INTEGER NOT NULL,
+
+    PRIMARY KEY (match_context, req_norm)
+);
+
+CREATE TABLE IF NOT EXISTS requirement_match_band (
+    match_context   TEXT NOT NULL,
+    band_key        TEXT NOT NULL,   -- '<band index>:<hash of the band's signature rows>'
+    req_norm        TEXT NOT NULL,
+
+    PRIMARY KEY (match_context, band_key, req_norm)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_requirement_match_band_req ON requirement_match_band (match_context, req_norm);
+
+-- match_context of the assessment that decided job_skills_match, so backfills only reuse matches of the
+-- current context; NULL for rows assessed before this migration (see RequirementMatchCache.backfill)
+ALTER TABLE job_skills ADD COLUMN job_skills_match_context TEXT;
@@ -0,0 +1,3 @@
+-- Prompt tokens the provider served from its prompt (prefix) cache, from usage.prompt_tokens_details.cached_tokens.
+-- NULL when the provider did not report it.
+ALTER TABLE llm_runs_v2 ADD COLUMN llm_run_cached_tokens INTEGER;
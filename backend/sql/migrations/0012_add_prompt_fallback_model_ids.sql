@@ -0,0 +1,3 @@
+-- Ordered fallback models for a prompt, as a JSON array of llm_models.model_id (e.g. '["openai/gpt-4.1-mini"]').
+-- A slow or failing call to the prompt's model_id is hedged / failed over to these in order. NULL = no fallback.
+ALTER TABLE prompt ADD COLUMN prompt_fallback_model_ids TEXT;
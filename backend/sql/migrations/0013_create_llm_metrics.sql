@@ -0,0 +1,62 @@
+-- LLM usage rollups maintained incrementally from llm_runs_v2 (see backend/llm_metrics.py). Runs are folded
+-- in rowid order past a watermark, so a refresh only reads the rows added since the previous one.
+-- Token and latency columns count billed runs only; responses served from the LLM cache
+-- (llm_run_cache_hit = 1) are counted in cache_hits and cost nothing.
+-- Spend (cost_usd) is priced when runs are folded in, at the llm_models prices in effect then, and
+-- accumulated, so a later price change does not rewrite history and the all-time total never decreases.
+CREATE TABLE IF NOT EXISTS llm_metrics_state (
+    metrics_source      TEXT PRIMARY KEY,   -- 'llm_runs_v2'
+    last_rowid          INTEGER NOT NULL,   -- highest llm_runs_v2 rowid folded into the rollups
+    updated_at          INTEGER NOT NULL
+);
+
+-- Per UTC day (of llm_run_start), stage and model
+CREATE TABLE IF NOT EXISTS llm_metrics_daily (
+    metrics_day         TEXT NOT NULL,      -- YYYY-MM-DD
+    llm_run_type        TEXT NOT NULL,      -- '' when the run has none
+    model_id            TEXT NOT NULL,      -- llm_run_model_id, '' when the run has none
+    runs                INTEGER NOT NULL DEFAULT 0,
+    cache_hits          INTEGER NOT NULL DEFAULT 0,
+    input_tokens        INTEGER NOT NULL DEFAULT 0,
+    cached_tokens       INTEGER NOT NULL DEFAULT 0,
+    output_tokens       INTEGER NOT NULL DEFAULT 0,   -- completion tokens, thinking included
+    thinking_tokens     INTEGER NOT NULL DEFAULT 0,
+    latency_s_sum       REAL NOT NULL DEFAULT 0,
+    latency_s_max       REAL NOT NULL DEFAULT 0,
+    cost_usd            REAL NOT NULL DEFAULT 0,
+    unpriced_runs       INTEGER NOT NULL DEFAULT 0,   -- billed runs whose model had no llm_models row when folded
+
+    PRIMARY KEY (metrics_day, llm_run_type, model_id)
+) WITHOUT ROWID;
+
+-- Latency histogram of billed runs. metrics_bucket indexes llm_metrics.LATENCY_BUCKETS (upper bounds in
+-- seconds); the bucket past the last bound is +Inf. Changing the bounds requires rebuilding the rollups.
+CREATE TABLE IF NOT EXISTS llm_metrics_latency_bucket (
+    metrics_day         TEXT NOT NULL,
+    llm_run_type        TEXT NOT NULL,
+    model_id            TEXT NOT NULL,
+    metrics_bucket      INTEGER NOT NULL,
+    runs                INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (metrics_day, llm_run_type, model_id, metrics_bucket)
+) WITHOUT ROWID;
+
+-- Billed tokens per job, day and model, for cost per job
+CREATE TABLE IF NOT EXISTS llm_metrics_job (
+    job_id              TEXT NOT NULL,
+    metrics_day         TEXT NOT NULL,
+    model_id            TEXT NOT NULL,
+    runs                INTEGER NOT NULL DEFAULT 0,
+    input_tokens        INTEGER NOT NULL DEFAULT 0,
+    output_tokens       INTEGER NOT NULL DEFAULT 0,
+    thinking_tokens     INTEGER NOT NULL DEFAULT 0,
+    cost_usd            REAL NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (job_id, metrics_day, model_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_llm_metrics_job_day ON llm_metrics_job (metrics_day);
+
+-- Price of prompt tokens served from the provider's prompt cache (Cost Per Million Tokens);
+-- NULL = billed at model_cpmt_prompt.
+ALTER TABLE llm_models ADD COLUMN model_cpmt_cached REAL;
@@ -0,0 +1,185 @@
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from .utilities import setup_logging, get_logger
+
+setup_logging()
+logger = get_logger(__name__)
+
+# Service times kept per stage for percentiles
+STAGE_METRICS_WINDOW = 500
+
+def _percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class _Stage:
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[bool]], workers: int, queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        # Stats
+        self.busy = 0
+        self.max_depth = 0
+        self.processed = 0
+        self.failed = 0
+        self.errors = 0
+        self.abandoned = 0
+        self.service_s: deque[float] = deque(maxlen=STAGE_METRICS_WINDOW)
+        self.wait_s: deque[float] = deque(maxlen=STAGE_METRICS_WINDOW)
+        self.service_s_total = 0.0
+
+    def stats(self) -> dict:
+        service = list(self.service_s)
+        wait = list(self.wait_s)
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "utilization": round(self.busy / self.workers, 3),
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "max_queue_depth": self.max_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "errors": self.errors,
+            "abandoned": self.abandoned,
+            "service_s_avg": round(self.service_s_total / self.processed, 3) if self.processed else None,
+            "service_s_p50": round(_percentile(service, 0.50), 3) if service else None,
+            "service_s_p95": round(_percentile(service, 0.95), 3) if service else None,
+            "queue_wait_s_p50": round(_percentile(wait, 0.50), 3) if wait else None,
+            "queue_wait_s_p95": round(_percentile(wait, 0.95), 3) if wait else None,
+            # Upper bound on this stage's throughput with its current pool and service time
+            "capacity_per_min": round(60 * self.workers * len(service) / sum(service), 2) if service and sum(service) else None,
+        }
+
+class StagedExecutor:
+    """
+    Staged event-driven pipeline: each stage has a bounded queue and its own worker pool.
+
+    `run(item)` enqueues an item at the first stage and resolves once it leaves the pipeline. A stage
+    handler returns True to pass the item to the next stage and False to drop it (the run resolves
+    False); an exception fails the run. Workers block on a full downstream queue, so a slow stage
+    pushes back on its producers instead of buffering without bound, and different items occupy
+    different stages at the same time. Cancelling a run (e.g. the caller's lease was lost) also
+    cancels the handler working on its item, so an abandoned run stops making LLM calls at once.
+    """
+
+    def __init__(self, stages: list[tuple[str, Callable[[Any], Awaitable[bool]], int]], queue_size: int = 16):
+        self.queue_size = queue_size
+        self._specs = stages
+        self._stages: list[_Stage] = []
+        self._tasks: list[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._tasks and self._loop is loop:
+            return
+        # Queues and workers belong to one event loop (scripts may run several loops in sequence)
+        self._loop = loop
+        self._stages = [_Stage(name, handler, workers, self.queue_size) for name, handler, workers in self._specs]
+        self._tasks = [
+            asyncio.create_task(self._worker(index), name=f"stage-{stage.name}-{n}")
+            for index, stage in enumerate(self._stages)
+            for n in range(stage.workers)
+        ]
+        logger.info(
+            "Started staged executor: "
+            + ", ".join(f"{stage.name}={stage.workers}" for stage in self._stages)
+            + f" (queue size {self.queue_size})"
+        )
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for stage in self._stages:
+            while not stage.queue.empty():
+                _, future, _ = stage.queue.get_nowait()
+                if not future.done():
+                    future.cancel()
+
+    async def run(self, item: Any) -> bool:
+        """Passes `item` through every stage; True if all stages accepted it."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self.submitted += 1
+        await self._put(self._stages[0], item, future)
+        return await future
+
+    async def _put(self, stage: _Stage, item: Any, future: asyncio.Future):
+        await stage.queue.put((item, future, time.perf_counter()))
+        stage.max_depth = max(stage.max_depth, stage.queue.qsize())
+
+    async def _worker(self, index: int):
+        stage = self._stages[index]
+        following = self._stages[index + 1] if index + 1 < len(self._stages) else None
+        while True:
+            item, future, enqueued = await stage.queue.get()
+            if future.done():
+                continue  # the caller gave up (e.g. its lease was lost)
+            stage.wait_s.append(time.perf_counter() - enqueued)
+            stage.busy += 1
+            started = time.perf_counter()
+            handler_task = asyncio.ensure_future(stage.handler(item))
+
+            def cancel_handler(done: asyncio.Future, handler_task: asyncio.Future = handler_task):
+                if done.cancelled():
+                    handler_task.cancel()
+
+            future.add_done_callback(cancel_handler)
+            try:
+                accepted = await handler_task
+            except asyncio.CancelledError:
+                current = asyncio.current_task()
+                if future.cancelled() and current is not None and not current.cancelling():
+                    stage.abandoned += 1
+                    continue  # only the run was cancelled; this worker carries on
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                stage.errors += 1
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            finally:
+                future.remove_done_callback(cancel_handler)
+                elapsed = time.perf_counter() - started
+                stage.busy -= 1
+                stage.processed += 1
+                stage.service_s.append(elapsed)
+                stage.service_s_total += elapsed
+            if not accepted:
+                stage.failed += 1
+                self.dropped += 1
+                if not future.done():
+                    future.set_result(False)
+            elif following is None:
+                self.completed += 1
+                if not future.done():
+                    future.set_result(True)
+            else:
+                await self._put(following, item, future)
+
+    def stats(self) -> dict:
+        stages = {stage.name: stage.stats() for stage in self._stages}
+        capacities = {name: s["capacity_per_min"] for name, s in stages.items() if s["capacity_per_min"]}
+        return {
+            "running": bool(self._tasks),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            # The stage with the lowest capacity bounds pipeline throughput
+            "bottleneck": min(capacities, key=capacities.get) if capacities else None,
+            "stages": stages,
+        }